@@ -1,89 +1,317 @@
 from fastapi import APIRouter, HTTPException, Response, Depends
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-import pandas as pd
-from src.Capture.processpcap import process_pcap, save_to_arff
-from src.Capture.capture import capture_packets_tshark, capture_packets_tshark_wrapper
+from src.Capture.capture import CaptureProfile
+from src.Capture.export import WRITERS
+from src.Capture.continuous import get_continuous_capture, ContinuousCaptureError
+from src.Capture.live import LivePipeline, open_tshark, run_process, score_batch
+from src.Capture.sessions import (get_session_manager, CaptureAccessError, CaptureCancelled, CaptureLimitError,
+                                  CaptureSessionError)
+from src.IDS.inference.batcher import score_request
+from src.IDS.inference.detections import DetectionFeed, sse_event, sse_stream
+from src.IDS.inference.registry import get_registry
+from src.IDS.inference.response import columnar_payload, metadata_payload, summarize
+from src.IDS.inference.worker_pool import get_pool, extract_pcap_features, export_pcap_features, Overloaded
 import config
-import io
 import logging
 import asyncio
-from api.auth import get_current_active_user
+import functools
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from api.auth import User, get_current_active_user, is_admin
+from api.IDS.routes import overloaded_exception, resolve_quantized
 
-class CaptureInput(BaseModel):
+class CaptureProfileInput(BaseModel):
+    # 'header' keeps only packet headers (no content features), 'full' whole packets; see CaptureProfile
+    profile: Literal["full", "header"] = config.CAPTURE_DEFAULT_PROFILE
+    bpf_filter: Optional[str] = None
+    snaplen: Optional[int] = None
+    buffer_mb: Optional[int] = None
+
+    def capture_profile(self):
+        return CaptureProfile(self.profile, self.snaplen, self.bpf_filter, self.buffer_mb)
+
+class CaptureInput(CaptureProfileInput):
     duration: int
+    interface: Optional[str] = None
+
+class ContinuousCaptureInput(CaptureProfileInput):
+    interface: Optional[str] = None
+    segment_mb: int = config.CONTINUOUS_SEGMENT_MB
+    segment_seconds: int = config.CONTINUOUS_SEGMENT_SECONDS
+    ring_files: int = config.CONTINUOUS_RING_FILES
+    max_backlog: int = config.CONTINUOUS_MAX_BACKLOG
+    retention: Literal["delete", "archive"] = config.CONTINUOUS_RETENTION
 
 capture_router = APIRouter()
 
-@capture_router.post("/", response_class=Response, dependencies=[Depends(get_current_active_user)])
-async def capture_pcap_file(data: CaptureInput):
+class CaptureStreamResponse(StreamingResponse):
+    """StreamingResponse that calls on_close however sending it ends.
+
+    Also when the client left before the body was iterated, in which case the body generator never ran.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+def capture_owner(user):
+    """Owner whose captures user may see and stop; None (every owner) for an admin."""
+    return None if is_admin(user) else user.username
+
+@asynccontextmanager
+async def capture_session_batch(data, owner, extract=None):
+    """Run a capture session, then extract its features and use them while holding an inference pool slot.
+
+    extract(session) is awaited for the features instead of extracting a FeatureBatch, when given.
+    The session is closed if the block fails; otherwise the caller closes it when done with its files.
+    """
+    try:
+        profile = data.capture_profile()
+        session = await get_session_manager().start(data.duration, data.interface, owner, profile)
+    except CaptureLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"Required software not found: {str(e)}")
+    try:
+        await session.wait()
+        # Admitted like an upload once there is a capture to work on, not while tshark records
+        async with get_pool().admit(owner):
+            if extract is not None:
+                batch = await extract(session)
+            else:
+                # Content features only where the profile kept whole payloads
+                batch = await get_pool().run(extract_pcap_features, session.pcap_path,
+                                             config.IDS_MAX_PACKETS_PER_REQUEST, profile.content_features)
+            # A cancel that arrived during extraction still ends the request
+            session.check()
+            yield session, batch
+    except Overloaded as e:
+        session.close()
+        logging.warning(f"Capture processing rejected for {owner}: {e}")
+        raise overloaded_exception(e)
+    except CaptureCancelled as e:
+        session.close()
+        raise HTTPException(status_code=409, detail=str(e))
+    except BaseException:
+        session.close()
+        raise
+
+@capture_router.post("/", response_class=Response)
+async def capture_pcap_file(data: CaptureInput, format: Literal["csv", "arff", "parquet"] = "csv",
+                            include_metadata: bool = False, current_user: User = Depends(get_current_active_user)):
+    """Capture, extract and stream the features back as a file written in the capture's session directory.
+
+    Connections are written to the file as they end (see export.export_pcap), in that order.
+    """
+    writer = WRITERS[format]
+
+    def export(session):
+        return get_pool().run(export_pcap_features, session.pcap_path, session.path(f"features.{writer.extension}"),
+                              format, include_metadata, config.IDS_MAX_PACKETS_PER_REQUEST,
+                              session.profile.content_features)
+
     try:
-        await asyncio.to_thread(capture_packets_tshark_wrapper, data.duration)
-        features = process_pcap(config.PCAP_SAVE_PATH)
-        save_to_arff(features, config.PCAP_OUTPUT_PATH)
-        df = pd.DataFrame(features)
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-        return Response(content=output.getvalue(), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=Captured_data.csv"})
+        async with capture_session_batch(data, current_user.username, export) as (session, _):
+            path = session.path(f"features.{writer.extension}")
+        # Streamed from the session directory, which is removed once the response is sent
+        return FileResponse(path, media_type=writer.media_type, filename=f"Captured_data.{writer.extension}",
+                            headers={"X-Capture-Session": session.id}, background=BackgroundTask(session.close))
+    except HTTPException:
+        raise
+    except CaptureCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logging.error(f"Error capturing pcap file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@capture_router.post("/analyze", response_model=dict, dependencies=[Depends(get_current_active_user)])
-async def capture_and_analyze(data: CaptureInput):
+@capture_router.post("/analyze", response_model=dict)
+async def capture_and_analyze(data: CaptureInput, format: Literal["rows", "columnar"] = "rows",
+                              probabilities: bool = False, include_features: bool = False,
+                              quantized: Optional[bool] = None, current_user: User = Depends(get_current_active_user)):
     try:
-        # 1. Capture Packets
-        await asyncio.to_thread(capture_packets_tshark_wrapper, data.duration)
-        
-        # 2. Process Capture File
-        features = process_pcap(config.PCAP_SAVE_PATH)
-        if not features:
-             raise HTTPException(status_code=400, detail="No network packets captured. Ensure traffic is flowing and Tshark is installed.")
+        quantized = resolve_quantized(quantized)
+        # 1. Capture packets and extract features in a session of this request's own
+        async with capture_session_batch(data, current_user.username) as (session, batch):
+            # The features are all that is needed from here on, so the capture files go now
+            session.close()
+            if not len(batch):
+                 raise HTTPException(status_code=400, detail="No network packets captured. Ensure traffic is flowing and Tshark is installed.")
              
-        # 3. Prepare Data for Prediction
-        from src.IDS.training.predict import predict_new_data
-        
-        new_df = pd.DataFrame(features)
-        
-        # Add required 'other' column (default 0 for KDD compatibility)
-        if 'other' not in new_df.columns:
-            new_df['other'] = 0
+            # 2. Typed frame in model column order, ready for prediction
+            new_df = batch.features
             
-        logging.info(f"Analyzing {len(new_df)} captured connections...")
-
-        # 4. Run Prediction Model
-        predictions = predict_new_data(
-            new_df, 
-            config.MODEL_SAVE_PATH, 
-            config.PREPROCESSOR_SAVE_PATH, 
-            config.MAPPING_SAVE_PATH, 
-            config.DEVICE
-        )
-
-        # 5. Compile Results
-        result_data = []
-        for i, (feature_row, prediction) in enumerate(zip(features, predictions)):
-            result_data.append({
-                "connection_id": i + 1,
-                "src_ip": feature_row.get('src_ip', 'N/A'), # process_pcap might not return src/dst IPs, it returns features. 
-                # Note: process_pcap returns features for the model. 
-                # To show IPs, we might need to modify process_pcap or just show the prediction.
-                # For now, let's just return the prediction.
-                "service": feature_row.get('service', 'N/A'),
-                "protocol": feature_row.get('protocol_type', 'N/A'),
-                "prediction": prediction
-            })
-
-        return {
-            "status": "success",
-            "total_connections": len(features),
-            "summary": {
-                "normal": sum(1 for p in predictions if 'normal' in p.lower()),
-                "attacks": sum(1 for p in predictions if 'normal' not in p.lower())
-            },
-            "details": result_data
-        }
+            logging.info(f"Analyzing {len(new_df)} captured connections from session {session.id}...")
+
+            # 3. Run Prediction Model
+            codes, proba = await score_request(new_df, probabilities, quantized)
+
+            # 4. Compile Results
+            class_names = get_registry().class_names
+            if format == "columnar":
+                return JSONResponse(columnar_payload(codes, class_names, "connection_ids", proba,
+                                                     new_df if include_features else None, status="success",
+                                                     session=session.id, profile=session.profile.as_dict(),
+                                                     metadata=metadata_payload(batch.metadata)))
 
+            predictions = class_names[codes].tolist()
+            result_data = []
+            for i, (src_ip, dst_ip, service, protocol, prediction) in enumerate(zip(
+                    batch.metadata['src_ip'].tolist(), batch.metadata['dst_ip'].tolist(),
+                    new_df['service'].tolist(), new_df['protocol_type'].tolist(), predictions)):
+                result_data.append({
+                    "connection_id": i + 1,
+                    "src_ip": src_ip,
+                    "dst_ip": dst_ip,
+                    "service": service,
+                    "protocol": protocol,
+                    "prediction": prediction
+                })
+
+            return {
+                "status": "success",
+                "session": session.id,
+                "profile": session.profile.as_dict(),
+                "total_connections": len(batch),
+                "summary": summarize(codes, class_names),
+                "details": result_data
+            }
+
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error during real-time analysis: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@capture_router.get("/sessions")
+async def capture_sessions(current_user: User = Depends(get_current_active_user)):
+    """The caller's running capture sessions with their packet/byte counters, and recently ended ones."""
+    return get_session_manager().status(owner=capture_owner(current_user))
+
+@capture_router.get("/sessions/{session_id}")
+async def capture_session_status(session_id: str, current_user: User = Depends(get_current_active_user)):
+    try:
+        return get_session_manager().status(session_id, capture_owner(current_user))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Capture session {session_id} not found")
+
+@capture_router.delete("/sessions/{session_id}")
+async def cancel_capture_session(session_id: str, current_user: User = Depends(get_current_active_user)):
+    """Stop a session's tshark cleanly; the request waiting on it fails with 409 and its files are removed.
+
+    Sessions of other users are not found, except for an admin.
+    """
+    try:
+        return await get_session_manager().cancel(session_id, capture_owner(current_user))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Capture session {session_id} not found")
+    except CaptureSessionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@capture_router.get("/stream")
+async def stream_detections(duration: int, interface: Optional[str] = None, quantized: Optional[bool] = None,
+                            profile: CaptureProfileInput = Depends(),
+                            current_user: User = Depends(get_current_active_user)):
+    """Server-sent events of verdicts and running totals while a live capture runs for duration seconds.
+
+    Authenticated with the same Bearer token as the other routes, so read it with fetch rather than EventSource.
+    The capture is a 'stream' capture session: it counts against the session limit and can be cancelled.
+    """
+    quantized = resolve_quantized(quantized)
+    try:
+        profile = profile.capture_profile()
+        session = get_session_manager().open('stream', duration, current_user.username, profile)
+    except CaptureLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        process, interface = await open_tshark(interface, duration, profile)
+    except FileNotFoundError as e:
+        session.fail(e)
+        raise HTTPException(status_code=503, detail=f"Required software not found: {str(e)}")
+    except RuntimeError as e:
+        session.fail(e)
+        raise HTTPException(status_code=500, detail=str(e))
+    except BaseException as e:
+        session.fail(e)
+        raise
+
+    feed = DetectionFeed(get_registry().class_names)
+    subscription = feed.subscribe()
+    pipeline = LivePipeline(score=functools.partial(score_batch, quantized=quantized))
+    session.attach(process, interface, pipeline.decoder)
+
+    async def live_capture():
+        stats = await run_process(process, feed.publish, pipeline)
+        # A cancelled session ends the stream with an error rather than stats
+        session.check()
+        return stats
+
+    async def run_feed():
+        try:
+            await feed.run(live_capture())
+        finally:
+            # Frees the session slot once tshark is done, even if no client ever read the stream
+            session.close()
+
+    capture = asyncio.create_task(run_feed())
+    logging.info(f"Streaming live detections from {interface} for {duration} s in session {session.id}")
+
+    def stop_capture():
+        # The capture exists for this client only; stop tshark when it disconnects
+        if not capture.done():
+            capture.cancel()
+        if process.returncode is None:
+            process.terminate()
+        session.close()
+
+    async def events():
+        yield sse_event("start", {"session": session.id, "interface": interface, "duration": duration,
+                                  "profile": profile.as_dict()})
+        async for chunk in sse_stream(subscription):
+            yield chunk
+
+    return CaptureStreamResponse(events(), on_close=stop_capture, media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                          "X-Capture-Session": session.id})
+
+@capture_router.post("/continuous/start")
+async def start_continuous_capture(data: ContinuousCaptureInput, current_user: User = Depends(get_current_active_user)):
+    """Start a tshark ring-buffer capture whose finished segments are analysed in the background."""
+    try:
+        settings = data.model_dump(exclude=set(CaptureProfileInput.model_fields))
+        return await get_continuous_capture().start(**settings, profile=data.capture_profile(),
+                                                    owner=current_user.username)
+    except CaptureLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ContinuousCaptureError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"Required software not found: {str(e)}")
+
+@capture_router.post("/continuous/stop")
+async def stop_continuous_capture(current_user: User = Depends(get_current_active_user)):
+    """Stop the continuous capture; only the user that started it, or an admin, can."""
+    try:
+        return await get_continuous_capture().stop(capture_owner(current_user))
+    except CaptureAccessError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ContinuousCaptureError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@capture_router.get("/continuous/status", dependencies=[Depends(get_current_active_user)])
+async def continuous_capture_status():
+    """State, per-segment processing lag, dropped segments and running verdict totals."""
+    return get_continuous_capture().status()
@@ -1,89 +1,104 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Response, Depends
+from fastapi.responses import StreamingResponse, JSONResponse
+from contextlib import AsyncExitStack
 from pydantic import BaseModel
 import pandas as pd
 import io
 import logging
-from src.IDS.training.predict import predict_new_data
-from src.Capture.processpcap import process_pcap
+from src.IDS.inference.registry import get_registry
+from src.IDS.inference.batcher import get_batcher, predict_codes, score_request
+from src.IDS.inference.cache import get_prediction_cache
+from src.IDS.inference.response import columnar_payload, metadata_payload, summarize
+from src.IDS.inference.worker_pool import get_pool, parse_csv, parse_columnar, COLUMNAR_EXTENSIONS, Overloaded, RequestTooLarge, InvalidUpload
+from src.IDS.inference.streaming import open_csv_chunks, next_chunk, stream_predictions
 import os
+import time
+import shutil
+import asyncio
 import config
 import tempfile
-from api.auth import get_current_active_user
+import functools
+from typing import Literal, Optional
+from api.auth import User, get_current_active_user
+from api.uploads import spool_upload
 
 ids_router = APIRouter()
 
-@ids_router.post("/", dependencies=[Depends(get_current_active_user)])
-async def predict(file: UploadFile = File(...)):
+def overloaded_exception(e: Overloaded):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def resolve_quantized(quantized):
+    """Resolve the ?quantized= flag against the loaded registry; 400 when int8 was asked for but isn't loaded."""
+    try:
+        return get_registry().use_quantized(quantized)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def prepare_prediction_frame(new_df):
+    """Validate an uploaded KDD frame and reorder it to the model's columns."""
+    # Validate data format
+    if new_df.empty:
+        raise HTTPException(status_code=400, detail="The uploaded CSV file contains no data.")
+    
+    # Expected columns (without 'class' column for prediction)
+    expected_columns = config.KDD_FEATURE_COLUMNS
+    
+    # Check if the data has the expected columns (allow for 'class' column to be present or missing)
+    if 'class' in new_df.columns:
+        # Remove class column if present (for prediction we don't need it)
+        new_df = new_df.drop(columns=['class'])
+    
+    # Handle missing 'other' column (common in some KDD versions)
+    if 'other' not in new_df.columns:
+        new_df['other'] = 0
+
+    missing_columns = set(expected_columns) - set(new_df.columns)
+    if missing_columns:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Missing required columns: {', '.join(sorted(missing_columns))}. Please ensure your CSV file has the correct KDD Cup 99 format."
+        )
+    
+    # Reorder columns to match expected format
+    return new_df[expected_columns]
+
+@ids_router.post("/")
+async def predict(file: UploadFile = File(...), format: Literal["rows", "columnar"] = "rows",
+                  probabilities: bool = False, include_features: bool = False, quantized: Optional[bool] = None,
+                  current_user: User = Depends(get_current_active_user)):
     try:
+        quantized = resolve_quantized(quantized)
         # Validate file type
-        if not file.filename.lower().endswith('.csv'):
-            raise HTTPException(status_code=400, detail="Only CSV files are supported")
-        
-        contents = await file.read()
+        extension = os.path.splitext(file.filename.lower())[1]
+        if extension != '.csv' and extension not in COLUMNAR_EXTENSIONS:
+            raise HTTPException(status_code=400, detail="Only CSV, Parquet and Arrow IPC files are supported")
         
-        # Try different encodings
-        text_content = None
-        encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
-        
-        for encoding in encodings:
+        pool = get_pool()
+        async with pool.admit(current_user.username):
+            contents = await file.read()
+            
+            # Decode and parse the upload on a worker so large uploads don't block the event loop
             try:
-                text_content = contents.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if text_content is None:
-            raise HTTPException(status_code=400, detail="Unable to decode file. Please ensure it's a valid CSV file with proper encoding.")
-        
-        # Parse CSV with error handling
-        try:
-            new_df = pd.read_csv(io.StringIO(text_content))
-        except pd.errors.EmptyDataError:
-            raise HTTPException(status_code=400, detail="The uploaded CSV file is empty.")
-        except pd.errors.ParserError as e:
-            raise HTTPException(status_code=400, detail=f"Error parsing CSV file: {str(e)}")
-        
-        # Validate data format
-        if new_df.empty:
-            raise HTTPException(status_code=400, detail="The uploaded CSV file contains no data.")
-        
-        # Expected columns (without 'class' column for prediction)
-        expected_columns = [
-            'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes', 
-            'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in', 
-            'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations', 
-            'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login', 
-            'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate', 
-            'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate', 
-            'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count', 
-            'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate', 
-            'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate', 
-            'dst_host_rerror_rate', 'dst_host_srv_rerror_rate', 'other'
-        ]
-        
-        # Check if the data has the expected columns (allow for 'class' column to be present or missing)
-        if 'class' in new_df.columns:
-            # Remove class column if present (for prediction we don't need it)
-            new_df = new_df.drop(columns=['class'])
-        
-        # Handle missing 'other' column (common in some KDD versions)
-        if 'other' not in new_df.columns:
-            new_df['other'] = 0
-
-        missing_columns = set(expected_columns) - set(new_df.columns)
-        if missing_columns:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required columns: {', '.join(sorted(missing_columns))}. Please ensure your CSV file has the correct KDD Cup 99 format."
-            )
-        
-        # Reorder columns to match expected format
-        new_df = new_df[expected_columns]
+                if extension == '.csv':
+                    new_df = await pool.run(parse_csv, contents)
+                else:
+                    new_df = await pool.run(parse_columnar, contents, COLUMNAR_EXTENSIONS[extension])
+            except InvalidUpload as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except RequestTooLarge as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            
+            new_df = prepare_prediction_frame(new_df)
+            logging.info(f"Processing prediction for {len(new_df)} rows")
+            codes, proba = await score_request(new_df, probabilities, quantized)
         
-        logging.info(f"Processing prediction for {len(new_df)} rows")
-        predictions = predict_new_data(new_df, config.MODEL_SAVE_PATH, config.PREPROCESSOR_SAVE_PATH, config.MAPPING_SAVE_PATH, config.DEVICE)
+        class_names = get_registry().class_names
+        if format == "columnar":
+            return JSONResponse(columnar_payload(codes, class_names, "row_ids", proba,
+                                                 new_df if include_features else None, filename=file.filename))
         
         # Create response with predictions and row details
+        predictions = class_names[codes].tolist()
         result_data = []
         for i, (_, row) in enumerate(new_df.iterrows()):
             result_data.append({
@@ -96,12 +111,12 @@ async def predict(file: UploadFile = File(...)):
             "filename": file.filename,
             "total_rows": len(predictions),
             "predictions": result_data,
-            "summary": {
-                "normal": sum(1 for p in predictions if 'normal' in p.lower()),
-                "attacks": sum(1 for p in predictions if 'normal' not in p.lower())
-            }
+            "summary": summarize(codes, class_names)
         }
         
+    except Overloaded as e:
+        logging.warning(f"Prediction rejected for {current_user.username}: {e}")
+        raise overloaded_exception(e)
     except HTTPException as he:
         logging.error(f"HTTP Exception in prediction: {he.status_code} - {he.detail}")
         raise
@@ -109,72 +124,173 @@ async def predict(file: UploadFile = File(...)):
         logging.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
-@ids_router.post("/pcap", dependencies=[Depends(get_current_active_user)])
-async def predict_pcap(file: UploadFile = File(...)):
+@ids_router.post("/stream")
+async def predict_stream(file: UploadFile = File(...), quantized: Optional[bool] = None,
+                         current_user: User = Depends(get_current_active_user)):
+    """Score a CSV of any size chunk by chunk, streaming NDJSON rows and a final summary line."""
+    started = time.perf_counter()
+    quantized = resolve_quantized(quantized)
+    if not file.filename.lower().endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported")
+    
+    # The admission slot is held until the stream finishes
+    admission = AsyncExitStack()
+    try:
+        await admission.enter_async_context(get_pool().admit(current_user.username))
+    except Overloaded as e:
+        logging.warning(f"Streaming prediction rejected for {current_user.username}: {e}")
+        raise overloaded_exception(e)
+    
     try:
+        # FastAPI closes the upload when this handler returns, before the body is streamed
+        spool = tempfile.NamedTemporaryFile(suffix='.csv')
+        admission.callback(spool.close)
+        await asyncio.to_thread(shutil.copyfileobj, file.file, spool, 1024 * 1024)
+        spool.seek(0)
+        
+        # The first chunk is parsed and validated up front so format errors still get a 400
+        # Decoded like /predict/ uploads; finding the encoding takes one pass over the spooled file
+        reader = await asyncio.to_thread(open_csv_chunks, spool)
+        admission.callback(reader.close)
+        first_chunk = await next_chunk(reader)
+        if first_chunk is None or first_chunk.empty:
+            raise HTTPException(status_code=400, detail="The uploaded CSV file contains no data.")
+        prepare_prediction_frame(first_chunk)
+    except pd.errors.EmptyDataError:
+        await admission.aclose()
+        raise HTTPException(status_code=400, detail="The uploaded CSV file is empty.")
+    except InvalidUpload as e:
+        await admission.aclose()
+        raise HTTPException(status_code=400, detail=str(e))
+    except pd.errors.ParserError as e:
+        await admission.aclose()
+        raise HTTPException(status_code=400, detail=f"Error parsing CSV file: {str(e)}")
+    except BaseException:
+        # Includes a client disconnect cancelling the copy
+        await admission.aclose()
+        raise
+    
+    async def body():
+        try:
+            async for line in stream_predictions(reader, first_chunk, functools.partial(predict_codes, quantized=quantized),
+                                                 get_registry().class_names, prepare_prediction_frame, started):
+                yield line
+        finally:
+            await admission.aclose()
+    
+    logging.info(f"Streaming predictions for {file.filename}")
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@ids_router.post("/pcap")
+async def predict_pcap(file: UploadFile = File(...), format: Literal["rows", "columnar"] = "rows",
+                       probabilities: bool = False, include_features: bool = False, quantized: Optional[bool] = None,
+                       workers: int = config.PCAP_EXTRACT_WORKERS, sha256: bool = False,
+                       current_user: User = Depends(get_current_active_user)):
+    try:
+        quantized = resolve_quantized(quantized)
         # Validate file type
         if not file.filename.lower().endswith(('.pcap', '.pcapng')):
             raise HTTPException(status_code=400, detail="Only PCAP/PCAPNG files are supported")
+        if not 1 <= workers <= config.PCAP_MAX_EXTRACT_WORKERS:
+            raise HTTPException(status_code=400,
+                                detail=f"workers must be between 1 and {config.PCAP_MAX_EXTRACT_WORKERS}")
         
-        # Save uploaded file to temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pcap') as temp_file:
-            contents = await file.read()
-            temp_file.write(contents)
-            temp_pcap_path = temp_file.name
-        
-        try:
-            # Process PCAP file to extract features
-            logging.info(f"Processing PCAP file: {file.filename}")
-            features = process_pcap(temp_pcap_path)
-            
-            if not features:
-                raise HTTPException(status_code=400, detail="No network connections found in PCAP file")
-            
-            # Convert features to DataFrame
-            new_df = pd.DataFrame(features)
-            
-            # Ensure 'other' column exists (model requirement)
-            if 'other' not in new_df.columns:
-                new_df['other'] = 0
-            
-            logging.info(f"Extracted {len(features)} connections from PCAP file")
-            
-            # Get predictions
-            predictions = predict_new_data(new_df, config.MODEL_SAVE_PATH, config.PREPROCESSOR_SAVE_PATH, config.MAPPING_SAVE_PATH, config.DEVICE)
-            
-            # Create response with predictions and connection details
-            result_data = []
-            for i, (feature_row, prediction) in enumerate(zip(features, predictions)):
-                result_data.append({
-                    "connection_id": i + 1,
-                    "src_ip": feature_row.get('src_ip', 'N/A'),
-                    "dst_ip": feature_row.get('dst_ip', 'N/A'), 
-                    "service": feature_row.get('service', 'N/A'),
-                    "protocol": feature_row.get('protocol_type', 'N/A'),
-                    "prediction": prediction,
-                    "duration": feature_row.get('duration', 0),
-                    "src_bytes": feature_row.get('src_bytes', 0),
-                    "dst_bytes": feature_row.get('dst_bytes', 0)
-                })
-            
-            return {
-                "filename": file.filename,
-                "total_connections": len(features),
-                "predictions": result_data,
-                "summary": {
-                    "normal": sum(1 for p in predictions if 'normal' in p.lower()),
-                    "attacks": sum(1 for p in predictions if 'normal' not in p.lower())
-                }
-            }
+        pool = get_pool()
+        async with pool.admit(current_user.username):
+            # Stream the upload to a spool file in chunks; workers memory-map it from there
+            spooled = await spool_upload(file, suffix='.pcap', sha256=sha256)
+            temp_pcap_path = spooled.path
             
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_pcap_path):
-                os.unlink(temp_pcap_path)
+            try:
+                # Process PCAP file to extract features on a worker
+                logging.info(f"Processing PCAP file: {file.filename}")
+                try:
+                    batch = await pool.extract_pcap(temp_pcap_path, workers)
+                except RequestTooLarge as e:
+                    raise HTTPException(status_code=413, detail=str(e))
+                except InvalidUpload as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                
+                if not len(batch):
+                    raise HTTPException(status_code=400, detail="No network connections found in PCAP file")
+                
+                # Typed frame in model column order, categorical protocol/service/flag
+                new_df = batch.features
                 
+                logging.info(f"Extracted {len(batch)} connections from PCAP file")
+                
+                # Get predictions
+                codes, proba = await score_request(new_df, probabilities, quantized)
+            finally:
+                # Clean up temporary file
+                if os.path.exists(temp_pcap_path):
+                    os.unlink(temp_pcap_path)
+        
+        class_names = get_registry().class_names
+        upload = {"size_bytes": spooled.size}
+        if sha256:
+            upload["sha256"] = spooled.sha256
+        if format == "columnar":
+            return JSONResponse(columnar_payload(codes, class_names, "connection_ids", proba,
+                                                 new_df if include_features else None, filename=file.filename,
+                                                 upload=upload, metadata=metadata_payload(batch.metadata)))
+        
+        # Create response with predictions and connection details
+        predictions = class_names[codes].tolist()
+        columns = zip(batch.metadata['src_ip'].tolist(), batch.metadata['src_port'].tolist(),
+                      batch.metadata['dst_ip'].tolist(), batch.metadata['dst_port'].tolist(),
+                      new_df['service'].tolist(), new_df['protocol_type'].tolist(), new_df['duration'].tolist(),
+                      new_df['src_bytes'].tolist(), new_df['dst_bytes'].tolist())
+        result_data = []
+        for i, ((src_ip, src_port, dst_ip, dst_port, service, protocol, duration, src_bytes, dst_bytes),
+                prediction) in enumerate(zip(columns, predictions)):
+            result_data.append({
+                "connection_id": i + 1,
+                "src_ip": src_ip,
+                "src_port": src_port,
+                "dst_ip": dst_ip,
+                "dst_port": dst_port,
+                "service": service,
+                "protocol": protocol,
+                "prediction": prediction,
+                "duration": duration,
+                "src_bytes": src_bytes,
+                "dst_bytes": dst_bytes
+            })
+        
+        return {
+            "filename": file.filename,
+            "upload": upload,
+            "total_connections": len(batch),
+            "predictions": result_data,
+            "summary": summarize(codes, class_names)
+        }
+
+    except Overloaded as e:
+        logging.warning(f"PCAP prediction rejected for {current_user.username}: {e}")
+        raise overloaded_exception(e)
     except HTTPException as he:
         logging.error(f"HTTP Exception in PCAP prediction: {he.status_code} - {he.detail}")
         raise
     except Exception as e:
         logging.error(f"PCAP prediction error: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing PCAP file: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing PCAP file: {str(e)}")
+
+@ids_router.get("/registry", dependencies=[Depends(get_current_active_user)])
+async def registry_info():
+    try:
+        return get_registry().info()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"IDS model not available: {str(e)}")
+
+@ids_router.get("/batcher", dependencies=[Depends(get_current_active_user)])
+async def batcher_stats(quantized: bool = False):
+    return get_batcher(quantized).stats()
+
+@ids_router.get("/cache", dependencies=[Depends(get_current_active_user)])
+async def cache_stats():
+    return get_prediction_cache().stats()
+
+@ids_router.get("/pool", dependencies=[Depends(get_current_active_user)])
+async def pool_stats():
+    return get_pool().stats()
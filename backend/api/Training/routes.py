@@ -6,6 +6,9 @@ import os
 import asyncio
 from src.CTGAN.training.generate import generate_samples
 from src.IDS.training.train_model import main as train_ids_model
+from src.IDS.inference.registry import load_registry
+from src.IDS.inference.worker_pool import get_pool
+from src.IDS.inference.cache import get_prediction_cache
 from api.auth import get_current_active_user
 import config
 
@@ -78,6 +81,11 @@ async def train_models(data: TrainingInput):
             # Run training in a separate thread to avoid blocking
             await asyncio.to_thread(train_ids_model)
             
+            # Swap the freshly trained weights into the serving registry
+            await asyncio.to_thread(load_registry)
+            await get_pool().reload()
+            get_prediction_cache().clear()
+            
             logging.info("IDS model training completed successfully")
             
             return {
@@ -39,6 +39,12 @@ users_db = {
     )
 }
 
+# Users that may see and stop every user's captures
+ADMIN_USERS = {"admin"}
+
+def is_admin(user: User):
+    return user.username in ADMIN_USERS
+
 def get_user(username: str):
     if username in users_db:
         return users_db[username]
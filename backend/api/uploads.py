@@ -0,0 +1,80 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from collections import namedtuple
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SpooledUpload = namedtuple('SpooledUpload', ['path', 'size', 'sha256'])
+
+def _too_large(max_bytes):
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {max_bytes} byte limit")
+
+class UploadLimitMiddleware:
+    """Rejects request bodies over max_bytes with 413 while they stream in, before they are buffered or spooled.
+
+    A declared Content-Length over the limit is refused before any of the body
+    is read; otherwise bytes are counted as they arrive and the request fails
+    as soon as the count passes the limit.
+    """
+
+    def __init__(self, app, max_bytes=config.IDS_MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            return await self.app(scope, receive, send)
+        declared = dict(scope.get("headers") or ()).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            response = JSONResponse({"detail": _too_large(self.max_bytes).detail}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    logging.warning(f"Rejected request to {scope.get('path')}: body over {self.max_bytes} bytes")
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def _copy_upload(source, spool, max_bytes, chunk_bytes, digest):
+    size = 0
+    while True:
+        chunk = source.read(chunk_bytes)
+        if not chunk:
+            return size
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise _too_large(max_bytes)
+        if digest is not None:
+            digest.update(chunk)
+        spool.write(chunk)
+
+async def spool_upload(file: UploadFile, suffix='', sha256=False, max_bytes=config.IDS_MAX_UPLOAD_BYTES,
+                       chunk_bytes=config.IDS_UPLOAD_CHUNK_BYTES, directory=config.IDS_UPLOAD_SPOOL_DIR):
+    """Copy an upload to a spool file in fixed-size chunks, hashing it on the way if asked.
+
+    Only one chunk is in memory at a time. The caller deletes the returned path.
+    """
+    digest = hashlib.sha256() if sha256 else None
+    await file.seek(0)
+    spool = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory)
+    try:
+        with spool:
+            size = await asyncio.to_thread(_copy_upload, file.file, spool, max_bytes, chunk_bytes, digest)
+    except BaseException:
+        os.unlink(spool.name)
+        raise
+    return SpooledUpload(spool.name, size, digest.hexdigest() if digest is not None else None)
@@ -0,0 +1,60 @@
+"""Throughput of small concurrent requests with and without the micro-batcher.
+
+Each client repeatedly sends --rows-row requests for --seconds. Run from the
+backend directory:
+    python -m benchmarks.bench_batcher [--clients 1 16 64] [--rows 5]
+"""
+import argparse
+import asyncio
+import logging
+import time
+import warnings
+import pandas as pd
+import config
+from src.IDS.inference.batcher import MicroBatcher
+from src.IDS.inference.registry import ModelRegistry
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load test the IDS micro-batcher')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--rows', type=int, default=5)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    return parser.parse_args()
+
+async def load_test(predict, requests, n_clients, seconds):
+    done = 0
+    stop_at = time.perf_counter() + seconds
+
+    async def client(i):
+        nonlocal done
+        k = i
+        while time.perf_counter() < stop_at:
+            await predict(requests[k % len(requests)])
+            k += n_clients
+            done += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(n_clients)))
+    return done / (time.perf_counter() - start)
+
+async def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    registry = ModelRegistry.load(preprocessor_save_path=args.preprocessor_path)
+    df = pd.read_csv(args.data_path).drop(columns=['class'])
+    requests = [df.iloc[i:i + args.rows].reset_index(drop=True) for i in range(0, 2000 * args.rows, args.rows)]
+
+    for n_clients in args.clients:
+        direct = await load_test(lambda r: asyncio.to_thread(registry.predict, r), requests, n_clients, args.seconds)
+        batcher = MicroBatcher(registry.predict)
+        batched = await load_test(batcher.predict, requests, n_clients, args.seconds)
+        stats = batcher.stats()
+        await batcher.stop()
+        print(f"{n_clients:>3} clients: direct {direct * args.rows:9,.0f} rows/s, batched {batched * args.rows:9,.0f} rows/s "
+              f"(mean batch {stats['mean_batch_rows']:.1f} rows, queue wait p50 {stats['queue_wait_ms']['p50']:.2f} ms)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
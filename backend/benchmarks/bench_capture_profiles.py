@@ -0,0 +1,98 @@
+"""Disk use and extraction CPU per capture profile.
+
+A synthetic capture of --flows flows is written first (or --pcap is used as
+is) as the 'full' profile would record it. Each other profile's capture is
+derived from it by cutting every frame to the profile's snap length, which
+is what tshark -s writes. process_pcap then runs on each file, best of
+--repeat, and its CPU time is reported. The header profile must give the
+same basic and traffic features as the full one, with the content columns
+left at 0. Run from the backend directory:
+    python -m benchmarks.bench_capture_profiles [--flows 50000] [--repeat 3]
+"""
+import argparse
+import logging
+import os
+import struct
+import tempfile
+import time
+import warnings
+import config
+from benchmarks.synthetic_pcap import write_capture
+from src.Capture.capture import CaptureProfile
+from src.Capture.content_matcher import CONTENT_COLUMNS
+from src.Capture.pcapreader import PCAP_MAGIC
+from src.Capture.processpcap import process_pcap
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark capture profiles')
+    parser.add_argument('--pcap', type=str, default=None, help='Existing full-packet pcap instead of a synthetic one')
+    parser.add_argument('--flows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    return parser.parse_args()
+
+def truncate_capture(source, target, snaplen):
+    """Copy a classic pcap, cutting every frame to snaplen bytes as a capture with -s snaplen would."""
+    with open(source, 'rb') as f, open(target, 'wb') as out:
+        header = f.read(24)
+        endian = PCAP_MAGIC[header[:4]][0]
+        out.write(header[:16] + struct.pack(endian + 'I', snaplen) + header[20:])
+        record = struct.Struct(endian + 'IIII')
+        while True:
+            raw = f.read(16)
+            if len(raw) < 16:
+                break
+            ts_sec, ts_frac, captured, wire_length = record.unpack(raw)
+            frame = f.read(captured)[:snaplen]
+            out.write(record.pack(ts_sec, ts_frac, len(frame), wire_length) + frame)
+
+def cpu_seconds(path, repeat):
+    best, batch = float('inf'), None
+    for _ in range(repeat):
+        start = time.process_time()
+        batch = process_pcap(path)
+        best = min(best, time.process_time() - start)
+    return best, batch
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    paths = {}
+    source = args.pcap
+    if source is None:
+        with tempfile.NamedTemporaryFile(suffix='.pcap', delete=False) as f:
+            source = f.name
+        flows, packets = write_capture(source, n_flows=args.flows)
+        print(f"Synthetic capture: {packets} packets, {flows} flows")
+    try:
+        for name in config.CAPTURE_PROFILE_SNAPLEN:
+            profile = CaptureProfile(name)
+            if not profile.snaplen:
+                paths[name] = source
+                continue
+            with tempfile.NamedTemporaryFile(suffix=f'.{name}.pcap', delete=False) as f:
+                paths[name] = f.name
+            truncate_capture(source, paths[name], profile.snaplen)
+
+        results = {}
+        for name, path in paths.items():
+            results[name] = cpu_seconds(path, args.repeat)
+        full_size, (full_cpu, full_batch) = os.path.getsize(paths['full']), results['full']
+        for name, path in paths.items():
+            size, (cpu, batch) = os.path.getsize(path), results[name]
+            print(f"{name:>6}: {size / 2**20:8.1f} MB ({size / full_size:6.1%} of full), "
+                  f"{cpu:6.2f} s CPU ({cpu / full_cpu:6.1%} of full), {len(batch)} connections, "
+                  f"content features: {CaptureProfile(name).content_features}")
+            if name != 'full':
+                content = [col for col in CONTENT_COLUMNS if col in batch.features]
+                other = [col for col in batch.features if col not in content]
+                print(f"        non-content features identical to full: "
+                      f"{batch.features[other].equals(full_batch.features[other])}, "
+                      f"content columns all 0: {bool((batch.features[content] == 0).all().all())}")
+    finally:
+        for path in set(paths.values()) | {source}:
+            if path != args.pcap:
+                os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Parse time and peak RSS of /predict uploads as CSV, Parquet and Arrow IPC.
+
+Each format is parsed in a fresh interpreter so ru_maxrss is per format. The
+upload bytes are read into memory first, as the route does. Run from the
+backend directory:
+    python -m benchmarks.bench_columnar_input [--rows 1000000]
+"""
+import argparse
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+import pandas as pd
+import config
+from src.IDS.inference.registry import ModelRegistry
+from src.IDS.inference.worker_pool import parse_csv, parse_columnar
+
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark columnar upload parsing')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--child', type=str, nargs=2, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def run_child(kind, path, preprocessor_path):
+    registry = ModelRegistry.load(preprocessor_save_path=preprocessor_path)
+    with open(path, 'rb') as f:
+        contents = f.read()
+    started = time.perf_counter()
+    new_df = parse_csv(contents) if kind == 'csv' else parse_columnar(contents, kind)
+    parsed = time.perf_counter()
+    registry.features(new_df.drop(columns=['class'], errors='ignore'))
+    transformed = time.perf_counter()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{parsed - started:.3f} {transformed - parsed:.3f} {peak_mb:.1f}")
+
+def write_inputs(df, directory):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    paths = {kind: os.path.join(directory, f"input{ext}") for kind, ext in FORMATS.items()}
+    df.to_csv(paths['csv'], index=False)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Low-cardinality string columns are dictionary-encoded, as exporters typically write them
+    for col in config.KDD_CATEGORICAL_COLUMNS:
+        idx = table.schema.get_field_index(col)
+        table = table.set_column(idx, col, table.column(col).dictionary_encode())
+    pq.write_table(table, paths['parquet'])
+    feather.write_feather(table, paths['arrow'], compression='uncompressed')
+    return paths
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    if args.child:
+        run_child(args.child[0], args.child[1], args.preprocessor_path)
+        return
+
+    base = pd.read_csv(args.data_path).drop(columns=['class'])
+    df = pd.concat([base] * -(-args.rows // len(base)), ignore_index=True).head(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_inputs(df, directory)
+        del df
+        print(f"{args.rows} rows")
+        for kind, path in paths.items():
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_columnar_input', '--child', kind, path,
+                                  '--preprocessor_path', args.preprocessor_path],
+                                 check=True, capture_output=True, text=True).stdout.split()
+            parse_s, transform_s, peak = out[-3:]
+            print(f"{kind:>8} ({os.path.getsize(path) / 2**20:7.1f} MB): parse {parse_s} s, "
+                  f"transform {transform_s} s, peak RSS {peak} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compiled NumPy transform vs. Preprocessor.transform on KDDTest+ tiled to 1k, 100k and 1M rows.
+
+Run from the backend directory:
+    python -m benchmarks.bench_compiled_transform [--sizes 1000 100000 1000000]
+"""
+import argparse
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import config
+from src.IDS.training.predict import load_preprocessor, prepare_features
+from src.IDS.preprocessing.compiled import CompiledTransform
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the compiled preprocessing transform')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    return parser.parse_args()
+
+def tile(df, n_rows):
+    reps = -(-n_rows // len(df))
+    return pd.concat([df] * reps, ignore_index=True).head(n_rows)
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    base = pd.read_csv(args.data_path).drop(columns=['class'])
+    preprocessor = load_preprocessor(args.preprocessor_path)
+    compiled = CompiledTransform.from_preprocessor(preprocessor)
+
+    for n_rows in args.sizes:
+        df = tile(base, n_rows)
+        start = time.perf_counter()
+        expected = prepare_features(preprocessor, df)
+        pandas_s = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = compiled.transform(df)
+        compiled_s = time.perf_counter() - start
+        err = np.max(np.abs(actual - expected) / (1 + np.abs(expected)))
+        print(f"{n_rows:>9} rows: pandas {pandas_s * 1000:9.1f} ms, compiled {compiled_s * 1000:8.1f} ms "
+              f"({pandas_s / compiled_s:5.1f}x), max rel err {err:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Payload bytes/sec of the content-feature scan as the indicator set grows.
+
+Compares the single-pass automaton in ContentMatcher with searching the
+lowered payload once per pattern (what the matcher does below
+CONTENT_AUTOMATON_MIN_PATTERNS patterns or without pyahocorasick). The
+configured pattern file is extended with --extra_patterns random indicators
+to show how each scan scales and where the automaton starts to pay off; the
+scan a default ContentMatcher picks is marked with *. The automaton needs
+pyahocorasick, which requirements.txt leaves out. Payloads are text-like, with an indicator
+planted in some of them. Run from the backend directory:
+    python -m benchmarks.bench_content_matcher [--payloads 50000] [--extra_patterns 0 50 500]
+"""
+import argparse
+import json
+import logging
+import random
+import string
+import time
+import config
+from src.Capture.content_matcher import ContentMatcher
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark single-pass payload pattern matching')
+    parser.add_argument('--patterns_path', type=str, default=config.CONTENT_PATTERNS_PATH)
+    parser.add_argument('--payloads', type=int, default=50000)
+    parser.add_argument('--extra_patterns', type=int, nargs='+', default=[0, 5, 10, 20, 50, 500])
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def synthetic_payloads(n, indicators, rng):
+    alphabet = (string.ascii_letters + string.digits + ' \r\n/:#-.').encode()
+    payloads = []
+    for _ in range(n):
+        body = bytes(rng.choice(alphabet) for _ in range(rng.choice([64, 512, 1460])))
+        if rng.random() < 0.2:
+            cut = rng.randrange(len(body))
+            body = body[:cut] + rng.choice(indicators).upper() + body[cut:]
+        payloads.append(body)
+    return payloads
+
+def timed(matcher, payloads):
+    start = time.perf_counter()
+    rows = [matcher.hits(len(payload), payload) for payload in payloads]
+    return time.perf_counter() - start, rows
+
+def main():
+    args = parse_args()
+    logging.disable(logging.WARNING)
+    rng = random.Random(args.seed)
+    with open(args.patterns_path, 'r') as f:
+        patterns = json.load(f)
+    indicators = [s.encode() for strings in patterns.values() for s in strings]
+    payloads = synthetic_payloads(args.payloads, indicators, rng)
+    total_mb = sum(len(payload) for payload in payloads) / 2**20
+    print(f"{len(payloads)} payloads, {total_mb:.1f} MB")
+
+    for extra in args.extra_patterns:
+        extended = {name: list(strings) for name, strings in patterns.items()}
+        extended['hot'] = extended.get('hot', []) + [
+            ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 14))) for _ in range(extra)]
+        automaton_s, automaton_rows = timed(ContentMatcher(extended, automaton_min_patterns=1), payloads)
+        separate_s, separate_rows = timed(ContentMatcher(extended, automaton_min_patterns=float('inf')), payloads)
+        matcher = ContentMatcher(extended)
+        chosen = ('*', ' ') if matcher._automaton is not None else (' ', '*')
+        print(f"{len(matcher.patterns):>4} patterns: single pass {total_mb / automaton_s:7.1f} MB/s{chosen[0]} "
+              f"one search per pattern {total_mb / separate_s:7.1f} MB/s{chosen[1]} "
+              f"identical: {automaton_rows == separate_rows}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Torch vs. folded NumPy SCAE_GC on KDDTest+: prediction agreement, rows/sec and import time.
+
+Run from the backend directory:
+    python -m benchmarks.bench_numpy_engine [--repeats 20]
+"""
+import argparse
+import logging
+import subprocess
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import torch
+import config
+from src.IDS.inference.artifacts import load_preprocessor
+from src.IDS.inference.numpy_engine import NumpySCAEGC, fold_state_dict
+from src.IDS.preprocessing.compiled import CompiledTransform
+from src.IDS.training.predict import load_scae_gc
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the torch-free SCAE_GC engine')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--repeats', type=int, default=20)
+    return parser.parse_args()
+
+def import_time(module):
+    """Median wall time of a fresh interpreter importing module."""
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import {module}'], check=True)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def rows_per_sec(fn, n_rows, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return n_rows * repeats / (time.perf_counter() - start)
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    df = pd.read_csv(args.data_path).drop(columns=['class'])
+    features = CompiledTransform.from_preprocessor(load_preprocessor(args.preprocessor_path)).transform(df)
+
+    model = load_scae_gc(config.MODEL_SAVE_PATH, 'cpu')
+    engine = NumpySCAEGC(fold_state_dict(model.state_dict()))
+    tensor = torch.from_numpy(features)
+
+    def torch_codes():
+        with torch.no_grad():
+            return model(tensor).argmax(dim=1).numpy()
+
+    agreement = np.mean(torch_codes() == engine.predict_codes(features))
+    with torch.no_grad():
+        max_prob_err = np.max(np.abs(model(tensor).numpy() - engine.predict_proba(features)))
+    print(f"{len(df)} rows: argmax agreement {agreement * 100:.3f}%, max probability error {max_prob_err:.2e}")
+    print(f"torch: {rows_per_sec(torch_codes, len(df), args.repeats):,.0f} rows/s, "
+          f"numpy: {rows_per_sec(lambda: engine.predict_codes(features), len(df), args.repeats):,.0f} rows/s")
+    torch_s, numpy_s = import_time('torch'), import_time('numpy')
+    print(f"import torch {torch_s * 1000:.0f} ms vs import numpy {numpy_s * 1000:.0f} ms "
+          f"(saves {(torch_s - numpy_s) * 1000:.0f} ms per process)")
+
+if __name__ == "__main__":
+    main()
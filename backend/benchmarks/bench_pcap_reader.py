@@ -0,0 +1,79 @@
+"""Packets/sec and peak RSS of scapy's rdpcap vs. the streaming header-only reader.
+
+A synthetic capture of --size_mb MB is written first (or --pcap is used as
+is). Each reader runs in a fresh interpreter so ru_maxrss is per reader.
+rdpcap holds every dissected packet in memory; on small containers pass
+--skip_rdpcap for the full 1 GB run. Run from the backend directory:
+    python -m benchmarks.bench_pcap_reader [--size_mb 1024] [--skip_rdpcap]
+"""
+import argparse
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from benchmarks.synthetic_pcap import write_capture
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark streaming pcap reading against rdpcap')
+    parser.add_argument('--pcap', type=str, default=None, help='Existing capture to read instead of a synthetic one')
+    parser.add_argument('--size_mb', type=int, default=1024)
+    parser.add_argument('--skip_rdpcap', action='store_true')
+    parser.add_argument('--child', type=str, nargs=2, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def run_child(mode, path):
+    start = time.perf_counter()
+    if mode == 'rdpcap':
+        from scapy.all import rdpcap
+        packets = len(rdpcap(path))
+    elif mode == 'reader':
+        from src.Capture.pcapreader import PcapReader
+        reader = PcapReader(path, payload_bytes=0)
+        for _ in reader:
+            pass
+        packets = reader.packets
+    else:
+        import config
+        from src.Capture.pcapreader import PcapReader
+        from src.Capture.processpcap import group_packets_into_connections
+        reader = PcapReader(path, payload_bytes=config.PCAP_PAYLOAD_BYTES)
+        group_packets_into_connections(reader)
+        packets = reader.packets
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{packets} {elapsed:.2f} {peak_mb:.1f}")
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    if args.child:
+        run_child(*args.child)
+        return
+
+    path = args.pcap
+    if path is None:
+        with tempfile.NamedTemporaryFile(suffix='.pcap', delete=False) as f:
+            path = f.name
+        flows, packets = write_capture(path, target_bytes=args.size_mb * 2**20)
+        print(f"Synthetic capture: {os.path.getsize(path) / 2**20:.0f} MB, {packets} packets, {flows} flows")
+    try:
+        modes = ['reader', 'connections'] if args.skip_rdpcap else ['rdpcap', 'reader', 'connections']
+        for mode in modes:
+            result = subprocess.run([sys.executable, '-m', 'benchmarks.bench_pcap_reader', '--child', mode, path],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{mode:>12}: failed ({result.returncode}), {result.stderr.strip().splitlines()[-1:]}")
+                continue
+            packets, elapsed, peak = result.stdout.split()[-3:]
+            print(f"{mode:>12}: {int(packets) / float(elapsed):>12,.0f} packets/sec, {elapsed} s, peak RSS {peak} MB")
+    finally:
+        if args.pcap is None:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
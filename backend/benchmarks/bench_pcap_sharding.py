@@ -0,0 +1,89 @@
+"""Scaling of flow-hash sharded feature extraction over worker processes.
+
+A synthetic capture of --flows flows is written first (or --pcap is used as
+is), then process_pcap runs serially and with each --workers count, and
+every sharded result is compared with the serial one. Sharded extraction
+reads a classic pcap in two parallel passes: each worker hashes the packets
+of one byte range to find their shards, then each shard decodes and tracks
+only its own packets. The window features are merged on one core.
+
+Wall time depends on how many cores the host has, so every pass is also
+timed task by task in this process. The sum of the task times is the CPU
+the sharded extraction costs in all; the split, the slowest task of each
+pass and the merge add up to its wall time with a core per worker, before
+process start-up. Run from the backend directory:
+    python -m benchmarks.bench_pcap_sharding [--flows 200000] [--workers 1 4 8 16]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import warnings
+from benchmarks.synthetic_pcap import write_capture
+from src.Capture.processpcap import (extract_flow_features, locate_shards, merge_flow_features, process_pcap,
+                                     shard_frames, split_capture)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark sharded pcap feature extraction')
+    parser.add_argument('--pcap', type=str, default=None, help='Existing capture to read instead of a synthetic one')
+    parser.add_argument('--flows', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    return parser.parse_args()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def task_times(path, workers):
+    """(total task seconds, critical path seconds) of a sharded extraction, every task run in this process."""
+    if workers <= 1:
+        seconds, _ = timed(process_pcap, path)
+        return seconds, seconds
+    split_s, ranges = timed(split_capture, path, workers)
+    frames = [None] * workers
+    locate = []
+    if ranges is not None:
+        located = []
+        for span in ranges:
+            seconds, part = timed(locate_shards, path, span, workers)
+            locate.append(seconds)
+            located.append(part)
+        frames = shard_frames(located)
+    extract, parts = [], []
+    for shard in range(workers):
+        seconds, part = timed(extract_flow_features, path, None, shard, workers, None, frames[shard])
+        extract.append(seconds)
+        parts.append(part)
+    merge_s, _ = timed(merge_flow_features, parts)
+    total = split_s + sum(locate) + sum(extract) + merge_s
+    return total, split_s + max(locate, default=0.0) + max(extract) + merge_s
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    path = args.pcap
+    if path is None:
+        with tempfile.NamedTemporaryFile(suffix='.pcap', delete=False) as f:
+            path = f.name
+        flows, packets = write_capture(path, n_flows=args.flows)
+        print(f"Synthetic capture: {os.path.getsize(path) / 2**20:.0f} MB, {packets} packets, {flows} flows")
+    print(f"{os.cpu_count()} CPUs available")
+    try:
+        serial_s, reference = timed(process_pcap, path)
+        print(f"  serial: {serial_s:8.2f} s, {len(reference)} flows")
+        for workers in args.workers:
+            elapsed, batch = timed(process_pcap, path, None, workers)
+            total, critical = task_times(path, workers)
+            print(f"{workers:>2} workers: {elapsed:8.2f} s wall ({serial_s / elapsed:.2f}x), "
+                  f"tasks {total:6.2f} s CPU in all ({total / serial_s:.2f}x serial), "
+                  f"{critical:6.2f} s with a core per worker ({serial_s / critical:.2f}x), "
+                  f"identical to serial: {batch.features.equals(reference.features) and batch.metadata.equals(reference.metadata)}")
+    finally:
+        if args.pcap is None:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Peak RSS of handling a pcap upload: buffered in memory vs. spooled to disk and memory-mapped.
+
+'buffered' is the previous /predict/pcap path: the whole upload read into
+memory, written to a temporary file and parsed from it. 'spooled' copies it
+in IDS_UPLOAD_CHUNK_BYTES chunks with SHA-256 on the fly, then parses the
+spool file through a memory-mapped PcapReader. Both then extract flows.
+Each mode runs in a fresh interpreter so ru_maxrss is per mode. Run from the
+backend directory:
+    python -m benchmarks.bench_pcap_upload [--size_mb 2048]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+import config
+from benchmarks.synthetic_pcap import write_capture
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark buffered vs. spooled pcap upload handling')
+    parser.add_argument('--pcap', type=str, default=None, help='Existing capture to upload instead of a synthetic one')
+    parser.add_argument('--size_mb', type=int, default=2048)
+    parser.add_argument('--child', type=str, nargs=2, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def run_child(mode, path):
+    from api.uploads import _copy_upload
+    from src.Capture.pcapreader import PcapReader
+    from src.Capture.processpcap import group_packets_into_connections
+    start = time.perf_counter()
+    with open(path, 'rb') as upload, tempfile.NamedTemporaryFile(suffix='.pcap', delete=False) as spool:
+        if mode == 'buffered':
+            contents = upload.read()
+            spool.write(contents)
+        else:
+            _copy_upload(upload, spool, config.IDS_MAX_UPLOAD_BYTES, config.IDS_UPLOAD_CHUNK_BYTES, hashlib.sha256())
+    try:
+        reader = PcapReader(spool.name, payload_bytes=config.PCAP_PAYLOAD_BYTES, use_mmap=(mode == 'spooled'))
+        flows = len(group_packets_into_connections(reader))
+    finally:
+        os.unlink(spool.name)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{flows} {elapsed:.2f} {peak_mb:.1f}")
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    if args.child:
+        run_child(*args.child)
+        return
+
+    path = args.pcap
+    if path is None:
+        with tempfile.NamedTemporaryFile(suffix='.pcap', delete=False) as f:
+            path = f.name
+        write_capture(path, target_bytes=args.size_mb * 2**20)
+    print(f"Upload: {os.path.getsize(path) / 2**20:.0f} MB")
+    try:
+        for mode in ('buffered', 'spooled'):
+            result = subprocess.run([sys.executable, '-m', 'benchmarks.bench_pcap_upload', '--child', mode, path],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{mode:>9}: failed ({result.returncode}), {result.stderr.strip().splitlines()[-1:]}")
+                continue
+            flows, elapsed, peak = result.stdout.split()[-3:]
+            print(f"{mode:>9}: {flows} flows, {elapsed} s, peak RSS {peak} MB")
+    finally:
+        if args.pcap is None:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Row deduplication and the prediction cache on SYN-flood-heavy traffic.
+
+The dataset is built from KDDTest+: --flood_ratio of the rows are copies of a
+handful of neptune (SYN flood, flag S0) rows, as a flood looks after feature
+extraction, and the rest are distinct rows. Compares scoring every row,
+scoring distinct rows only, and distinct rows through the LRU cache across
+--requests consecutive requests. Run from the backend directory:
+    python -m benchmarks.bench_prediction_cache [--rows 200000] [--flood_ratio 0.9]
+"""
+import argparse
+import asyncio
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import config
+from src.IDS.inference.cache import PredictionCache, dedup_codes
+from src.IDS.inference.registry import ModelRegistry
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark duplicate-row collapsing and the prediction cache')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--flood_ratio', type=float, default=0.9)
+    parser.add_argument('--flood_templates', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def flood_requests(base, args):
+    rng = np.random.default_rng(args.seed)
+    syn = base[(base['class'] == 'neptune') & (base['flag'] == 'S0')].drop(columns=['class'])
+    rest = base.drop(columns=['class'])
+    templates = syn.sample(args.flood_templates, random_state=args.seed)
+    n_flood = int(args.rows * args.flood_ratio)
+    for _ in range(args.requests):
+        flood = templates.iloc[rng.integers(0, len(templates), n_flood)]
+        other = rest.iloc[rng.integers(0, len(rest), args.rows - n_flood)]
+        yield pd.concat([flood, other]).sample(frac=1, random_state=int(rng.integers(1 << 31))).reset_index(drop=True)
+
+async def run(registry, frames, mode):
+    cache = PredictionCache(config.IDS_PREDICTION_CACHE_SIZE) if mode == 'cache' else None
+    predict = lambda df: asyncio.to_thread(lambda frame: registry.score(frame)[0], df)
+    timings, outputs = [], []
+    for df in frames:
+        start = time.perf_counter()
+        if mode == 'all rows':
+            codes = await predict(df)
+        else:
+            codes = await dedup_codes(df, predict, cache, registry.version)
+        timings.append(time.perf_counter() - start)
+        outputs.append(np.asarray(codes))
+    return timings, outputs, cache
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    registry = ModelRegistry.load(preprocessor_save_path=args.preprocessor_path)
+    frames = list(flood_requests(pd.read_csv(args.data_path), args))
+    print(f"{args.requests} requests x {args.rows} rows, {args.flood_ratio:.0%} SYN flood copies of "
+          f"{args.flood_templates} rows")
+
+    reference = None
+    for mode in ('all rows', 'dedup', 'cache'):
+        timings, outputs, cache = asyncio.run(run(registry, frames, mode))
+        if reference is None:
+            reference = outputs
+        agree = all(np.array_equal(a, b) for a, b in zip(reference, outputs))
+        rates = ', '.join(f"{args.rows / t:,.0f}" for t in timings)
+        print(f"{mode:>9}: rows/sec per request [{rates}], identical to all rows: {agree}")
+        if cache is not None:
+            stats = cache.stats()
+            print(f"           cache hit rate {stats['hit_rate']:.1%}, duplicate rows {stats['duplicate_rate']:.1%}, "
+                  f"{stats['entries']} entries")
+
+if __name__ == "__main__":
+    main()
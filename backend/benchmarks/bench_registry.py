@@ -0,0 +1,46 @@
+"""p50 latency of a 10-row prediction with per-request loading vs. the shared registry.
+
+Run from the backend directory:
+    python -m benchmarks.bench_registry [--rows 10] [--repeats 50]
+"""
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+import config
+from src.IDS.training.predict import predict_new_data
+from src.IDS.inference.registry import ModelRegistry
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark model registry against per-request loading')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--rows', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=50)
+    return parser.parse_args()
+
+def time_calls(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    df = pd.read_csv(args.data_path).drop(columns=['class']).head(args.rows)
+
+    before = time_calls(lambda: predict_new_data(df, config.MODEL_SAVE_PATH, args.preprocessor_path,
+                                                 config.MAPPING_SAVE_PATH, config.DEVICE), args.repeats)
+    registry = ModelRegistry.load(preprocessor_save_path=args.preprocessor_path)
+    after = time_calls(lambda: registry.predict(df), args.repeats)
+
+    print(f"registry load: {registry.load_time_s * 1000:.1f} ms, memory: {registry.memory}")
+    print(f"{args.rows}-row request p50: per-request load {np.percentile(before, 50):.2f} ms, "
+          f"registry {np.percentile(after, 50):.2f} ms")
+
+if __name__ == "__main__":
+    main()
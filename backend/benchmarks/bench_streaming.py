@@ -0,0 +1,72 @@
+"""Peak RSS and time to first result of streaming prediction as the CSV grows.
+
+Each size runs in a fresh interpreter so ru_maxrss is per file. Run from the
+backend directory:
+    python -m benchmarks.bench_streaming [--sizes 100000 1000000 4000000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+import pandas as pd
+import config
+from src.IDS.inference.registry import ModelRegistry
+from src.IDS.inference.streaming import open_csv_chunks, next_chunk, stream_predictions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark streaming CSV prediction')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 4000000])
+    parser.add_argument('--child', type=str, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+async def run_child(csv_path, preprocessor_path):
+    registry = ModelRegistry.load(preprocessor_save_path=preprocessor_path)
+    started = time.perf_counter()
+    with open(csv_path, 'rb') as f:
+        reader = open_csv_chunks(f)
+        first = await next_chunk(reader)
+        ttfr = None
+        codes = lambda df: asyncio.to_thread(lambda frame: registry.score(frame)[0], df)
+        async for _ in stream_predictions(reader, first, codes, registry.class_names,
+                                          lambda df: df.drop(columns=['class']), started):
+            ttfr = ttfr or (time.perf_counter() - started) * 1000
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{ttfr:.1f} {elapsed:.2f} {peak_mb:.1f}")
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    if args.child:
+        asyncio.run(run_child(args.child, args.preprocessor_path))
+        return
+
+    base = pd.read_csv(args.data_path)
+    for n_rows in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+            path = f.name
+        reps = -(-n_rows // len(base))
+        for i in range(reps):
+            part = base.head(min(len(base), n_rows - i * len(base)))
+            part.to_csv(path, mode='a', header=(i == 0), index=False)
+        try:
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_streaming', '--child', path,
+                                  '--preprocessor_path', args.preprocessor_path],
+                                 check=True, capture_output=True, text=True).stdout.split()
+            ttfr, elapsed, peak = out[-3:]
+            print(f"{n_rows:>9} rows ({os.path.getsize(path) / 2**20:7.1f} MB): time to first result {ttfr} ms, "
+                  f"total {elapsed} s, peak RSS {peak} MB")
+        finally:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Scaling of the KDD time/host traffic features: per-connection rescans vs. the indexed windows.
+
+Connections are synthetic (a few hundred sources and destinations, a dozen
+services, a bursty clock) and are fed in end-time order, as process_pcap and
+the online extractor feed them. The O(n^2) reference is only timed up to
+--reference_max connections, where the two results are also compared.
+Run from the backend directory:
+    python -m benchmarks.bench_traffic_features [--sizes 1000 10000 100000]
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+from src.Capture.processpcap import get_time_features, get_host_features, get_tcp_flags
+from src.Capture.traffic_features import window_features
+from src.Capture.pcapreader import TCP_SYN, TCP_ACK, TCP_FIN, TCP_RST
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark indexed time/host traffic features')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--reference_max', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def synthetic_connections(n, seed):
+    rng = random.Random(seed)
+    clock, conns = 0.0, []
+    for _ in range(n):
+        clock += rng.expovariate(500)
+        conns.append(SimpleNamespace(
+            src=f"10.0.{rng.randrange(4)}.{rng.randrange(100)}", sport=rng.randrange(1024, 65535),
+            dst=f"192.168.{rng.randrange(2)}.{rng.randrange(100)}", dport=rng.choice([21, 22, 25, 53, 80, 443, 8080]),
+            end_ts=clock + rng.random() * 3,
+            flags=rng.choice([TCP_SYN, TCP_SYN | TCP_ACK | TCP_FIN, TCP_RST | TCP_ACK, TCP_ACK])))
+    conns.sort(key=lambda c: c.end_ts)
+    return conns
+
+def indexed_features(conns):
+    src, sport = [c.src for c in conns], [c.sport for c in conns]
+    dst, dport = [c.dst for c in conns], [c.dport for c in conns]
+    columns = window_features(src, sport, dst, dport, [c.end_ts for c in conns], [get_tcp_flags(c) for c in conns],
+                              range(len(conns)))
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def main():
+    args = parse_args()
+    for n in args.sizes:
+        conns = synthetic_connections(n, args.seed)
+        start = time.perf_counter()
+        indexed = indexed_features(conns)
+        indexed_s = time.perf_counter() - start
+        line = f"{n:>7} connections: indexed {indexed_s:8.3f} s"
+        if n <= args.reference_max:
+            start = time.perf_counter()
+            reference = [{**get_time_features(conns, c), **get_host_features(conns, c)} for c in conns]
+            reference_s = time.perf_counter() - start
+            line += f", rescan {reference_s:8.3f} s ({reference_s / indexed_s:,.0f}x), identical: {reference == indexed}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
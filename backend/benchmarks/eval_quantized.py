@@ -0,0 +1,79 @@
+"""fp32 vs. int8 dynamically quantized SCAE_GC on KDDTest+: accuracy, per-class recall, rows/sec and memory.
+
+Recall deltas are int8 minus fp32, against the labels in the dataset. Run
+from the backend directory:
+    python -m benchmarks.eval_quantized [--repeats 20] [--threads 1]
+"""
+import argparse
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import torch
+import config
+from src.IDS.inference.registry import ModelRegistry, _rss_bytes
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Evaluate the int8 quantized SCAE_GC against fp32')
+    parser.add_argument('--data_path', type=str, default=config.DATA_PATH)
+    parser.add_argument('--preprocessor_path', type=str, default=config.PREPROCESSOR_SAVE_PATH)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads (default: torch default)')
+    return parser.parse_args()
+
+def rows_per_sec(fn, n_rows, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return n_rows * repeats / (time.perf_counter() - start)
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    rss_before = _rss_bytes()
+    registry = ModelRegistry.load(preprocessor_save_path=args.preprocessor_path, backend='torch', quantized=False)
+    rss_fp32 = _rss_bytes()
+    registry = ModelRegistry.load(preprocessor_save_path=args.preprocessor_path, backend='torch', quantized=True)
+    rss_both = _rss_bytes()
+
+    df = pd.read_csv(args.data_path)
+    labels = df.pop('class').to_numpy()
+    features = registry.features(df)
+    fp32 = registry.predict_codes(features, quantized=False)
+    int8 = registry.predict_codes(features, quantized=True)
+
+    print(f"{len(df)} rows, torch threads {torch.get_num_threads()}")
+    print(f"Agreement fp32 vs int8: {np.mean(fp32 == int8) * 100:.2f}%")
+    fp32_labels, int8_labels = registry.class_names[fp32], registry.class_names[int8]
+    print(f"Accuracy: fp32 {np.mean(fp32_labels == labels) * 100:.2f}%, "
+          f"int8 {np.mean(int8_labels == labels) * 100:.2f}%")
+
+    print(f"{'class':>16} {'support':>8} {'fp32 recall':>12} {'int8 recall':>12} {'delta':>8}")
+    for name in sorted(set(registry.class_names) & set(labels)):
+        mask = labels == name
+        recall_fp32 = np.mean(fp32_labels[mask] == name) * 100
+        recall_int8 = np.mean(int8_labels[mask] == name) * 100
+        print(f"{name:>16} {mask.sum():>8} {recall_fp32:>11.2f}% {recall_int8:>11.2f}% {recall_int8 - recall_fp32:>+7.2f}")
+
+    for batch_rows in (256, len(features)):
+        batch = features[:batch_rows]
+        fp32_rate = rows_per_sec(lambda: registry.predict_codes(batch, quantized=False), len(batch), args.repeats)
+        int8_rate = rows_per_sec(lambda: registry.predict_codes(batch, quantized=True), len(batch), args.repeats)
+        print(f"Model rows/sec at {len(batch)} rows: fp32 {fp32_rate:,.0f}, int8 {int8_rate:,.0f} "
+              f"({int8_rate / fp32_rate:.2f}x)")
+
+    memory = registry.memory
+    print(f"Serialized weights: fp32 {memory['fp32_serialized_bytes'] / 1024:.1f} KiB, "
+          f"int8 {memory['int8_serialized_bytes'] / 1024:.1f} KiB")
+    if rss_before is not None:
+        print(f"RSS: fp32 registry +{(rss_fp32 - rss_before) / 2**20:.1f} MB, "
+              f"fp32 + int8 registry +{(rss_both - rss_fp32) / 2**20:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic Ethernet/IPv4 pcap captures for the capture benchmarks.
+
+Flows are generated in small batches whose packets are interleaved by
+timestamp: TCP sessions with handshakes, payloads and FIN or RST teardown,
+SYN-flood probes, UDP request/response pairs and ICMP echoes. Frames are
+packed with struct, so gigabyte captures take seconds rather than the
+minutes scapy would need.
+"""
+import random
+import struct
+
+SERVICE_PORTS = [80, 443, 22, 25, 53, 21, 23, 110, 143, 3306, 8080, 513, 514]
+PAYLOADS = [b'GET / HTTP/1.1\r\nHost: example\r\n\r\n', b'login failed for user root', b'login successful',
+            b'su - root', b'cat /etc/passwd', b'sh -c id', b'mkdir /tmp/x', b'root# whoami']
+
+def _ip(value):
+    return struct.pack('>I', value)
+
+def _frame(src, dst, proto, l4):
+    ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(l4), 0, 0x4000, 64, proto, 0, src, dst)
+    return b'\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb\x08\x00' + ip + l4
+
+def _tcp(sport, dport, flags, payload=b''):
+    return struct.pack('>HHIIBBHHH', sport, dport, 1, 1, 0x50, flags, 65535, 0, 0) + payload
+
+def _flow_packets(rng, start, client, server):
+    """(ts, frame) pairs for one randomly chosen flow starting at start."""
+    sport, dport = rng.randrange(1024, 65535), rng.choice(SERVICE_PORTS)
+    kind = rng.random()
+    t = start
+    packets = []
+    if kind < 0.55:
+        exchange = [(client, server, sport, dport, 0x02, b''), (server, client, dport, sport, 0x12, b''),
+                    (client, server, sport, dport, 0x10, b'')]
+        for _ in range(rng.randrange(1, 12)):
+            payload = rng.choice(PAYLOADS) * rng.randrange(1, 40)
+            if rng.random() < 0.5:
+                exchange.append((client, server, sport, dport, 0x18, payload))
+            else:
+                exchange.append((server, client, dport, sport, 0x18, payload))
+        teardown = 0x11 if rng.random() < 0.85 else 0x04
+        exchange += [(client, server, sport, dport, teardown, b''), (server, client, dport, sport, teardown, b'')]
+        for src, dst, sp, dp, flags, payload in exchange:
+            t += rng.expovariate(200)
+            packets.append((t, _frame(src, dst, 6, _tcp(sp, dp, flags, payload))))
+    elif kind < 0.75:
+        # SYN flood / scan probe that is never answered
+        packets.append((t, _frame(client, server, 6, _tcp(sport, dport, 0x02))))
+    elif kind < 0.93:
+        udp_dport = rng.choice([53, 123, 69, 161])
+        for src, dst, sp, dp in ((client, server, sport, udp_dport), (server, client, udp_dport, sport)):
+            payload = b'q' * rng.randrange(20, 200)
+            t += rng.expovariate(500)
+            packets.append((t, _frame(src, dst, 17, struct.pack('>HHHH', sp, dp, 8 + len(payload), 0) + payload)))
+    else:
+        ident = rng.randrange(65535)
+        for src, dst, icmp_type in ((client, server, 8), (server, client, 0)):
+            t += rng.expovariate(500)
+            packets.append((t, _frame(src, dst, 1, struct.pack('>BBHHH', icmp_type, 0, 0, ident, 1) + b'p' * 56)))
+    return packets
+
+def write_capture(path, n_flows=None, target_bytes=None, seed=0, clients=2000, servers=200, flows_per_second=2000,
+                  batch_flows=256):
+    """Write a capture of n_flows flows, or of about target_bytes bytes; returns (flows, packets)."""
+    if n_flows is None and target_bytes is None:
+        raise ValueError("Pass n_flows or target_bytes")
+    rng = random.Random(seed)
+    client_ips = [_ip(0x0A000000 + rng.randrange(1 << 16)) for _ in range(clients)]
+    server_ips = [_ip(0xC0A80000 + rng.randrange(1 << 16)) for _ in range(servers)]
+    record = struct.Struct('<IIII')
+    flows = packets = 0
+    clock = 1700000000.0
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        written = 24
+        while (n_flows is None or flows < n_flows) and (target_bytes is None or written < target_bytes):
+            size = batch_flows if n_flows is None else min(batch_flows, n_flows - flows)
+            batch = []
+            for _ in range(size):
+                clock += rng.expovariate(flows_per_second)
+                batch.extend(_flow_packets(rng, clock, rng.choice(client_ips), rng.choice(server_ips)))
+            batch.sort(key=lambda item: item[0])
+            chunks = []
+            for ts, frame in batch:
+                seconds = int(ts)
+                chunks.append(record.pack(seconds, int((ts - seconds) * 1e6), len(frame), len(frame)))
+                chunks.append(frame)
+                written += 16 + len(frame)
+            f.write(b''.join(chunks))
+            flows += size
+            packets += len(batch)
+    return flows, packets
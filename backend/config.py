@@ -29,6 +29,29 @@ TEST_RATIO = 0.2
 EPOCHS = 1
 LEARNING_RATE = 0.001
 DEVICE = 'cpu'
+# Serve preprocessing through the fused NumPy transform instead of the pandas pipeline
+IDS_COMPILED_TRANSFORM = True
+# 'torch' runs SCAE_GC in PyTorch, 'numpy' runs the folded torch-free engine
+IDS_INFERENCE_BACKEND = 'torch'
+NUMPY_ENGINE_PATH = os.path.join(MODEL_SAVE_PATH, "SCAE_GC.npz")
+# Build an int8 dynamically quantized SCAE_GC next to the fp32 model (torch backend on cpu only)
+IDS_QUANTIZED_MODEL = False
+# Serve requests that don't pass ?quantized= with the int8 model when it is loaded
+IDS_QUANTIZED_DEFAULT = False
+# Micro-batching of concurrent prediction requests
+IDS_MAX_BATCH_ROWS = 4096
+IDS_MAX_BATCH_DELAY_MS = 2
+# Inference worker processes (0 runs inference in threads of the API process)
+IDS_POOL_WORKERS = 2
+IDS_POOL_MAX_QUEUE = 16
+IDS_POOL_PER_USER_LIMIT = 4
+IDS_MAX_ROWS_PER_REQUEST = 1000000
+IDS_MAX_PACKETS_PER_REQUEST = 5000000
+# Rows parsed and scored per chunk by /predict/stream
+IDS_STREAM_CHUNK_ROWS = 50000
+# Score each distinct feature row once per request, and remember codes across requests (0 disables the cache)
+IDS_DEDUPLICATE_ROWS = True
+IDS_PREDICTION_CACHE_SIZE = 100000
 
 RIGHT_SKEWED = ['0', '491', '0.1', '0.2', '0.3', '0.4', '0.5', '0.6', '0.7', '0.8', '0.9', '0.10', '0.11', '0.12', '0.13', '0.14', '0.15', '0.16', '0.18', '2', '2.1', '0.00', '0.00.1', '0.00.2']
 LEFT_SKEWED = ['20', '150', '1.00']
@@ -47,5 +70,116 @@ NUMERIC = ['duration', 'src_bytes', 'dst_bytes', 'wrong_fragment',
        'dst_host_srv_serror_rate', 'dst_host_rerror_rate',
        'dst_host_srv_rerror_rate', 'other']
 
+# Model input columns in order: the 41 KDD features plus 'other'
+KDD_FEATURE_COLUMNS = [
+    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
+    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
+    'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
+    'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
+    'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
+    'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
+    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
+    'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
+    'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
+    'dst_host_rerror_rate', 'dst_host_srv_rerror_rate', 'other'
+]
+KDD_CATEGORICAL_COLUMNS = ['protocol_type', 'service', 'flag']
+
+# Default input and output of the processpcap command line; API captures use session directories
 PCAP_SAVE_PATH = os.path.join(BASE_DIR, 'data', 'raw', "capture.pcap")
-PCAP_OUTPUT_PATH = os.path.join(BASE_DIR, 'data', 'raw', "output.arff")
\ No newline at end of file
+PCAP_OUTPUT_PATH = os.path.join(BASE_DIR, 'data', 'raw', "output.arff")
+# Payload bytes kept per packet for the content features (0 skips payloads entirely)
+PCAP_PAYLOAD_BYTES = 65535
+# Captures with a smaller snap length have truncated payloads, so their content features are left at 0
+PCAP_CONTENT_MIN_SNAPLEN = 65535
+# Packets decoded into one columnar table before it is folded into the flow aggregates
+PCAP_TABLE_CHUNK_PACKETS = 65536
+
+# Flow tracking: a flow ends after this many idle seconds, or this many seconds after it opened
+FLOW_IDLE_TIMEOUT = 120
+FLOW_ACTIVE_TIMEOUT = 3600
+# Seconds a closed TCP flow still accepts stragglers (last ACKs, retransmitted FINs)
+FLOW_CLOSE_LINGER = 2
+# Live flows kept at once; the least recently active flow is evicted beyond this
+FLOW_MAX_LIVE = 1000000
+# Processes a single capture's flows are sharded across by default, and the most a request may ask for
+PCAP_EXTRACT_WORKERS = 1
+PCAP_MAX_EXTRACT_WORKERS = 32
+# Indicator strings per content feature, compiled into one payload matcher
+CONTENT_PATTERNS_PATH = os.path.join(BASE_DIR, 'src', 'Capture', 'content_patterns.json')
+# Payloads longer than this count towards the hot feature
+CONTENT_HOT_PAYLOAD_BYTES = 100
+# Pattern count from which one automaton pass beats searching the lowered payload once per pattern
+# (about 20 in benchmarks/bench_content_matcher; below that the per-pattern search is faster)
+CONTENT_AUTOMATON_MIN_PATTERNS = 20
+# Memory-map captures for parsing instead of reading them record by record
+PCAP_READER_MMAP = True
+# Largest request body accepted, enforced while it streams in, and the chunk size uploads are spooled to disk in
+IDS_MAX_UPLOAD_BYTES = 4 * 2**30
+IDS_UPLOAD_CHUNK_BYTES = 2**20
+# Directory upload spool files are written to (None uses the system temporary directory)
+IDS_UPLOAD_SPOOL_DIR = None
+# KDD traffic windows: seconds for the same-source time window, connections in the same-destination host window
+KDD_TIME_WINDOW = 2
+KDD_HOST_WINDOW = 100
+# Destination host window state is dropped after this many idle seconds, and least recently used beyond this many hosts
+KDD_HOST_STATE_TTL = 3600
+KDD_MAX_HOST_STATES = 100000
+# Packets per flow-table chunk for the online feature engine; smaller chunks emit closed connections sooner
+KDD_ONLINE_CHUNK_PACKETS = 1024
+
+# Feature export: rows formatted per write, file buffer size, and Parquet codec
+EXPORT_CHUNK_ROWS = 65536
+EXPORT_BUFFER_BYTES = 1024 * 1024
+EXPORT_PARQUET_COMPRESSION = 'zstd'
+
+# Continuous capture: tshark ring buffer segments (rotated at whichever limit comes first) and the segment worker
+CONTINUOUS_CAPTURE_DIR = os.path.join(BASE_DIR, 'data', 'raw', 'ring')
+CONTINUOUS_SEGMENT_MB = 16
+CONTINUOUS_SEGMENT_SECONDS = 30
+CONTINUOUS_RING_FILES = 8
+# Finished segments allowed to wait for analysis; older ones are dropped so lag stays bounded
+CONTINUOUS_MAX_BACKLOG = 4
+CONTINUOUS_POLL_SECONDS = 1.0
+# Seconds tshark must stay up after launch for an interface to count as working
+CONTINUOUS_START_GRACE_SECONDS = 1.0
+CONTINUOUS_STOP_TIMEOUT = 10
+# 'delete' analysed segments, or 'archive' them keeping the newest CONTINUOUS_ARCHIVE_SEGMENTS
+CONTINUOUS_RETENTION = 'delete'
+CONTINUOUS_ARCHIVE_DIR = os.path.join(BASE_DIR, 'data', 'raw', 'ring_archive')
+CONTINUOUS_ARCHIVE_SEGMENTS = 100
+# Per-segment reports kept for status
+CONTINUOUS_REPORT_SEGMENTS = 50
+
+# Capture sessions: each capture request gets its own spool directory, removed when the session ends
+CAPTURE_SESSIONS_DIR = os.path.join(BASE_DIR, 'data', 'raw', 'sessions')
+# Open sessions of any kind: one-shot captures, live detection streams and the continuous capture
+CAPTURE_MAX_SESSIONS = 4
+# Longest duration, in seconds, a one-shot capture or live stream may ask for
+CAPTURE_MAX_DURATION = 3600
+# Seconds tshark must stay up after launch for an interface to count as working
+CAPTURE_START_GRACE_SECONDS = 1.0
+# Seconds tshark gets to close its file after terminate (or after overrunning its duration) before it is killed
+CAPTURE_STOP_TIMEOUT = 10
+# Ended sessions kept for status
+CAPTURE_SESSION_HISTORY = 50
+# Capture profiles: 'full' keeps whole packets (snaplen 0) for the content features, 'header' keeps
+# only link, IP and transport headers (up to 128 bytes covers VLAN tags, IPv6 and TCP options)
+CAPTURE_PROFILE_SNAPLEN = {'full': 0, 'header': 128}
+CAPTURE_DEFAULT_PROFILE = 'full'
+
+# Live capture: tshark pcap on stdout, parsed and scored as connections close
+LIVE_READ_BYTES = 256 * 1024
+# Packets per flow-table chunk; at 50k packets/sec 1024 packets is ~20 ms
+LIVE_CHUNK_PACKETS = 1024
+# FIN/RST-closed connections wait this long for stray teardown packets (FLOW_CLOSE_LINGER is for offline files)
+LIVE_CLOSE_LINGER = 0.25
+# Buffered packets are folded in at least this often; with no input for this long the flow clock advances
+# by wall time, so quiet links still get verdicts
+LIVE_FLUSH_SECONDS = 0.25
+# Recent close-to-verdict latencies kept for stats
+LIVE_LATENCY_SAMPLES = 10000
+# Verdicts buffered per streaming client, in connections; beyond that they are coalesced into per-class counts
+LIVE_STREAM_CLIENT_BUFFER = 2000
+# Running totals are pushed this often when no verdicts are
+LIVE_STREAM_HEARTBEAT_SECONDS = 5.0
@@ -1,12 +1,40 @@
+from contextlib import asynccontextmanager
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.auth import router as auth_router
+from api.uploads import UploadLimitMiddleware
 from api.IDS.routes import ids_router
 from api.CTGAN.routes import ctgan_router
 from api.Capture.routes import capture_router
 from api.Training.routes import training_router
+from src.IDS.inference.registry import load_registry
+from src.IDS.inference.batcher import get_batcher, all_batchers
+from src.IDS.inference.worker_pool import get_pool
+from src.Capture.continuous import get_continuous_capture
+from src.Capture.sessions import get_session_manager
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the IDS models once so requests never touch the model files
+    try:
+        load_registry()
+        await get_pool().start()
+    except Exception as e:
+        logging.error(f"IDS model registry not loaded at startup, will retry on first request: {e}")
+    get_batcher().start()
+    yield
+    if get_continuous_capture().state in ('running', 'failed'):
+        await get_continuous_capture().stop()
+    await get_session_manager().shutdown()
+    for batcher in all_batchers():
+        await batcher.stop()
+    await get_pool().stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Oversized request bodies are refused while they stream in
+app.add_middleware(UploadLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
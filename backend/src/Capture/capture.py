@@ -1,91 +1,62 @@
-import subprocess
-import logging
 import os
 import shutil
 import config
+from .pcapreader import payloads_complete
 
-def capture_packets_tshark(capture_duration):
-    """
-    Capture network packets using tshark for the specified duration.
-    
-    Args:
-        capture_duration (int): Duration in seconds to capture packets
-        
-    Raises:
-        FileNotFoundError: If tshark is not installed or not found
-        subprocess.CalledProcessError: If capture command fails
-        Exception: For other capture-related errors
+# Interfaces tried in order when none is given
+CAPTURE_INTERFACES = ["Wi-Fi", "Ethernet", "any"]
+
+class CaptureProfile:
+    """How a capture is taken: snap length, BPF filter and capture buffer, as tshark arguments.
+
+    The 'header' profile keeps only packet headers, which cuts disk use and
+    parsing time; its captures get no content features. 'full' keeps whole
+    packets. An explicit snaplen overrides the profile's, and content
+    features follow the snap length actually used, never the profile name.
     """
-    # Check if tshark is available
+
+    def __init__(self, name=config.CAPTURE_DEFAULT_PROFILE, snaplen=None, bpf_filter=None, buffer_mb=None):
+        if name not in config.CAPTURE_PROFILE_SNAPLEN:
+            raise ValueError(f"Unknown capture profile '{name}', expected one of {', '.join(config.CAPTURE_PROFILE_SNAPLEN)}")
+        if snaplen is not None and snaplen < 0:
+            raise ValueError("snaplen must be 0 (whole packets) or positive")
+        if buffer_mb is not None and buffer_mb < 1:
+            raise ValueError("buffer_mb must be positive")
+        self.name = name
+        self.snaplen = config.CAPTURE_PROFILE_SNAPLEN[name] if snaplen is None else snaplen
+        self.bpf_filter = bpf_filter or None
+        self.buffer_mb = buffer_mb
+
+    @property
+    def content_features(self):
+        return payloads_complete(self.snaplen)
+
+    def tshark_arguments(self):
+        arguments = []
+        if self.snaplen:
+            arguments += ['-s', str(self.snaplen)]
+        if self.buffer_mb:
+            # libpcap's capture ring buffer; a larger one rides out bursts without kernel drops
+            arguments += ['-B', str(self.buffer_mb)]
+        if self.bpf_filter:
+            arguments += ['-f', self.bpf_filter]
+        return arguments
+
+    def as_dict(self):
+        return {"name": self.name, "snaplen": self.snaplen, "bpf_filter": self.bpf_filter,
+                "buffer_mb": self.buffer_mb, "content_features": self.content_features}
+
+def find_tshark():
+    """Path of the tshark executable (unquoted), from the usual Wireshark install locations or PATH."""
     tshark_paths = [
         "C:\\Program Files\\Wireshark\\tshark.exe",
         "C:\\Program Files (x86)\\Wireshark\\tshark.exe",
-        "tshark"  # If in PATH
     ]
-    
-    tshark_path = None
     for path in tshark_paths:
-        if path == "tshark":
-            # Check if tshark is in PATH
-            if shutil.which("tshark"):
-                tshark_path = "tshark"
-                break
-        elif os.path.exists(path):
-            tshark_path = f'"{path}"'
-            break
-    
-    if not tshark_path:
-        raise FileNotFoundError("Wireshark/tshark is not installed or not found in expected locations. Please install Wireshark to use packet capture functionality.")
-    
-    try:
-        # Use config path for saving capture file
-        output_path = config.PCAP_SAVE_PATH
-        
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        # Try different network interfaces
-        interfaces = ["Wi-Fi", "Ethernet", "any"]
-        
-        for interface in interfaces:
-            try:
-                command = f'{tshark_path} -i {interface} -a duration:{capture_duration} -w "{output_path}"'
-                logging.info(f"Attempting to capture on interface: {interface}")
-                subprocess.run(command, shell=True, check=True, timeout=capture_duration + 10)
-                logging.info(f"Packet capture completed successfully on interface: {interface}")
-                return
-            except subprocess.CalledProcessError as e:
-                logging.warning(f"Failed to capture on interface {interface}: {e}")
-                continue
-        
-        # If all interfaces failed
-        raise Exception("Failed to capture packets on any available network interface")
-        
-    except subprocess.TimeoutExpired:
-        logging.error("Packet capture timed out")
-        raise Exception("Packet capture operation timed out")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Capture command failed: {e}")
-        raise Exception(f"Packet capture failed: {e}")
-    except Exception as e:
-        logging.error(f"Unexpected capture error: {e}")
-        raise
-
-def capture_packets_tshark_wrapper(capture_duration):
-    """
-    Wrapper function for packet capture with enhanced error handling.
-    
-    Args:
-        capture_duration (int): Duration in seconds to capture packets
-        
-    Raises:
-        Exception: Re-raises any exceptions from the capture process
-    """
-    try:
-        capture_packets_tshark(capture_duration)
-    except FileNotFoundError as e:
-        logging.error(f"Dependency error: {str(e)}")
-        raise Exception(f"Required software not found: {str(e)}")
-    except Exception as e:
-        logging.error(f"Capture error: {str(e)}")
-        raise Exception(f"Packet capture failed: {str(e)}")
\ No newline at end of file
+        if os.path.exists(path):
+            return path
+    # If in PATH
+    found = shutil.which("tshark")
+    if found:
+        return found
+    raise FileNotFoundError("Wireshark/tshark is not installed or not found in expected locations. Please install Wireshark to use packet capture functionality.")
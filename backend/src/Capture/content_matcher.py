@@ -0,0 +1,126 @@
+"""Single-pass payload inspection for the KDD content features.
+
+Every indicator pattern from the pattern file (config.CONTENT_PATTERNS_PATH,
+feature name -> list of strings) is matched case-insensitively. From
+CONTENT_AUTOMATON_MIN_PATTERNS patterns on they are compiled into one
+Aho-Corasick automaton and each payload is scanned once, whatever the number
+of patterns. A smaller set, such as the configured one, is searched in the
+lowered payload once per pattern, which is faster than the automaton and
+its extra copy of the payload at that size. The per-pattern hit counts are
+then mapped onto the content features: a feature is hit by a payload when
+any of its patterns occurs in it. pyahocorasick is optional and not in
+requirements.txt, since the configured set does not use it; without it
+every pattern is searched separately with the same results.
+"""
+import json
+import logging
+import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Content features counted per payload, and the ones that only record whether any payload matched
+CONTENT_COLUMNS = ('hot', 'num_failed_logins', 'logged_in', 'root_shell', 'su_attempted', 'num_root',
+                   'num_file_creations', 'num_shells', 'num_access_files')
+CONTENT_ANY = ('logged_in', 'root_shell', 'su_attempted')
+
+def _automaton(patterns):
+    try:
+        import ahocorasick
+    except ImportError:
+        logging.warning("pyahocorasick is not installed; payloads are searched once per content pattern.")
+        return None
+    automaton = ahocorasick.Automaton()
+    for index, pattern in enumerate(patterns):
+        automaton.add_word(pattern.decode('latin-1'), index)
+    automaton.make_automaton()
+    return automaton
+
+def _overlaps_itself(pattern):
+    """Whether two occurrences of pattern can overlap, as 'aa' does in 'aaa'."""
+    return any(pattern[:n] == pattern[-n:] for n in range(1, len(pattern)))
+
+def _count_overlapping(payload, pattern):
+    count, start = 0, payload.find(pattern)
+    while start >= 0:
+        count += 1
+        start = payload.find(pattern, start + 1)
+    return count
+
+class ContentMatcher:
+    """Compiled indicator patterns for the content features.
+
+    patterns maps a CONTENT_COLUMNS feature to the strings that indicate it.
+    hot is also hit by any payload longer than hot_payload_bytes. The
+    automaton is used from automaton_min_patterns distinct patterns on.
+    """
+
+    def __init__(self, patterns, hot_payload_bytes=config.CONTENT_HOT_PAYLOAD_BYTES,
+                 automaton_min_patterns=config.CONTENT_AUTOMATON_MIN_PATTERNS):
+        unknown = set(patterns) - set(CONTENT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown content features in the pattern set: {', '.join(sorted(unknown))}")
+        self.hot_payload_bytes = hot_payload_bytes
+        self.patterns = []
+        # Feature positions each pattern counts towards; a pattern may indicate several features
+        self.features = []
+        for feature, strings in patterns.items():
+            for string in strings:
+                pattern = string.encode('latin-1').lower() if isinstance(string, str) else bytes(string).lower()
+                if not pattern:
+                    raise ValueError(f"Empty content pattern for {feature}")
+                if pattern not in self.patterns:
+                    self.patterns.append(pattern)
+                    self.features.append(set())
+                self.features[self.patterns.index(pattern)].add(CONTENT_COLUMNS.index(feature))
+        self.features = [tuple(sorted(positions)) for positions in self.features]
+        # bytes.count skips overlapping occurrences, which the automaton reports
+        self._overlapping = [_overlaps_itself(pattern) for pattern in self.patterns]
+        self._automaton = _automaton(self.patterns) if len(self.patterns) >= automaton_min_patterns else None
+
+    @classmethod
+    def from_file(cls, path=config.CONTENT_PATTERNS_PATH):
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def matches(self, payload):
+        """Index of the pattern behind every case-insensitive match in payload."""
+        if self._automaton is not None:
+            return [index for _, index in self._automaton.iter(payload.lower().decode('latin-1'))]
+        payload = payload.lower()
+        return [index for index, (pattern, overlapping) in enumerate(zip(self.patterns, self._overlapping))
+                for _ in range(_count_overlapping(payload, pattern) if overlapping else payload.count(pattern))]
+
+    def pattern_counts(self, payload):
+        """Occurrences of every pattern in payload, keyed by pattern."""
+        counts = dict.fromkeys(self.patterns, 0)
+        for index in self.matches(payload):
+            counts[self.patterns[index]] += 1
+        return counts
+
+    def hits(self, length, payload):
+        """One 0/1 per CONTENT_COLUMNS entry for a single non-empty payload of length bytes."""
+        row = [0] * len(CONTENT_COLUMNS)
+        if length > self.hot_payload_bytes:
+            row[0] = 1
+        features = self.features
+        for index in self.matches(payload):
+            for position in features[index]:
+                row[position] = 1
+        return row
+
+    def feature_hits(self, payloads):
+        """Payloads hitting each content feature, keyed by feature."""
+        totals = [0] * len(CONTENT_COLUMNS)
+        for payload in payloads:
+            for position, hit in enumerate(self.hits(len(payload), payload)):
+                totals[position] += hit
+        return dict(zip(CONTENT_COLUMNS, totals))
+
+_matcher = None
+
+def get_content_matcher():
+    """Process-wide matcher compiled from the configured pattern file."""
+    global _matcher
+    if _matcher is None:
+        _matcher = ContentMatcher.from_file()
+    return _matcher
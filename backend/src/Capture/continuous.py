@@ -0,0 +1,319 @@
+"""Continuous capture: tshark writes a ring buffer of pcap segments and a worker analyses each finished one.
+
+tshark rotates to a new segment after segment_mb megabytes or
+segment_seconds seconds, whichever comes first, and keeps at most
+ring_files segments on disk, deleting the oldest itself. A segment is
+finished once tshark has moved on to a newer one, or has exited.
+
+The worker takes finished segments oldest first and runs extraction and
+inference on them. To bound lag, when more than max_backlog finished
+segments are waiting, the oldest are dropped unanalysed. Segments that
+tshark rotated away before the worker reached them also count as dropped.
+Analysed segments are deleted, or moved to archive_dir, which keeps the
+newest archive_segments of them.
+
+Each segment is analysed on its own, so a connection that spans a
+rotation shows up once per segment. Segments are taken with a
+CaptureProfile; those of a header-only profile get no content features.
+
+The capture holds a 'continuous' capture session for as long as it runs,
+so it counts against CAPTURE_MAX_SESSIONS and shows up with the other
+sessions; cancelling that session stops the capture. Only the owner that
+started the capture (or an admin, passing owner=None) can stop it.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import time
+from collections import deque
+import numpy as np
+import config
+from .capture import CAPTURE_INTERFACES, CaptureProfile, find_tshark
+from .sessions import CaptureAccessError, get_session_manager
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RETENTION_POLICIES = ('delete', 'archive')
+
+class ContinuousCaptureError(RuntimeError):
+    """Raised when continuous capture cannot be started or stopped in its current state."""
+
+def segment_number(name):
+    """Ring index of a tshark ring-buffer file, named <prefix>_<NNNNN>_<YYYYmmddHHMMSS>.pcap."""
+    return int(name.rsplit('_', 2)[-2])
+
+async def analyze_segment(path, quantized=None):
+    """Extract and score one segment on the inference pool; returns its connection count and summary."""
+    from src.IDS.inference.batcher import predict_codes
+    from src.IDS.inference.registry import get_registry
+    from src.IDS.inference.response import summarize
+    from src.IDS.inference.worker_pool import get_pool, extract_pcap_features
+    batch = await get_pool().run(extract_pcap_features, path)
+    registry = get_registry()
+    codes = await predict_codes(batch.features, registry.use_quantized(quantized)) if len(batch) else \
+        np.empty(0, dtype=np.int64)
+    return {"connections": len(batch), "summary": summarize(codes, registry.class_names)}
+
+class ContinuousCapture:
+    """One tshark ring-buffer capture at a time, with the asyncio task that analyses its segments."""
+    PREFIX = 'ring'
+
+    def __init__(self, analyze=analyze_segment, directory=config.CONTINUOUS_CAPTURE_DIR,
+                 archive_dir=config.CONTINUOUS_ARCHIVE_DIR, poll_seconds=config.CONTINUOUS_POLL_SECONDS):
+        self.analyze = analyze
+        self.directory = directory
+        self.archive_dir = archive_dir
+        self.poll_seconds = poll_seconds
+        self.state = 'stopped'
+        self.error = None
+        self._process = None
+        self._worker = None
+        self._stopping = False
+        self.session = None
+        self.owner = None
+        self.profile = CaptureProfile()
+        self._reset()
+
+    def _reset(self, **settings):
+        self.settings = settings
+        self.interface = None
+        self.session_dir = None
+        self.started_at = None
+        self.segments_processed = 0
+        self.segments_failed = 0
+        self.dropped_segments = 0
+        self.totals = {"connections": 0, "normal": 0, "attacks": 0}
+        self.reports = deque(maxlen=config.CONTINUOUS_REPORT_SEGMENTS)
+        self._next_number = 1
+
+    @property
+    def running(self):
+        return self.state == 'running'
+
+    def tshark_command(self, interface):
+        settings = self.settings
+        return [find_tshark(), '-i', interface, '-q', '-F', 'pcap', *self.profile.tshark_arguments(),
+                '-w', os.path.join(self.session_dir, f'{self.PREFIX}.pcap'),
+                '-b', f"filesize:{settings['segment_mb'] * 1024}",
+                '-b', f"duration:{settings['segment_seconds']}",
+                '-b', f"files:{settings['ring_files']}"]
+
+    async def start(self, interface=None, segment_mb=config.CONTINUOUS_SEGMENT_MB,
+                    segment_seconds=config.CONTINUOUS_SEGMENT_SECONDS, ring_files=config.CONTINUOUS_RING_FILES,
+                    max_backlog=config.CONTINUOUS_MAX_BACKLOG, retention=config.CONTINUOUS_RETENTION, profile=None,
+                    owner=None):
+        if self.state in ('running', 'starting'):
+            raise ContinuousCaptureError("Continuous capture is already running")
+        if retention not in RETENTION_POLICIES:
+            raise ValueError(f"retention must be one of {', '.join(RETENTION_POLICIES)}")
+        if min(segment_mb, segment_seconds, ring_files, max_backlog) < 1:
+            raise ValueError("segment_mb, segment_seconds, ring_files and max_backlog must be positive")
+        profile = profile if profile is not None else CaptureProfile()
+        session = get_session_manager().open('continuous', owner=owner, profile=profile)
+        previous_state, self.state = self.state, 'starting'
+        self.profile = profile
+        self._reset(segment_mb=segment_mb, segment_seconds=segment_seconds, ring_files=ring_files,
+                    max_backlog=max_backlog, retention=retention)
+        self.session_dir = os.path.join(self.directory, time.strftime('%Y%m%d%H%M%S'))
+        os.makedirs(self.session_dir, exist_ok=True)
+
+        try:
+            process, candidate = await self._launch(interface)
+        except BaseException as e:
+            shutil.rmtree(self.session_dir, ignore_errors=True)
+            session.fail(e)
+            self.state = previous_state
+            raise
+        session.attach(process, candidate, on_cancel=self._cancel)
+
+        self.session = session
+        self.owner = owner
+        self._process = process
+        self.interface = candidate
+        self.started_at = time.time()
+        self.state, self.error, self._stopping = 'running', None, False
+        self._worker = asyncio.create_task(self._run())
+        logging.info(f"Continuous capture started on {candidate} into {self.session_dir}")
+        return self.status()
+
+    async def _launch(self, interface):
+        # Like the one-shot capture, try the known interfaces until tshark stays up on one
+        errors = []
+        for candidate in ([interface] if interface else CAPTURE_INTERFACES):
+            log_path = os.path.join(self.session_dir, 'tshark.log')
+            with open(log_path, 'w') as log:
+                process = await asyncio.create_subprocess_exec(*self.tshark_command(candidate),
+                                                               stdout=asyncio.subprocess.DEVNULL, stderr=log)
+            try:
+                await asyncio.wait_for(process.wait(), config.CONTINUOUS_START_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                return process, candidate
+            with open(log_path, 'r', errors='replace') as log:
+                errors.append(f"{candidate}: {log.read().strip()[-200:] or f'exit code {process.returncode}'}")
+            logging.warning(f"Continuous capture failed to start on interface {candidate}")
+        raise ContinuousCaptureError(f"tshark could not capture on any interface: {'; '.join(errors)}")
+
+    async def _cancel(self):
+        # The session was cancelled through the session manager
+        if self.state in ('running', 'failed'):
+            await self.stop()
+
+    async def stop(self, owner=None):
+        """Stop tshark, analyse the segments it left behind and clean up; also clears a failed capture.
+
+        Raises CaptureAccessError when owner is given and another owner started the capture.
+        """
+        if self.state not in ('running', 'failed'):
+            raise ContinuousCaptureError("Continuous capture is not running")
+        if owner is not None and owner != self.owner:
+            raise CaptureAccessError(f"The continuous capture was started by {self.owner}")
+        self._stopping = True
+        self.state = 'stopping'
+        if self._process.returncode is None:
+            self._process.terminate()
+            try:
+                await asyncio.wait_for(self._process.wait(), config.CONTINUOUS_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.warning("tshark did not exit after terminate, killing it")
+                self._process.kill()
+                await self._process.wait()
+        # The worker analyses the last segments once it sees tshark has exited
+        await self._worker
+        # Analysed segments are already deleted or archived; this removes tshark's log and any dropped leftovers
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+        self.session.close()
+        self.state = 'stopped'
+        logging.info(f"Continuous capture stopped after {self.segments_processed} segments, "
+                     f"{self.dropped_segments} dropped")
+        return self.status()
+
+    def _segments(self):
+        names = [name for name in os.listdir(self.session_dir)
+                 if name.startswith(self.PREFIX + '_') and name.endswith('.pcap')]
+        return sorted(names, key=segment_number)
+
+    def _finished_segments(self, exited):
+        """Finished segments still to analyse, after accounting for dropped ones."""
+        names = self._segments()
+        if not exited:
+            # The newest segment is still being written
+            names = names[:-1]
+        if not names:
+            return []
+        # Segments tshark already rotated away
+        self.dropped_segments += max(0, segment_number(names[0]) - self._next_number)
+        backlog = self.settings['max_backlog']
+        if len(names) > backlog:
+            for name in names[:-backlog]:
+                self._discard(os.path.join(self.session_dir, name))
+            self.dropped_segments += len(names) - backlog
+            logging.warning(f"Continuous capture is behind: dropped {len(names) - backlog} segments")
+            names = names[-backlog:]
+        self._next_number = segment_number(names[-1]) + 1
+        return [os.path.join(self.session_dir, name) for name in names]
+
+    async def _run(self):
+        try:
+            while True:
+                exited = self._process.returncode is not None
+                for path in self._finished_segments(exited):
+                    await self._analyze(path)
+                if exited:
+                    break
+                await asyncio.sleep(self.poll_seconds)
+            if not self._stopping:
+                self.state = 'failed'
+                self.error = f"tshark exited unexpectedly with code {self._process.returncode}"
+                logging.error(f"Continuous capture: {self.error}")
+                # Frees the session's slot; stop() still clears the capture
+                self.session.fail(self.error)
+        except Exception as e:
+            logging.error(f"Continuous capture worker failed: {e}")
+            self.state, self.error = 'failed', str(e)
+            if self._process.returncode is None:
+                self._process.terminate()
+            self.session.fail(e)
+
+    async def _analyze(self, path):
+        name = os.path.basename(path)
+        try:
+            finished_at = os.path.getmtime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            self.dropped_segments += 1
+            return
+        started = time.time()
+        try:
+            report = await self.analyze(path)
+        except FileNotFoundError:
+            # Rotated away by tshark while waiting for a worker
+            self.dropped_segments += 1
+            return
+        except Exception as e:
+            logging.error(f"Continuous capture: analysing {name} failed: {e}")
+            report = {"error": str(e)}
+            self.segments_failed += 1
+        finally:
+            self._retain(path)
+        done = time.time()
+        report.update(segment=name, bytes=size, lag_seconds=round(done - finished_at, 3),
+                      processing_seconds=round(done - started, 3))
+        self.segments_processed += 1
+        self.totals["connections"] += report.get("connections", 0)
+        for key in ("normal", "attacks"):
+            self.totals[key] += report.get("summary", {}).get(key, 0)
+        self.reports.append(report)
+
+    def _discard(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _retain(self, path):
+        if self.settings['retention'] != 'archive':
+            return self._discard(path)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        try:
+            shutil.move(path, os.path.join(self.archive_dir, f"{os.path.basename(self.session_dir)}_{os.path.basename(path)}"))
+        except FileNotFoundError:
+            return
+        archived = sorted(os.listdir(self.archive_dir))
+        for name in archived[:max(0, len(archived) - config.CONTINUOUS_ARCHIVE_SEGMENTS)]:
+            self._discard(os.path.join(self.archive_dir, name))
+
+    def status(self):
+        lags = np.array([r["lag_seconds"] for r in self.reports], dtype=np.float64)
+        backlog = 0
+        if self.running and os.path.isdir(self.session_dir):
+            backlog = max(0, len(self._segments()) - 1)
+        return {
+            "state": self.state,
+            "session": self.session.id if self.session is not None else None,
+            "owner": self.owner,
+            "error": self.error,
+            "interface": self.interface,
+            "settings": self.settings,
+            "profile": self.profile.as_dict(),
+            "started_at": self.started_at,
+            "segments_processed": self.segments_processed,
+            "segments_failed": self.segments_failed,
+            "dropped_segments": self.dropped_segments,
+            "backlog": backlog,
+            "lag_seconds": {
+                "last": float(lags[-1]) if len(lags) else None,
+                "p50": float(np.percentile(lags, 50)) if len(lags) else None,
+                "max": float(lags.max()) if len(lags) else None,
+            },
+            "totals": dict(self.totals),
+            "segments": list(self.reports),
+        }
+
+_continuous_capture = None
+
+def get_continuous_capture():
+    global _continuous_capture
+    if _continuous_capture is None:
+        _continuous_capture = ContinuousCapture()
+    return _continuous_capture
@@ -0,0 +1,210 @@
+"""Streaming export of extracted features to ARFF, CSV or Parquet.
+
+A writer is opened once and given FeatureBatches as connections are
+produced (a whole capture, a ring-buffer segment, an online chunk). Each
+batch is formatted in slices of EXPORT_CHUNK_ROWS rows straight into a
+buffered file, so memory stays bounded by one slice whatever the size of
+the export. The unused 'other' model column is left out. With
+include_metadata the connection endpoints and times are appended after
+the KDD columns.
+
+export_pcap writes a capture's features without ever holding all of
+them: the online extractor releases each connection once it has ended
+and the writer gets them EXPORT_CHUNK_ROWS at a time, so rows come in
+the order connections end rather than process_pcap's first-packet order.
+"""
+import abc
+import csv
+import itertools
+import logging
+import pyarrow as pa
+import pyarrow.parquet as pq
+import config
+from .feature_batch import FeatureBatch, CATEGORIES, FEATURE_COLUMNS, METADATA_COLUMNS
+from .online import OnlineFeatureExtractor
+from .pcapreader import PcapReader, capture_snaplen, payloads_complete
+from .processpcap import SERVICE_NAMES, limit_packets
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+EXPORT_COLUMNS = [name for name in FEATURE_COLUMNS if name != 'other']
+
+# NSL-KDD's own service names, plus every name get_service_name can return, so the nominal header is complete
+NSL_KDD_SERVICES = (
+    'aol', 'auth', 'bgp', 'courier', 'csnet_ns', 'ctf', 'daytime', 'discard', 'domain', 'domain_u', 'echo', 'eco_i',
+    'ecr_i', 'efs', 'exec', 'finger', 'ftp', 'ftp_data', 'gopher', 'harvest', 'hostnames', 'http', 'http_2784',
+    'http_443', 'http_8001', 'imap4', 'IRC', 'iso_tsap', 'klogin', 'kshell', 'ldap', 'link', 'login', 'mtp', 'name',
+    'netbios_dgm', 'netbios_ns', 'netbios_ssn', 'netstat', 'nnsp', 'nntp', 'ntp_u', 'other', 'pm_dump', 'pop_2',
+    'pop_3', 'printer', 'private', 'red_i', 'remote_job', 'rje', 'shell', 'smtp', 'sql_net', 'ssh', 'sunrpc',
+    'supdup', 'systat', 'telnet', 'tftp_u', 'tim_i', 'time', 'urh_i', 'urp_i', 'uucp', 'uucp_path', 'vmnet',
+    'whois', 'X11', 'Z39_50',
+)
+ARFF_SERVICES = list(NSL_KDD_SERVICES) + sorted(SERVICE_NAMES - set(NSL_KDD_SERVICES))
+
+# Binary attributes are nominal in the NSL-KDD ARFF files
+ARFF_BINARY_COLUMNS = ('land', 'logged_in', 'is_host_login', 'is_guest_login')
+
+def _arff_type(name):
+    if name == 'service':
+        return '{' + ','.join(ARFF_SERVICES) + '}'
+    if name in CATEGORIES:
+        return '{' + ','.join(CATEGORIES[name]) + '}'
+    if name in ARFF_BINARY_COLUMNS:
+        return '{0,1}'
+    if METADATA_COLUMNS.get(name) is object:
+        return 'string'
+    return 'numeric'
+
+class FeatureWriter(abc.ABC):
+    """Base writer: slices batches and hands each slice's frame to _write_frame."""
+    extension = None
+    media_type = None
+
+    def __init__(self, path, include_metadata=False, chunk_rows=config.EXPORT_CHUNK_ROWS,
+                 buffer_bytes=config.EXPORT_BUFFER_BYTES):
+        self.path = path
+        self.include_metadata = include_metadata
+        self.columns = EXPORT_COLUMNS + (list(METADATA_COLUMNS) if include_metadata else [])
+        self.chunk_rows = chunk_rows
+        self.buffer_bytes = buffer_bytes
+        self.rows = 0
+        self._started = False
+        self._closed = False
+
+    def _frame(self, batch):
+        frame = batch.features[EXPORT_COLUMNS]
+        if self.include_metadata:
+            frame = frame.join(batch.metadata.set_index(frame.index))
+        return frame
+
+    def write(self, batch):
+        for part in batch.slices(self.chunk_rows):
+            frame = self._frame(part)
+            self._write_frame(frame, first=not self._started)
+            self._started = True
+            self.rows += len(frame)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if not self._started:
+            # An export with no connections still gets its header/schema
+            self._write_frame(self._frame(FeatureBatch.empty()), first=True)
+        self._close()
+
+    @abc.abstractmethod
+    def _write_frame(self, frame, first):
+        """Write one slice's frame; first is True for the first slice, which carries the header."""
+
+    @abc.abstractmethod
+    def _close(self):
+        """Flush and close the underlying file."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CsvWriter(FeatureWriter):
+    extension = 'csv'
+    media_type = 'text/csv'
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = open(path, 'w', newline='', buffering=self.buffer_bytes)
+
+    def _write_frame(self, frame, first):
+        frame.to_csv(self._file, header=first, index=False)
+
+    def _close(self):
+        self._file.close()
+
+class ArffWriter(FeatureWriter):
+    """NSL-KDD ARFF with every attribute declared; values outside a nominal set are written as missing ('?')."""
+    extension = 'arff'
+    media_type = 'text/plain'
+
+    def __init__(self, path, relation='NSL_KDD', **kwargs):
+        super().__init__(path, **kwargs)
+        self._file = open(path, 'w', newline='', buffering=self.buffer_bytes)
+        self._file.write(f'@RELATION {relation}\n\n')
+        for name in self.columns:
+            self._file.write(f'@ATTRIBUTE {name} {_arff_type(name)}\n')
+        self._file.write('\n@DATA\n')
+        self._services = frozenset(ARFF_SERVICES)
+        self.unknown_services = 0
+
+    def _write_frame(self, frame, first):
+        service = frame['service'].astype(object)
+        known = service.isin(self._services)
+        if not known.all():
+            self.unknown_services += int((~known).sum())
+            frame = frame.assign(service=service.where(known))
+        if self.include_metadata:
+            frame = frame.assign(**{name: "'" + frame[name].astype(str) + "'"
+                                    for name, dtype in METADATA_COLUMNS.items() if dtype is object})
+        frame.to_csv(self._file, header=False, index=False, na_rep='?', quoting=csv.QUOTE_NONE)
+
+    def _close(self):
+        self._file.close()
+        if self.unknown_services:
+            logging.warning(f"{self.unknown_services} connections had a service outside the ARFF header, written as '?'")
+
+class ParquetWriter(FeatureWriter):
+    """Compressed Parquet, one row group per slice; categorical columns stay dictionary-encoded."""
+    extension = 'parquet'
+    media_type = 'application/vnd.apache.parquet'
+
+    def __init__(self, path, compression=config.EXPORT_PARQUET_COMPRESSION, **kwargs):
+        super().__init__(path, **kwargs)
+        self.compression = compression
+        self._writer = None
+
+    def _write_frame(self, frame, first):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def _close(self):
+        self._writer.close()
+
+WRITERS = {writer.extension: writer for writer in (CsvWriter, ArffWriter, ParquetWriter)}
+
+def open_writer(path, format, **kwargs):
+    """Writer for one of WRITERS' formats; use as a context manager and write() FeatureBatches to it."""
+    if format not in WRITERS:
+        raise ValueError(f"Unsupported export format '{format}', expected one of {', '.join(WRITERS)}")
+    return WRITERS[format](path, **kwargs)
+
+def export_batch(batch, path, format, **kwargs):
+    with open_writer(path, format, **kwargs) as writer:
+        writer.write(batch)
+    return writer.rows
+
+def export_pcap(pcap_file, path, format, max_packets=None, content=None,
+                chunk_packets=config.KDD_ONLINE_CHUNK_PACKETS, **kwargs):
+    """Extract pcap_file's features and write them to path as they are released; returns the rows written.
+
+    max_packets and content are as for process_pcap; CaptureTooLarge leaves a partial file behind.
+    """
+    if content is None:
+        content = payloads_complete(capture_snaplen(pcap_file))
+    reader = PcapReader(pcap_file, payload_bytes=config.PCAP_PAYLOAD_BYTES if content else 0)
+    records = limit_packets(reader, max_packets)
+    extractor = OnlineFeatureExtractor(chunk_packets=chunk_packets, with_metadata=True)
+    with open_writer(path, format, **kwargs) as writer:
+        rows = []
+        while True:
+            chunk = list(itertools.islice(records, chunk_packets))
+            rows += extractor.consume(chunk) if chunk else extractor.finish()
+            if len(rows) >= writer.chunk_rows or not chunk:
+                writer.write(FeatureBatch.from_rows(rows))
+                rows = []
+            if not chunk:
+                break
+    return writer.rows
@@ -0,0 +1,93 @@
+"""Typed columnar result of pcap feature extraction.
+
+features holds the model inputs in config.KDD_FEATURE_COLUMNS order with
+fixed dtypes: int64 counters and flags, float64 durations and rates, and
+categorical protocol_type/service/flag. The preprocessing fast path reads
+the categorical codes directly, so no per-row Python objects are created
+between extraction and scoring. metadata holds what identifies each
+connection but is not a model input, aligned row for row with features.
+For ICMP flows the ports are the ICMP type and code of the first message.
+end_ts is when the connection logically ended (FlowTracker), the time the
+traffic windows order connections by.
+"""
+import numpy as np
+import pandas as pd
+import config
+
+FEATURE_COLUMNS = config.KDD_FEATURE_COLUMNS
+
+FLOAT_COLUMNS = frozenset([
+    'duration', 'serror_rate', 'srv_serror_rate', 'rerror_rate', 'srv_rerror_rate', 'same_srv_rate',
+    'diff_srv_rate', 'srv_diff_host_rate', 'dst_host_same_srv_rate', 'dst_host_diff_srv_rate',
+    'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate', 'dst_host_serror_rate',
+    'dst_host_srv_serror_rate', 'dst_host_rerror_rate', 'dst_host_srv_rerror_rate',
+])
+
+# Fixed category sets keep codes stable across batches; service keeps whatever names get_service_name produced
+CATEGORIES = {
+    'protocol_type': ['tcp', 'udp', 'icmp'],
+    'flag': ['OTH', 'REJ', 'RSTO', 'RSTOS0', 'RSTR', 'S0', 'S1', 'S2', 'S3', 'SF', 'SH'],
+    'service': None,
+}
+
+METADATA_COLUMNS = {
+    'src_ip': object, 'src_port': np.int64, 'dst_ip': object, 'dst_port': np.int64,
+    'first_ts': np.float64, 'last_ts': np.float64, 'end_ts': np.float64,
+}
+
+def feature_dtype(name):
+    if name in CATEGORIES:
+        return 'category'
+    return np.float64 if name in FLOAT_COLUMNS else np.int64
+
+def _typed_column(name, values, n_rows):
+    if values is None:
+        # 'other' is a model input that pcap extraction never fills
+        return np.zeros(n_rows, dtype=np.int64)
+    if name in CATEGORIES:
+        categories = CATEGORIES[name]
+        if categories is None:
+            return pd.Categorical(np.asarray(values, dtype=object))
+        return pd.Categorical(np.asarray(values, dtype=object), categories=categories)
+    return np.asarray(values, dtype=feature_dtype(name))
+
+class FeatureBatch:
+    """Feature frame and metadata frame for the connections of one extraction, in the same row order."""
+
+    def __init__(self, features, metadata):
+        self.features = features
+        self.metadata = metadata
+
+    @classmethod
+    def from_columns(cls, columns, metadata):
+        """Build from feature and metadata columns (sequences or arrays) keyed by name."""
+        n_rows = len(next(iter(metadata.values()))) if metadata else 0
+        features = pd.DataFrame({name: _typed_column(name, columns.get(name), n_rows) for name in FEATURE_COLUMNS})
+        metadata = pd.DataFrame({name: np.asarray(metadata[name], dtype=dtype)
+                                 for name, dtype in METADATA_COLUMNS.items()})
+        return cls(features, metadata)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from dict rows holding the feature and METADATA_COLUMNS keys, as the online extractor yields them."""
+        names = [name for name in FEATURE_COLUMNS if name != 'other'] + list(METADATA_COLUMNS)
+        columns = dict(zip(names, zip(*[[row[name] for name in names] for row in rows]))) if rows else \
+            {name: [] for name in names}
+        return cls.from_columns(columns, {name: columns[name] for name in METADATA_COLUMNS})
+
+    @classmethod
+    def empty(cls):
+        return cls.from_columns({}, {name: [] for name in METADATA_COLUMNS})
+
+    def __len__(self):
+        return len(self.features)
+
+    def slices(self, rows):
+        """Consecutive FeatureBatch views of at most rows connections each."""
+        for start in range(0, len(self), rows):
+            yield FeatureBatch(self.features.iloc[start:start + rows], self.metadata.iloc[start:start + rows])
+
+    def records(self):
+        """Feature rows as plain dicts (without the unused 'other' column), for per-row consumers."""
+        frame = self.features.drop(columns=['other'])
+        return frame.to_dict(orient='records')
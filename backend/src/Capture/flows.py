@@ -0,0 +1,245 @@
+"""Bounded flow table: bidirectional flows with idle/active timeouts and FIN/RST closure.
+
+Packets of both directions of a TCP/UDP 5-tuple (or an ICMP exchange
+between two hosts) share one flow. The side that sent the first packet is
+the flow's source, unless that packet was a SYN-ACK, in which case the
+capture started mid-handshake and the sender is the responder.
+
+A flow ends when its TCP session closes (FIN from both sides, or any RST),
+when it has been idle for idle_timeout seconds, or when it has been open for
+active_timeout seconds. A packet that arrives for an ended flow starts a new
+one, except for stragglers within close_linger seconds of the close, such as
+the last ACK after a FIN exchange. Ended flows are emitted into
+CompletedFlows as soon as their last chunk has been folded in, and their
+slots are reused. Memory therefore stays proportional to the live flows, and
+max_flows bounds it by evicting the least recently active flows after every
+chunk.
+"""
+import zlib
+import config
+from collections import OrderedDict
+from .packet_table import FlowTable, CompletedFlows, PacketTableBuilder
+from .pcapreader import PROTO_ICMP, PROTO_TCP, PROTO_UDP, PROTO_ICMPV6, TCP_FIN, TCP_SYN, TCP_RST, TCP_ACK
+
+# ICMP request/reply types that belong to the same exchange
+ICMP_EXCHANGES = {8: 0, 0: 0, 13: 13, 14: 13, 15: 15, 16: 15, 17: 17, 18: 17, 128: 128, 129: 128}
+_SYN_ACK = TCP_SYN | TCP_ACK
+
+def flow_shard(proto, src, dst, sport, dport, shards):
+    """Shard of a packet's flow from its raw header fields.
+
+    Symmetric, so both directions of a flow (and ICMP replies with their
+    requests) land on the same shard, and based on crc32 rather than hash(),
+    so every process agrees.
+    """
+    if proto == PROTO_ICMP or proto == PROTO_ICMPV6:
+        a, b, tail = src, dst, bytes((ICMP_EXCHANGES.get(sport, sport),))
+    else:
+        a, b, tail = src + sport.to_bytes(2, 'big'), dst + dport.to_bytes(2, 'big'), b''
+    return zlib.crc32((a + b if a <= b else b + a) + tail, proto) % shards
+
+def shard_filter(shard, shards):
+    """PcapReader keep callable passing only the packets of flows that hash to shard."""
+    def keep(proto, src, dst, sport, dport):
+        return flow_shard(proto, src, dst, sport, dport, shards) == shard
+    return keep
+
+class _Flow:
+    __slots__ = ('slot', 'src', 'sport', 'first_ts', 'last_ts', 'fin', 'closed_at')
+
+    def __init__(self, slot, src, sport, ts):
+        self.slot, self.src, self.sport = slot, src, sport
+        self.first_ts = self.last_ts = ts
+        self.fin = 0
+        self.closed_at = None
+
+class FlowTracker:
+    """Assigns packet records to flows and emits each flow once it ends."""
+
+    END_REASONS = ('fin', 'rst', 'idle', 'active', 'capacity', 'end_of_capture')
+
+    def __init__(self, idle_timeout=config.FLOW_IDLE_TIMEOUT, active_timeout=config.FLOW_ACTIVE_TIMEOUT,
+                 close_linger=config.FLOW_CLOSE_LINGER, max_flows=config.FLOW_MAX_LIVE,
+                 chunk_packets=config.PCAP_TABLE_CHUNK_PACKETS, positions=None, on_emit=None, on_flush=None):
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.close_linger = close_linger
+        self.max_flows = max_flows
+        self.table = FlowTable()
+        # Emitted flows go to on_emit(columns, keys) when given, otherwise they are collected for finish()
+        self.on_emit = on_emit
+        # Runs after every chunk, once the flows that ended in it have been emitted
+        self.on_flush = on_flush
+        self.completed = CompletedFlows()
+        self.builder = PacketTableBuilder(self.assign, self.table, chunk_packets, on_flush=self._after_flush,
+                                          positions=positions)
+        self._live = OrderedDict()
+        self._closing = {}
+        self._ended = []
+        self.now = float('-inf')
+        self.flows_created = 0
+        self.flows_emitted = 0
+        self.peak_live_flows = 0
+        self.ended = dict.fromkeys(self.END_REASONS, 0)
+
+    @staticmethod
+    def flow_key(record):
+        """Canonical key shared by both directions of a flow, or None for packets no flow is kept for."""
+        proto = record.proto
+        if proto == PROTO_TCP or proto == PROTO_UDP:
+            if record.frag:
+                # Later fragments carry no ports
+                return None
+            a, b = (record.src, record.sport), (record.dst, record.dport)
+            return (proto,) + (a + b if a <= b else b + a)
+        if proto == PROTO_ICMP or proto == PROTO_ICMPV6:
+            if record.frag:
+                return None
+            exchange = ICMP_EXCHANGES.get(record.sport, record.sport)
+            a, b = record.src, record.dst
+            return (proto, exchange) + ((a, b) if a <= b else (b, a))
+        return None
+
+    def assign(self, record):
+        """(slot, direction) for a packet record, opening, splitting or closing its flow as needed."""
+        key = self.flow_key(record)
+        if key is None:
+            return None
+        ts = record.ts
+        if ts > self.now:
+            self.now = ts
+        flow = self._live.get(key)
+        if flow is not None:
+            reason = self._ends_before(flow, record)
+            if reason is not None:
+                self._end(key, flow, reason, ts)
+                flow = None
+            else:
+                self._live.move_to_end(key)
+        if flow is None:
+            flow = self._open(key, record)
+        flow.last_ts = ts
+
+        direction = 0 if record.src == flow.src and (flow.sport is None or record.sport == flow.sport) else 1
+        if record.proto == PROTO_TCP and flow.closed_at is None:
+            if record.flags & TCP_RST:
+                self._close(key, flow, 'rst', ts)
+            elif record.flags & TCP_FIN:
+                flow.fin |= 1 << direction
+                if flow.fin == 3:
+                    self._close(key, flow, 'fin', ts)
+        return flow.slot, direction
+
+    def _ends_before(self, flow, record):
+        """Why flow must end before record can join it, or None if record belongs to it."""
+        ts = record.ts
+        if flow.closed_at is not None:
+            new_handshake = record.proto == PROTO_TCP and record.flags & _SYN_ACK == TCP_SYN
+            if new_handshake or ts - flow.closed_at > self.close_linger:
+                return 'closed'
+        if ts - flow.last_ts > self.idle_timeout:
+            return 'idle'
+        if ts - flow.first_ts > self.active_timeout:
+            return 'active'
+        return None
+
+    def _open(self, key, record):
+        src, sport, dst, dport = record.src, record.sport, record.dst, record.dport
+        if record.proto == PROTO_TCP and record.flags & _SYN_ACK == _SYN_ACK:
+            src, sport, dst, dport = dst, dport, src, sport
+        slot = self.table.allocate((src, sport, dst, dport, record.proto))
+        # ICMP has no ports: the key keeps the first message's type and code, and direction is by address only
+        flow = _Flow(slot, src, None if record.proto in (PROTO_ICMP, PROTO_ICMPV6) else sport, record.ts)
+        self._live[key] = flow
+        self.flows_created += 1
+        if len(self._live) > self.peak_live_flows:
+            self.peak_live_flows = len(self._live)
+        return flow
+
+    def _close(self, key, flow, reason, ts):
+        flow.closed_at = ts
+        self._closing[key] = (flow, reason)
+
+    def _end(self, key, flow, reason, ts=None):
+        del self._live[key]
+        closing = self._closing.pop(key, None)
+        if closing is not None and closing[0] is flow:
+            reason = closing[1]
+        self.ended[reason] += 1
+        # When the flow logically ended; the traffic windows order flows by it
+        if reason in ('fin', 'rst'):
+            end_ts = flow.closed_at
+        elif reason == 'active':
+            end_ts = ts
+        elif reason == 'capacity':
+            end_ts = self.now
+        else:
+            end_ts = flow.last_ts + self.idle_timeout
+        self._ended.append((flow.slot, end_ts))
+
+    def _after_flush(self):
+        """Emit flows whose packets are all folded in, then evict idle, lingering and excess flows."""
+        self._emit()
+        now = self.now
+        for key, (flow, _) in list(self._closing.items()):
+            if now - flow.closed_at > self.close_linger:
+                self._end(key, flow, 'closed')
+        while self._live:
+            key, flow = next(iter(self._live.items()))
+            if now - flow.last_ts > self.idle_timeout:
+                self._end(key, flow, 'idle')
+            elif len(self._live) > self.max_flows:
+                self._end(key, flow, 'capacity')
+            else:
+                break
+        self._emit()
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def _emit(self):
+        if self._ended:
+            slots, end_ts = zip(*self._ended)
+            self.table.columns['end_ts'][list(slots)] = end_ts
+            taken = self.table.take(slots)
+            if self.on_emit is not None:
+                self.on_emit(*taken)
+            else:
+                self.completed.add(taken)
+            self.flows_emitted += len(self._ended)
+            self._ended = []
+
+    def watermark(self):
+        """Every flow still to be emitted ends at or after this time (for non-decreasing packet timestamps)."""
+        closing = [flow.closed_at for flow, _ in self._closing.values()]
+        return min([self.now] + closing)
+
+    def consume(self, records):
+        self.builder.consume(records)
+        return self
+
+    def flush(self, now=None):
+        """Fold pending packets in and emit the flows that have ended by now.
+
+        A later now moves the clock forward without a packet, so a live
+        capture with no traffic still ends lingering and idle flows.
+        """
+        if now is not None and now > self.now:
+            self.now = now
+        self.builder.flush()
+
+    def finish(self):
+        """End every live flow and return all emitted flows, ordered by first packet."""
+        self.builder.flush()
+        for key, flow in list(self._live.items()):
+            self._end(key, flow, 'end_of_capture')
+        self._emit()
+        return self.completed.finish()
+
+    def stats(self):
+        return {
+            "live_flows": len(self._live),
+            "peak_live_flows": self.peak_live_flows,
+            "flows_created": self.flows_created,
+            "flows_emitted": self.flows_emitted,
+            "ended": dict(self.ended),
+        }
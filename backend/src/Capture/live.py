@@ -0,0 +1,234 @@
+"""Live detection: tshark's pcap output read from a pipe and scored connection by connection.
+
+tshark writes pcap to stdout (-F pcap -w -). An asyncio subprocess reads it
+in chunks, PcapStreamDecoder turns the chunks into packet records, and
+OnlineFeatureExtractor returns each connection's feature row once it has
+closed or timed out. Rows released by the same chunk are scored together
+and handed to on_verdicts. Nothing is written to disk.
+
+Close-to-verdict latency is measured from the moment the pipeline has read
+a packet at or past the connection's end time (the closing FIN/RST, or
+the packet that shows it idle) to the moment its verdict is out. When the
+pipe goes quiet the flow clock advances with wall time, so connections on
+an idle link still end, and buffered packets are folded in at least every
+flush_seconds however slow the traffic.
+
+The same pipe can be fed a recorded pcap instead of tshark, optionally
+paced to a packet rate, to test the pipeline offline:
+    python -m src.Capture.live replay capture.pcap [--pps 50000]
+"""
+import argparse
+import asyncio
+import bisect
+import logging
+import struct
+import sys
+import time
+from collections import deque
+import numpy as np
+import config
+from .capture import CAPTURE_INTERFACES, CaptureProfile, find_tshark
+from .feature_batch import FeatureBatch
+from .flows import FlowTracker
+from .online import OnlineFeatureExtractor
+from .pcapreader import PcapStreamDecoder, PCAP_MAGIC
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+async def score_batch(batch, quantized=None):
+    """Class codes for a FeatureBatch through the shared micro-batcher."""
+    from src.IDS.inference.batcher import predict_codes
+    from src.IDS.inference.registry import get_registry
+    return await predict_codes(batch.features, get_registry().use_quantized(quantized))
+
+def tshark_command(interface, profile=None, duration=None):
+    """tshark writing pcap to stdout, taken with a CaptureProfile (snap length, buffer, BPF filter)."""
+    profile = profile if profile is not None else CaptureProfile()
+    command = [find_tshark(), '-i', interface, '-q', '-F', 'pcap', *profile.tshark_arguments(), '-w', '-']
+    if duration:
+        command += ['-a', f'duration:{duration}']
+    return command
+
+def replay_command(path, pps=None):
+    """Command that writes a recorded pcap to stdout, optionally paced to pps packets per second."""
+    command = [sys.executable, '-m', 'src.Capture.live', 'replay', path]
+    if pps:
+        command += ['--pps', str(pps)]
+    return command
+
+async def open_source(command):
+    return await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.DEVNULL, cwd=config.BASE_DIR)
+
+async def open_tshark(interface=None, duration=None, profile=None):
+    """Start tshark writing pcap to a pipe; like the file capture, tries CAPTURE_INTERFACES until one stays up.
+
+    Returns (process, interface). Raises FileNotFoundError without tshark, RuntimeError if no interface works.
+    """
+    failed = []
+    for candidate in ([interface] if interface else CAPTURE_INTERFACES):
+        process = await open_source(tshark_command(candidate, profile, duration))
+        try:
+            await asyncio.wait_for(process.wait(), config.CAPTURE_START_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            return process, candidate
+        if process.returncode == 0:
+            # A capture that was over within the grace period
+            return process, candidate
+        failed.append(f"{candidate} (exit code {process.returncode})")
+        logging.warning(f"Live capture failed to start on interface {candidate}")
+    raise RuntimeError(f"tshark could not capture on any interface: {', '.join(failed)}")
+
+class LivePipeline:
+    """Pcap byte stream -> closed connections -> verdicts, with latency and throughput counters."""
+
+    def __init__(self, score=score_batch, payload_bytes=config.PCAP_PAYLOAD_BYTES,
+                 read_bytes=config.LIVE_READ_BYTES, flush_seconds=config.LIVE_FLUSH_SECONDS,
+                 extractor=None):
+        self.score = score
+        self.read_bytes = read_bytes
+        self.flush_seconds = flush_seconds
+        self._flushed_at = 0.0
+        self.decoder = PcapStreamDecoder(payload_bytes=payload_bytes)
+        self.extractor = extractor if extractor is not None else OnlineFeatureExtractor(
+            FlowTracker(close_linger=config.LIVE_CLOSE_LINGER, chunk_packets=config.LIVE_CHUNK_PACKETS),
+            with_metadata=True)
+        # (packet time, wall time) when the pipeline first read a packet at or past that packet time
+        self._clock_ts, self._clock_wall = [], []
+        self._latencies = deque(maxlen=config.LIVE_LATENCY_SAMPLES)
+        self.connections = 0
+        self.started_at = None
+
+    def _observe(self, records, wall):
+        latest = max(record.ts for record in records)
+        if not self._clock_ts or latest > self._clock_ts[-1]:
+            self._clock_ts.append(latest)
+            self._clock_wall.append(wall)
+
+    def _packet_clock(self, wall):
+        """Packet time now, extrapolated by the wall time since the last packet was read."""
+        if not self._clock_ts:
+            return None
+        return self._clock_ts[-1] + (wall - self._clock_wall[-1])
+
+    def _seen_at(self, end_ts, default):
+        i = bisect.bisect_left(self._clock_ts, end_ts)
+        return self._clock_wall[i] if i < len(self._clock_wall) else default
+
+    def _trim_clock(self, oldest_needed):
+        i = bisect.bisect_left(self._clock_ts, oldest_needed)
+        if i > 1024:
+            del self._clock_ts[:i], self._clock_wall[:i]
+
+    async def _emit(self, rows, wall, on_verdicts):
+        batch = FeatureBatch.from_rows(rows)
+        codes = np.asarray(await self.score(batch))
+        done = time.time()
+        end_ts = [row['end_ts'] for row in rows]
+        self._latencies.extend(done - self._seen_at(ts, wall) for ts in end_ts)
+        # Rows come out in end-time order, so packet times well before this chunk's ends are no longer needed
+        self._trim_clock(min(end_ts) - config.FLOW_IDLE_TIMEOUT)
+        self.connections += len(rows)
+        if on_verdicts is not None:
+            await on_verdicts(batch, codes)
+
+    async def run(self, stream, on_verdicts=None):
+        """Read stream (an asyncio StreamReader) to EOF, calling on_verdicts(batch, codes) as connections close."""
+        self.started_at = time.time()
+        while True:
+            try:
+                data = await asyncio.wait_for(stream.read(self.read_bytes), self.flush_seconds)
+            except asyncio.TimeoutError:
+                wall = self._flushed_at = time.time()
+                rows = self.extractor.flush(now=self._packet_clock(wall))
+            else:
+                if not data:
+                    break
+                wall = time.time()
+                records = self.decoder.feed(data)
+                if not records:
+                    continue
+                self._observe(records, wall)
+                rows = self.extractor.consume(records)
+                if wall - self._flushed_at >= self.flush_seconds:
+                    # Slow but steady traffic would otherwise wait for a full chunk
+                    rows += self.extractor.flush()
+                    self._flushed_at = wall
+            if rows:
+                await self._emit(rows, wall, on_verdicts)
+        if self.decoder.pending_bytes:
+            logging.warning(f"Live capture ended inside a frame, {self.decoder.pending_bytes} bytes ignored")
+        rows = self.extractor.finish()
+        if rows:
+            await self._emit(rows, time.time(), on_verdicts)
+        return self.stats()
+
+    def stats(self):
+        latencies = np.array(self._latencies, dtype=np.float64)
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "packets": self.decoder.packets,
+            "bytes": self.decoder.bytes,
+            "connections": self.connections,
+            "packets_per_second": round(self.decoder.packets / elapsed, 1) if elapsed > 0 else 0.0,
+            "close_to_verdict_ms": {
+                "p50": float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+                "p95": float(np.percentile(latencies, 95) * 1000) if len(latencies) else None,
+                "max": float(latencies.max() * 1000) if len(latencies) else None,
+            },
+            **self.extractor.stats(),
+        }
+
+async def run_live(command, on_verdicts=None, pipeline=None):
+    """Run command (tshark_command or replay_command) and feed its stdout through a LivePipeline."""
+    return await run_process(await open_source(command), on_verdicts, pipeline)
+
+async def run_process(process, on_verdicts=None, pipeline=None):
+    """Feed a started source's stdout through a LivePipeline; the source is terminated if this is cancelled."""
+    pipeline = pipeline if pipeline is not None else LivePipeline()
+    try:
+        return await pipeline.run(process.stdout, on_verdicts)
+    finally:
+        if process.returncode is None:
+            process.terminate()
+        await process.wait()
+
+def replay(path, pps=None, out=None):
+    """Write a pcap file to out as a classic pcap stream, pacing frames to pps when given."""
+    out = out if out is not None else sys.stdout.buffer
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+        if magic not in PCAP_MAGIC:
+            raise SystemExit(f"{path}: only classic pcap files can be replayed")
+        endian, _ = PCAP_MAGIC[magic]
+        out.write(magic + f.read(20))
+        record = struct.Struct(endian + 'IIII')
+        start, sent = time.perf_counter(), 0
+        while True:
+            header = f.read(16)
+            if len(header) < 16:
+                break
+            out.write(header + f.read(record.unpack(header)[2]))
+            sent += 1
+            if pps and not sent % 256:
+                ahead = sent / pps - (time.perf_counter() - start)
+                if ahead > 0:
+                    out.flush()
+                    time.sleep(ahead)
+    out.flush()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Live capture helpers')
+    commands = parser.add_subparsers(dest='command', required=True)
+    replay_parser = commands.add_parser('replay', help='Write a recorded pcap to stdout like tshark -w -')
+    replay_parser.add_argument('path', type=str)
+    replay_parser.add_argument('--pps', type=int, default=None, help='Pace output to this many packets per second')
+    return parser.parse_args()
+
+# Usage, from the backend directory: python -m src.Capture.live replay capture.pcap [--pps 50000]
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        replay(args.path, args.pps)
+    except BrokenPipeError:
+        pass
@@ -0,0 +1,125 @@
+"""Online KDD feature extraction: a complete feature row per connection as soon as it ends.
+
+Packets are consumed as they arrive. FlowTracker emits every connection
+once it closes (FIN/RST) or times out, with the basic and content features
+computed from its aggregates. Each connection is then held until the
+tracker's watermark says no connection ending earlier can still appear.
+That is about close_linger seconds, or one chunk. Connections are released
+to the traffic windows in end-time order, which is the order the batch
+process_pcap feeds them in. On the same capture the rows therefore match
+process_pcap's, which lists them by first packet instead of by end.
+"""
+import heapq
+import itertools
+import logging
+import numpy as np
+import config
+from .flows import FlowTracker
+from .packet_table import CompletedFlows
+from .processpcap import get_basic_features, get_content_features
+from .feature_batch import METADATA_COLUMNS
+from .traffic_features import TrafficWindows, WINDOW_COLUMNS, error_flags
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class OnlineFeatureExtractor:
+    """Stateful packet -> feature-row extractor with bounded flow and window state.
+
+    With with_metadata, rows also carry the METADATA_COLUMNS of their connection.
+    """
+
+    def __init__(self, tracker=None, windows=None, chunk_packets=config.KDD_ONLINE_CHUNK_PACKETS,
+                 with_metadata=False):
+        self.tracker = tracker if tracker is not None else FlowTracker(chunk_packets=chunk_packets)
+        self.tracker.on_emit = self._on_emit
+        self.tracker.on_flush = self._on_flush
+        self.windows = windows if windows is not None else TrafficWindows()
+        self.with_metadata = with_metadata
+        self._pending = []
+        self._ready = []
+        self._released_until = float('-inf')
+        self.rows_emitted = 0
+        self.late_rows = 0
+
+    def _on_emit(self, columns, keys):
+        """Compute the per-connection features of freshly ended flows and queue them for the windows."""
+        flows = CompletedFlows()
+        flows.add((columns, keys))
+        flows.finish()
+        features = get_basic_features(flows)
+        features.update(get_content_features(flows))
+        names = tuple(features)
+        serror, rerror = error_flags(features['flag'])
+        window_inputs = zip(flows.key_column(0), flows.key_column(1), flows.key_column(2), flows.key_column(3),
+                            flows.column('end_ts').tolist(), serror, rerror)
+        columns = [values.tolist() if isinstance(values, np.ndarray) else values for values in features.values()]
+        if self.with_metadata:
+            names += tuple(METADATA_COLUMNS)
+            columns += [flows.key_column(0), flows.key_column(1), flows.key_column(2), flows.key_column(3),
+                        flows.column('first_ts').tolist(), flows.column('last_ts').tolist(),
+                        flows.column('end_ts').tolist()]
+        for first_seq, window_input, values in zip(flows.column('first_seq').tolist(), window_inputs,
+                                                   zip(*columns)):
+            heapq.heappush(self._pending, (window_input[4], first_seq, window_input, names, values))
+
+    def _on_flush(self):
+        self._release(self.tracker.watermark())
+
+    def _release(self, watermark):
+        pending, add = self._pending, self.windows.add
+        while pending and pending[0][0] <= watermark:
+            end_ts, _, window_input, names, values = heapq.heappop(pending)
+            if end_ts < self._released_until:
+                # Only happens when packet timestamps go backwards
+                self.late_rows += 1
+            else:
+                self._released_until = end_ts
+            row = dict(zip(names, values))
+            row.update(zip(WINDOW_COLUMNS, add(*window_input)))
+            self._ready.append(row)
+            self.rows_emitted += 1
+
+    def _take_ready(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    def consume(self, records):
+        """Feed packet records; returns the rows of connections that were released meanwhile."""
+        self.tracker.consume(records)
+        return self._take_ready()
+
+    def flush(self, now=None):
+        """Fold buffered packets in now (e.g. on a timer when traffic is slow) and return released rows.
+
+        now moves the flow clock forward without a packet (see FlowTracker.flush).
+        """
+        self.tracker.flush(now)
+        return self._take_ready()
+
+    def finish(self):
+        """End every open connection and return the remaining rows."""
+        self.tracker.finish()
+        self._release(float('inf'))
+        if self.late_rows:
+            logging.warning(f"{self.late_rows} connections were released out of end-time order")
+        return self._take_ready()
+
+    def stats(self):
+        return {
+            **self.tracker.stats(),
+            **self.windows.stats(),
+            "pending_rows": len(self._pending),
+            "rows_emitted": self.rows_emitted,
+            "late_rows": self.late_rows,
+        }
+
+def stream_features(records, extractor=None, batch_packets=config.KDD_ONLINE_CHUNK_PACKETS):
+    """Yield feature rows for packet records as their connections end, then the rest once records run out."""
+    extractor = extractor if extractor is not None else OnlineFeatureExtractor()
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_packets))
+        if not batch:
+            break
+        yield from extractor.consume(batch)
+    yield from extractor.finish()
@@ -0,0 +1,241 @@
+"""Columnar packet tables and the per-flow aggregates reduced from them.
+
+Packets are decoded once into chunks of NumPy columns (capture sequence,
+timestamp, flow slot, direction, length on the wire, TCP flags bitmask,
+fragment offset, urgent pointer). Byte counts use the length on the wire
+so they stay right when the capture's snap length truncated the frames.
+Each chunk is folded into FlowTable with vectorized group-by reductions
+over the flow slot. Slots are released once a flow has been emitted and
+reused by later flows, so memory follows the number of live flows, while a
+chunk only bounds the packets held at once. Payloads are scanned for the
+content features as they arrive and only their hit counts are kept.
+"""
+import numpy as np
+import config
+from .content_matcher import CONTENT_COLUMNS, CONTENT_ANY, get_content_matcher
+from .pcapreader import PROTO_TCP, TCP_FIN, TCP_SYN, TCP_RST, TCP_ACK
+
+PACKET_COLUMNS = ('seq', 'ts', 'flow', 'direction', 'length', 'flags', 'frag', 'urgent')
+PACKET_DTYPES = (np.int64, np.float64, np.int64, np.int8, np.int64, np.uint8, np.uint16, np.int64)
+
+# Per-flow aggregate columns and the value a fresh slot starts from
+FLOW_COLUMNS = {
+    'first_seq': (np.int64, np.iinfo(np.int64).max), 'last_seq': (np.int64, -1),
+    'first_ts': (np.float64, np.inf), 'last_ts': (np.float64, 0.0), 'end_ts': (np.float64, np.inf),
+    'min_ts': (np.float64, np.inf), 'max_ts': (np.float64, -np.inf), 'packets': (np.int64, 0),
+    'src_bytes': (np.int64, 0), 'dst_bytes': (np.int64, 0), 'flags': (np.uint8, 0),
+    'wrong_fragment': (np.int64, 0), 'urgent': (np.int64, 0),
+    **{name: (np.int64, 0) for name in CONTENT_COLUMNS},
+}
+
+def nslkdd_flags(flags):
+    """Vectorized determine_nslkdd_flag over OR-ed TCP flag bitmasks."""
+    syn, fin = (flags & TCP_SYN) != 0, (flags & TCP_FIN) != 0
+    ack, rst = (flags & TCP_ACK) != 0, (flags & TCP_RST) != 0
+    return np.select([syn & fin, syn & ~ack, rst], ['SF', 'S0', 'RSTR'], 'OTH').astype(object)
+
+class FlowTable:
+    """Per-flow aggregates stored in reusable slots.
+
+    keys[slot] is the flow's oriented key (src, sport, dst, dport, proto),
+    src being the side that opened the flow.
+    """
+
+    def __init__(self, capacity=1024):
+        self.keys = []
+        self._free = []
+        self._capacity = 0
+        self.columns = {}
+        self._grow(capacity)
+
+    def __len__(self):
+        return len(self.keys) - len(self._free)
+
+    def _grow(self, capacity):
+        for name, (dtype, fill) in FLOW_COLUMNS.items():
+            grown = np.full(capacity, fill, dtype=dtype)
+            if name in self.columns:
+                grown[:self._capacity] = self.columns[name]
+            self.columns[name] = grown
+        self._capacity = capacity
+
+    def allocate(self, key):
+        """A fresh slot for a new flow with key."""
+        if self._free:
+            slot = self._free.pop()
+            self.keys[slot] = key
+        else:
+            slot = len(self.keys)
+            self.keys.append(key)
+        return slot
+
+    def take(self, slots):
+        """Copy out the aggregates and keys of slots, then release them for reuse."""
+        slots = np.asarray(slots, dtype=np.int64)
+        taken = {name: values[slots] for name, values in self.columns.items()}
+        keys = [self.keys[slot] for slot in slots.tolist()]
+        for name, (_, fill) in FLOW_COLUMNS.items():
+            self.columns[name][slots] = fill
+        for slot in slots.tolist():
+            self.keys[slot] = None
+        self._free.extend(slots.tolist())
+        return taken, keys
+
+    def add_packets(self, table):
+        """Fold one columnar packet table into the flow aggregates with group-by reductions over the slot."""
+        if len(self.keys) > self._capacity:
+            self._grow(max(len(self.keys), 2 * self._capacity))
+        n_slots = len(self.keys)
+        flow, seq, ts, length = table['flow'], table['seq'], table['ts'], table['length']
+        cols = self.columns
+
+        cols['packets'][:n_slots] += np.bincount(flow, minlength=n_slots)
+        np.minimum.at(cols['min_ts'], flow, ts)
+        np.maximum.at(cols['max_ts'], flow, ts)
+        # First and last packet of each flow in capture order, not by timestamp
+        np.minimum.at(cols['first_seq'], flow, seq)
+        np.maximum.at(cols['last_seq'], flow, seq)
+        touched = np.unique(flow)
+        position = np.empty(seq[-1] - seq[0] + 1, dtype=np.int64)
+        position[seq - seq[0]] = np.arange(len(seq))
+        cols['last_ts'][touched] = ts[position[cols['last_seq'][touched] - seq[0]]]
+        started = touched[cols['first_seq'][touched] >= seq[0]]
+        cols['first_ts'][started] = ts[position[cols['first_seq'][started] - seq[0]]]
+
+        # Bytes sent by the side that opened the flow, and by the side that answered
+        forward = table['direction'] == 0
+        cols['src_bytes'][:n_slots] += np.bincount(flow, weights=length * forward, minlength=n_slots).astype(np.int64)
+        cols['dst_bytes'][:n_slots] += np.bincount(flow, weights=length * ~forward, minlength=n_slots).astype(np.int64)
+        np.bitwise_or.at(cols['flags'], flow, table['flags'])
+        cols['wrong_fragment'][:n_slots] += np.bincount(flow, weights=table['frag'] != 0, minlength=n_slots).astype(np.int64)
+        cols['urgent'][:n_slots] += np.bincount(flow, weights=table['urgent'], minlength=n_slots).astype(np.int64)
+
+    def add_content(self, flows, hits):
+        """Fold ContentMatcher.hits() rows for payload packets of the given flow slots."""
+        if not flows:
+            return
+        flows, hits = np.asarray(flows), np.asarray(hits, dtype=np.int64)
+        for j, name in enumerate(CONTENT_COLUMNS):
+            if name in CONTENT_ANY:
+                np.maximum.at(self.columns[name], flows, hits[:, j])
+            else:
+                np.add.at(self.columns[name], flows, hits[:, j])
+
+class CompletedFlows:
+    """Aggregates of emitted flows, ordered by each flow's first packet once finish() is called.
+
+    Exposes the same column/key_column view the feature functions read.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._keys = []
+        self.columns = None
+        self.keys = None
+
+    def add(self, taken):
+        columns, keys = taken
+        if keys:
+            self._parts.append(columns)
+            self._keys.extend(keys)
+
+    def finish(self):
+        if self._parts:
+            merged = {name: np.concatenate([part[name] for part in self._parts]) for name in FLOW_COLUMNS}
+        else:
+            merged = {name: np.empty(0, dtype=dtype) for name, (dtype, _) in FLOW_COLUMNS.items()}
+        order = np.argsort(merged['first_seq'], kind='stable')
+        self.columns = {name: values[order] for name, values in merged.items()}
+        self.keys = [self._keys[i] for i in order.tolist()]
+        self._parts, self._keys = [], []
+        return self
+
+    def __len__(self):
+        return len(self.keys) if self.keys is not None else len(self._keys)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def key_column(self, position):
+        return [key[position] for key in self.keys]
+
+    def nslkdd_flags(self):
+        """NSL-KDD flag per flow; UDP and ICMP flows have no handshake and are always 'SF'."""
+        tcp = np.array([proto == PROTO_TCP for proto in self.key_column(4)], dtype=bool)
+        return np.where(tcp, nslkdd_flags(self.column('flags')), 'SF').astype(object)
+
+class PacketTableBuilder:
+    """Accumulates packet records into columnar chunks and folds each full chunk into a FlowTable.
+
+    assign maps a record to its (flow slot, direction), or None to drop it.
+    on_flush runs after every chunk has been folded in. seq numbers every
+    record passed to consume(), assigned or not, so it is the packet's
+    position in the capture; positions() replaces that count when the records
+    are a filtered view of the capture (e.g. PcapReader.packets).
+    """
+
+    def __init__(self, assign, flows, chunk_packets=config.PCAP_TABLE_CHUNK_PACKETS, on_flush=None,
+                 positions=None):
+        self.assign = assign
+        self.positions = positions
+        self.matcher = get_content_matcher()
+        self.flows = flows
+        self.chunk_packets = chunk_packets
+        self.on_flush = on_flush
+        self.records = 0
+        self._columns = tuple([] for _ in PACKET_COLUMNS)
+        self._content_flows, self._content_hits = [], []
+
+    def _reset(self):
+        # Cleared in place so the bound append methods in consume() stay valid across flushes
+        for values in self._columns:
+            values.clear()
+        self._content_flows.clear()
+        self._content_hits.clear()
+
+    def add(self, record):
+        self.consume((record,))
+
+    def consume(self, records):
+        """Add packet records, flushing a chunk every chunk_packets assigned packets."""
+        assign, chunk_packets = self.assign, self.chunk_packets
+        seq, ts, flow, dirs, length, flags, frag, urgent = (values.append for values in self._columns)
+        content_flows, content = self._content_flows.append, self._content_hits.append
+        content_hits = self.matcher.hits
+        pending = len(self._columns[0])
+        position, positions = self.records, self.positions
+        for record in records:
+            position = position + 1 if positions is None else positions()
+            assigned = assign(record)
+            if assigned is None:
+                continue
+            slot, direction = assigned
+            seq(position)
+            ts(record.ts)
+            flow(slot)
+            dirs(direction)
+            length(record.wire_length)
+            flags(record.flags)
+            frag(record.frag)
+            urgent(record.urgent)
+            if record.payload:
+                content_flows(slot)
+                content(content_hits(record.payload_length, record.payload))
+            pending += 1
+            if pending >= chunk_packets:
+                self.records = position
+                self.flush()
+                pending = 0
+        self.records = position
+
+    def flush(self):
+        """Fold the pending chunk into the flow table."""
+        if self._columns[0]:
+            table = {name: np.asarray(values, dtype=dtype)
+                     for name, values, dtype in zip(PACKET_COLUMNS, self._columns, PACKET_DTYPES)}
+            self.flows.add_packets(table)
+            self.flows.add_content(self._content_flows, self._content_hits)
+        self._reset()
+        if self.on_flush is not None:
+            self.on_flush()
+        return self.flows
@@ -0,0 +1,477 @@
+"""Streaming pcap/pcapng reader that decodes only the header fields the KDD features use.
+
+Unlike scapy's rdpcap, nothing is dissected beyond the IP and transport
+headers and no packet is kept after it has been yielded, so memory does not
+grow with the size of the capture. By default the file is memory-mapped and
+frames are sliced out of the mapping, so the reader holds no file buffer of
+its own and resident pages stay reclaimable page cache.
+"""
+import mmap
+import os
+import socket
+import struct
+import config
+from collections import namedtuple
+
+# Compact per-packet record. For ICMP, sport/dport carry the ICMP type/code.
+# length is the captured frame length (what len() of a scapy packet returns),
+# wire_length the original length on the wire; payload is None unless asked for.
+PacketRecord = namedtuple('PacketRecord', [
+    'ts', 'src', 'dst', 'proto', 'sport', 'dport', 'flags', 'length', 'wire_length',
+    'frag', 'urgent', 'payload_length', 'payload',
+])
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_PSH, TCP_ACK, TCP_URG = 0x01, 0x02, 0x04, 0x08, 0x10, 0x20
+PROTO_ICMP, PROTO_TCP, PROTO_UDP, PROTO_ICMPV6 = 1, 6, 17, 58
+
+LINKTYPE_NULL, LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_LOOP = 0, 1, 101, 108
+LINKTYPE_LINUX_SLL, LINKTYPE_IPV4, LINKTYPE_IPV6, LINKTYPE_LINUX_SLL2 = 113, 228, 229, 276
+# DLT_RAW is 12 or 14 on some BSDs
+_RAW_LINKTYPES = (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6, 12, 14)
+
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6), b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9), b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+PCAPNG_SHB = b'\x0a\x0d\x0d\x0a'
+
+_ETHERTYPE_IPV4, _ETHERTYPE_IPV6 = 0x0800, 0x86DD
+_VLAN_ETHERTYPES = (0x8100, 0x88A8, 0x9100)
+_IPV6_EXTENSION_HEADERS = (0, 43, 60)
+_u16 = struct.Struct('>H').unpack_from
+_ipv4 = struct.Struct('>BBHHHBB2x4s4s').unpack_from
+_tcp = struct.Struct('>HH8xBB4xH').unpack_from
+_ports = struct.Struct('>HH').unpack_from
+
+# Parsed bytes of a memory-mapped capture after which its pages are released (madvise is POSIX-only)
+_RELEASE_BYTES = 64 * 2**20 if hasattr(mmap, 'MADV_DONTNEED') else float('inf')
+
+class PcapFormatError(ValueError):
+    """Raised when a file is not a readable pcap or pcapng capture."""
+
+def _network_offset(linktype, data):
+    """(ethertype, offset of the network header), or (None, 0) for link layers without IP."""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None, 0
+        ethertype, offset = _u16(data, 12)[0], 14
+        while ethertype in _VLAN_ETHERTYPES and len(data) >= offset + 4:
+            ethertype, offset = _u16(data, offset + 2)[0], offset + 4
+        return ethertype, offset
+    if linktype in _RAW_LINKTYPES:
+        if not data:
+            return None, 0
+        return (_ETHERTYPE_IPV4 if data[0] >> 4 == 4 else _ETHERTYPE_IPV6), 0
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        if len(data) < 4:
+            return None, 0
+        family = struct.unpack_from('>I' if linktype == LINKTYPE_LOOP else '=I', data)[0]
+        if family == 2:
+            return _ETHERTYPE_IPV4, 4
+        # AF_INET6 differs between Linux, the BSDs and macOS
+        return (_ETHERTYPE_IPV6 if family in (10, 24, 28, 30) else None), 4
+    if linktype == LINKTYPE_LINUX_SLL:
+        return (_u16(data, 14)[0], 16) if len(data) >= 16 else (None, 0)
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return (_u16(data, 0)[0], 20) if len(data) >= 20 else (None, 0)
+    return None, 0
+
+def decode_packet(linktype, data, ts, wire_length, payload_bytes=0, keep=None):
+    """Decode one captured frame into a PacketRecord.
+
+    Returns None for frames without an IPv4/IPv6 header and for TCP/UDP/ICMP
+    headers cut short by the snap length. keep(proto, src, dst, sport, dport),
+    called with the raw address bytes, can also reject a packet before the
+    costlier part of decoding.
+    """
+    ethertype, offset = _network_offset(linktype, data)
+    end = len(data)
+    if ethertype == _ETHERTYPE_IPV4:
+        if end < offset + 20:
+            return None
+        ver_ihl, _, total_length, _, flags_frag, _, proto, src, dst = _ipv4(data, offset)
+        frag = flags_frag & 0x1FFF
+        if total_length:
+            # Ethernet pads short frames; the IP total length marks where the packet really ends
+            end = min(end, offset + total_length)
+        family, l4 = socket.AF_INET, offset + (ver_ihl & 0x0F) * 4
+    elif ethertype == _ETHERTYPE_IPV6:
+        if end < offset + 40:
+            return None
+        payload_length = _u16(data, offset + 4)[0]
+        proto = data[offset + 6]
+        family, src, dst = socket.AF_INET6, data[offset + 8:offset + 24], data[offset + 24:offset + 40]
+        if payload_length:
+            end = min(end, offset + 40 + payload_length)
+        l4, frag = offset + 40, 0
+        while proto in _IPV6_EXTENSION_HEADERS or proto == 44:
+            if end < l4 + 8:
+                break
+            if proto == 44:
+                frag = _u16(data, l4 + 2)[0] >> 3
+                proto, l4 = data[l4], l4 + 8
+            else:
+                proto, l4 = data[l4], l4 + (data[l4 + 1] + 1) * 8
+    else:
+        return None
+
+    sport = dport = flags = urgent = 0
+    payload_start = l4
+    if frag == 0:
+        # Later fragments carry no transport header, as in scapy
+        if proto == PROTO_TCP and end >= l4 + 20:
+            sport, dport, data_offset, flags, urgent = _tcp(data, l4)
+            payload_start = l4 + (data_offset >> 4) * 4
+        elif proto == PROTO_UDP and end >= l4 + 8:
+            sport, dport = _ports(data, l4)
+            payload_start = l4 + 8
+        elif proto in (PROTO_ICMP, PROTO_ICMPV6) and end >= l4 + 4:
+            sport, dport = data[l4], data[l4 + 1]
+            payload_start = l4 + 8
+        elif proto in (PROTO_TCP, PROTO_UDP, PROTO_ICMP, PROTO_ICMPV6):
+            return None
+    if keep is not None and not keep(proto, src, dst, sport, dport):
+        return None
+    src, dst = socket.inet_ntop(family, src), socket.inet_ntop(family, dst)
+    payload_length = max(end - payload_start, 0)
+    payload = bytes(data[payload_start:payload_start + payload_bytes]) if payload_bytes and payload_length else None
+    return PacketRecord(ts, src, dst, proto, sport, dport, flags, len(data), wire_length,
+                        frag, urgent, payload_length, payload)
+
+def payloads_complete(snaplen):
+    """Whether a snap length (0 is unlimited) keeps payloads whole enough for the content features."""
+    return not snaplen or snaplen >= config.PCAP_CONTENT_MIN_SNAPLEN
+
+def capture_snaplen(path):
+    """Snap length a pcap or pcapng file was captured with (its first interface's for pcapng)."""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+        magic = header[:4]
+        if magic in PCAP_MAGIC and len(header) == 24:
+            return struct.unpack_from(PCAP_MAGIC[magic][0] + 'I', header, 16)[0]
+        if magic == PCAPNG_SHB and len(header) >= 12:
+            endian = '<' if header[8:12] == b'\x4d\x3c\x2b\x1a' else '>'
+            f.seek(struct.unpack_from(endian + 'I', header, 4)[0])
+            while True:
+                block = f.read(16)
+                if len(block) < 16:
+                    return 0
+                block_type, block_length = struct.unpack_from(endian + 'II', block)
+                if block_type == 1:
+                    return struct.unpack_from(endian + 'I', block, 12)[0]
+                if block_length < 16:
+                    return 0
+                f.seek(block_length - 16, 1)
+    raise PcapFormatError(f"{path} is not a pcap or pcapng file")
+
+def pcap_ranges(path, parts):
+    """Split a classic pcap into at most parts runs of whole records, of about equal size.
+
+    Returns ([(start, end, first_packet), ...], packets): byte ranges, each
+    with the number of records before it, and the capture's record count.
+    Only record headers are read. Returns None for pcapng, which cannot be
+    entered midway.
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+        if magic == PCAPNG_SHB:
+            return None
+        size = os.fstat(f.fileno()).st_size
+        if magic not in PCAP_MAGIC or size < 24:
+            raise PcapFormatError(f"{path} is not a pcap or pcapng file")
+        captured_length = struct.Struct(PCAP_MAGIC[magic][0] + 'I').unpack_from
+        ranges, start, first, position, packets = [], 24, 0, 24, 0
+        step = max((size - 24) / parts, 1)
+        cut = 24 + step
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            while position + 16 <= size:
+                if position >= cut:
+                    ranges.append((start, position, first))
+                    start, first = position, packets
+                    cut = position + step
+                end = position + 16 + captured_length(mapped, position + 8)[0]
+                if end > size:
+                    # A record cut short, which the reader stops at too
+                    break
+                position = end
+                packets += 1
+        if position > start:
+            ranges.append((start, position, first))
+        return ranges, packets
+
+class PcapReader:
+    """Iterate PacketRecords from a pcap or pcapng file, one record in memory at a time.
+
+    packets counts every record read, including the ones that are not
+    yielded because they carry no decodable IP packet or keep rejected them.
+    A classic pcap can also be read in part: span is one (start, end,
+    first_packet) range from pcap_ranges, frames a pair of arrays with the
+    byte offsets of the records to read and their 1-based numbers in the
+    capture. packets then counts from the start of the capture, and offset
+    is the byte offset of the record being decoded.
+    """
+
+    def __init__(self, path, payload_bytes=0, keep=None, use_mmap=config.PCAP_READER_MMAP, span=None, frames=None):
+        self.path = path
+        self.payload_bytes = payload_bytes
+        self.keep = keep
+        self.use_mmap = use_mmap
+        self.span = span
+        self.frames = frames
+        self.packets = 0
+        self.decoded = 0
+        self.offset = None
+        self.format = None
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            if not self.use_mmap:
+                yield from self._records(f)
+                return
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                raise PcapFormatError(f"{self.path} is not a pcap or pcapng file")
+            with mapped:
+                # mmap.read() slices the mapping like a file, without a read buffer of its own
+                released = 0
+                for record in self._records(mapped):
+                    yield record
+                    if not self.packets & 0xFFF and mapped.tell() - released >= _RELEASE_BYTES:
+                        # Drop pages already parsed from this process; they stay in the page cache
+                        released = mapped.tell() - mapped.tell() % mmap.PAGESIZE
+                        mapped.madvise(mmap.MADV_DONTNEED, 0, released)
+
+    def _records(self, f):
+        magic = f.read(4)
+        if magic in PCAP_MAGIC:
+            self.format = 'pcap'
+            frames = self._pcap_frames(f, magic)
+        elif magic == PCAPNG_SHB:
+            self.format = 'pcapng'
+            if self.span is not None or self.frames is not None:
+                raise PcapFormatError(f"{self.path} is a pcapng file, which can only be read whole")
+            frames = self._pcapng_frames(f)
+        else:
+            raise PcapFormatError(f"{self.path} is not a pcap or pcapng file")
+        payload_bytes, keep = self.payload_bytes, self.keep
+        for linktype, ts, data, wire_length in frames:
+            self.packets += 1
+            record = decode_packet(linktype, data, ts, wire_length, payload_bytes, keep)
+            if record is not None:
+                self.decoded += 1
+                yield record
+
+    def _pcap_frames(self, f, magic):
+        endian, resolution = PCAP_MAGIC[magic]
+        header = f.read(20)
+        if len(header) < 20:
+            raise PcapFormatError(f"{self.path} has a truncated pcap header")
+        linktype = struct.unpack(endian + 'I', header[16:20])[0] & 0x0FFFFFFF
+        record = struct.Struct(endian + 'IIII')
+        read = f.read
+        if self.frames is not None:
+            yield from self._selected_frames(f, linktype, resolution, record)
+            return
+        position, end = 24, None
+        if self.span is not None:
+            position, end, self.packets = self.span
+            f.seek(position)
+        while end is None or position < end:
+            header = read(16)
+            if len(header) < 16:
+                return
+            ts_sec, ts_frac, captured, wire_length = record.unpack(header)
+            data = read(captured)
+            if len(data) < captured:
+                return
+            self.offset = position
+            position += 16 + captured
+            yield linktype, ts_sec + ts_frac * resolution, data, wire_length
+
+    def _selected_frames(self, f, linktype, resolution, record):
+        seek, read = f.seek, f.read
+        offsets, numbers = self.frames
+        for offset, number in zip(offsets.tolist(), numbers.tolist()):
+            seek(offset)
+            ts_sec, ts_frac, captured, wire_length = record.unpack(read(16))
+            # _records counts the frame, bringing packets to its number
+            self.offset, self.packets = offset, number - 1
+            yield linktype, ts_sec + ts_frac * resolution, read(captured), wire_length
+
+    def _pcapng_frames(self, f):
+        endian, interfaces = '<', []
+        read = f.read
+        block_type = PCAPNG_SHB
+        while True:
+            if block_type is None:
+                block_type = read(4)
+                if len(block_type) < 4:
+                    return
+            raw_length = read(4)
+            if len(raw_length) < 4:
+                return
+            if block_type == PCAPNG_SHB:
+                byte_order = read(4)
+                endian = '<' if byte_order == b'\x4d\x3c\x2b\x1a' else '>'
+                read(struct.unpack(endian + 'I', raw_length)[0] - 12)
+                interfaces = []
+                block_type = None
+                continue
+            block_length = struct.unpack(endian + 'I', raw_length)[0]
+            if block_length < 12:
+                raise PcapFormatError(f"{self.path} has a corrupt pcapng block")
+            body = read(block_length - 12)
+            read(4)
+            code = struct.unpack(endian + 'I', block_type)[0]
+            block_type = None
+            if len(body) < block_length - 12:
+                return
+            if code == 1:
+                interfaces.append(self._interface(endian, body))
+            elif code == 6 and len(body) >= 20:
+                interface, ts_high, ts_low, captured, wire_length = struct.unpack_from(endian + 'IIIII', body)
+                linktype, resolution, offset = self._lookup(interfaces, interface)
+                yield linktype, ((ts_high << 32) | ts_low) * resolution + offset, body[20:20 + captured], wire_length
+            elif code == 3 and interfaces:
+                wire_length = struct.unpack_from(endian + 'I', body)[0]
+                linktype, _, _ = interfaces[0]
+                # Simple packet blocks carry no timestamp
+                yield linktype, 0.0, body[4:4 + wire_length], wire_length
+            elif code == 2 and len(body) >= 20:
+                interface, _, ts_high, ts_low, captured, wire_length = struct.unpack_from(endian + 'HHIIII', body)
+                linktype, resolution, offset = self._lookup(interfaces, interface)
+                yield linktype, ((ts_high << 32) | ts_low) * resolution + offset, body[20:20 + captured], wire_length
+
+    def _lookup(self, interfaces, interface):
+        if interface >= len(interfaces):
+            raise PcapFormatError(f"{self.path} has a packet for undeclared pcapng interface {interface}")
+        return interfaces[interface]
+
+    @staticmethod
+    def _interface(endian, body):
+        """(linktype, timestamp resolution in seconds, timestamp offset) from an interface description block."""
+        linktype = struct.unpack_from(endian + 'H', body)[0]
+        resolution, offset, position = 1e-6, 0, 8
+        while position + 4 <= len(body):
+            option, length = struct.unpack_from(endian + 'HH', body, position)
+            if option == 0:
+                break
+            value = body[position + 4:position + 4 + length]
+            if option == 9 and length >= 1:
+                exponent = value[0]
+                resolution = 2.0 ** -(exponent & 0x7F) if exponent & 0x80 else 10.0 ** -exponent
+            elif option == 14 and length >= 8:
+                offset = struct.unpack(endian + 'q', value[:8])[0]
+            position += 4 + ((length + 3) & ~3)
+        return linktype, resolution, offset
+
+class PcapStreamDecoder:
+    """Push parser for a classic pcap byte stream, such as tshark -F pcap -w - on a pipe.
+
+    feed() takes bytes as they arrive in chunks of any size and returns the
+    records of the frames completed by them; a partial frame waits in the
+    buffer for the next chunk. pcapng streams are refused, tshark writes
+    pcap with -F pcap. Payloads are not kept from a stream whose snap length
+    truncates them (see payloads_complete).
+    """
+
+    def __init__(self, payload_bytes=0, keep=None):
+        self.payload_bytes = payload_bytes
+        self.keep = keep
+        self.packets = 0
+        self.decoded = 0
+        self.bytes = 0
+        self.snaplen = None
+        self._buffer = bytearray()
+        self._record = None
+        self._linktype = None
+        self._resolution = None
+
+    def _header(self):
+        magic = bytes(self._buffer[:4])
+        if magic == PCAPNG_SHB:
+            raise PcapFormatError("pcapng streams are not supported, capture with -F pcap")
+        if magic not in PCAP_MAGIC:
+            raise PcapFormatError("stream is not a pcap capture")
+        endian, self._resolution = PCAP_MAGIC[magic]
+        self.snaplen, linktype = struct.unpack_from(endian + 'II', self._buffer, 16)
+        self._linktype = linktype & 0x0FFFFFFF
+        if not payloads_complete(self.snaplen):
+            # A header-only capture: truncated payloads would give wrong content features
+            self.payload_bytes = 0
+        self._record = struct.Struct(endian + 'IIII')
+        del self._buffer[:24]
+
+    def feed(self, data):
+        buffer = self._buffer
+        buffer += data
+        self.bytes += len(data)
+        if self._record is None:
+            if len(buffer) < 24:
+                return []
+            self._header()
+        unpack, linktype, resolution = self._record.unpack_from, self._linktype, self._resolution
+        payload_bytes, keep = self.payload_bytes, self.keep
+        records, position, available = [], 0, len(buffer)
+        while available - position >= 16:
+            ts_sec, ts_frac, captured, wire_length = unpack(buffer, position)
+            end = position + 16 + captured
+            if end > available:
+                break
+            self.packets += 1
+            record = decode_packet(linktype, bytes(buffer[position + 16:end]), ts_sec + ts_frac * resolution,
+                                   wire_length, payload_bytes, keep)
+            if record is not None:
+                records.append(record)
+            position = end
+        del buffer[:position]
+        self.decoded += len(records)
+        return records
+
+    @property
+    def pending_bytes(self):
+        """Bytes of an incomplete frame (or header) still waiting for more input."""
+        return len(self._buffer)
+
+class PcapProgress:
+    """Packets and bytes written so far to a classic pcap file that is still growing, such as tshark -F pcap -w.
+
+    update() walks only the record headers added since the last call; a
+    frame that is not completely written yet is counted next time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.packets = 0
+        self.bytes = 0
+        self._offset = 24
+        self._record = None
+
+    def update(self):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return self
+        self.bytes = size
+        if size < 24:
+            return self
+        with open(self.path, 'rb') as f:
+            if self._record is None:
+                magic = f.read(4)
+                if magic not in PCAP_MAGIC:
+                    return self
+                self._record = struct.Struct(PCAP_MAGIC[magic][0] + 'IIII')
+            while self._offset + 16 <= size:
+                f.seek(self._offset)
+                end = self._offset + 16 + self._record.unpack(f.read(16))[2]
+                if end > size:
+                    break
+                self._offset = end
+                self.packets += 1
+        return self
+
+def iter_packets(path, payload_bytes=0):
+    """Convenience generator over PcapReader(path, payload_bytes)."""
+    return iter(PcapReader(path, payload_bytes))
@@ -1,26 +1,54 @@
-from scapy.all import *
-from collections import defaultdict
-import math
+import argparse
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
 import config
+from .content_matcher import get_content_matcher
+from .feature_batch import FeatureBatch
+from .flows import FlowTracker, flow_shard, shard_filter
+from .traffic_features import window_features
+from .pcapreader import PcapReader, capture_snaplen, payloads_complete, pcap_ranges, PROTO_TCP, PROTO_UDP, PROTO_ICMP, PROTO_ICMPV6, TCP_FIN, TCP_SYN, TCP_RST, TCP_PSH, TCP_ACK, TCP_URG
 
-def get_service_name(port):
-    services = {
-        80: 'http', 
-        443: 'http_443', 
-        22: 'ssh', 
-        25: 'smtp',
-        53: 'domain',
-        21: 'ftp',
-        23: 'telnet',
-        110: 'pop_3',
-        143: 'imap4',
-        512: 'exec',
-        513: 'login',
-        514: 'shell',
-        3306: 'sql_net',
-        3389: 'ms-term-server'
-    }
-    return services.get(port, 'other')
+class CaptureTooLarge(ValueError):
+    """Raised when a capture holds more packets than the caller allows."""
+
+PROTOCOL_NAMES = {PROTO_TCP: 'tcp', PROTO_UDP: 'udp', PROTO_ICMP: 'icmp', PROTO_ICMPV6: 'icmp'}
+
+TCP_SERVICES = {
+    80: 'http', 
+    443: 'http_443', 
+    22: 'ssh', 
+    25: 'smtp',
+    53: 'domain',
+    21: 'ftp',
+    23: 'telnet',
+    110: 'pop_3',
+    143: 'imap4',
+    512: 'exec',
+    513: 'login',
+    514: 'shell',
+    3306: 'sql_net',
+    3389: 'ms-term-server'
+}
+
+UDP_SERVICES = {53: 'domain_u', 123: 'ntp_u', 69: 'tftp_u'}
+
+# ICMP services are named after the message type (ICMPv6 types mapped alongside)
+ICMP_SERVICES = {8: 'eco_i', 128: 'eco_i', 0: 'ecr_i', 129: 'ecr_i', 3: 'urp_i', 1: 'urp_i',
+                 5: 'red_i', 137: 'red_i', 13: 'tim_i', 14: 'tim_i'}
+
+# Every name get_service_name can return
+SERVICE_NAMES = frozenset([*TCP_SERVICES.values(), *UDP_SERVICES.values(), *ICMP_SERVICES.values(), 'other', 'oth_i'])
+
+def get_service_name(port, protocol='tcp'):
+    if protocol == 'udp':
+        return UDP_SERVICES.get(port, 'other')
+    if protocol == 'icmp':
+        # For ICMP flows the port is the message type
+        return ICMP_SERVICES.get(port, 'oth_i')
+    return TCP_SERVICES.get(port, 'other')
 
 def determine_nslkdd_flag(tcp_flags):
     """Map TCP flags to NSL-KDD flag categories"""
@@ -32,109 +60,111 @@ def determine_nslkdd_flag(tcp_flags):
         return 'RSTR'
     return 'OTH'
 
-def get_tcp_flags(packets):
-    flags = set()
-    for p in packets:
-        if TCP in p:
-            if p[TCP].flags & 0x01: flags.add('FIN')
-            if p[TCP].flags & 0x02: flags.add('SYN')
-            if p[TCP].flags & 0x04: flags.add('RST')
-            if p[TCP].flags & 0x08: flags.add('PSH')
-            if p[TCP].flags & 0x10: flags.add('ACK')
-            if p[TCP].flags & 0x20: flags.add('URG')
+FLAG_NAMES = ((TCP_FIN, 'FIN'), (TCP_SYN, 'SYN'), (TCP_RST, 'RST'), (TCP_PSH, 'PSH'), (TCP_ACK, 'ACK'), (TCP_URG, 'URG'))
+
+def get_tcp_flags(conn):
+    flags = {name for bit, name in FLAG_NAMES if conn.flags & bit}
     return determine_nslkdd_flag(flags)
 
 def count_failed_logins(payloads):
     """Count failed login attempts in payloads"""
-    patterns = [b'login failed', b'authentication failed', b'incorrect password']
-    return sum(1 for p in payloads if any(pat in p.lower() for pat in patterns))
+    return get_content_matcher().feature_hits(payloads)['num_failed_logins']
 
-def group_packets_into_connections(packets, timeout=120):
-    """Group packets into connections based on 5-tuple with timeout"""
-    connections = defaultdict(list)
-    
-    for pkt in packets:
-        if IP in pkt and TCP in pkt:
-            key = (pkt[IP].src, pkt[TCP].sport,
-                   pkt[IP].dst, pkt[TCP].dport,
-                   pkt[IP].proto)
-            connections[key].append(pkt)
-    
-    return list(connections.values())
+def group_packets_into_connections(packets, timeout=config.FLOW_IDLE_TIMEOUT, tracker=None):
+    """Group packet records into bidirectional TCP/UDP/ICMP flows, ended after timeout idle seconds"""
+    if tracker is None:
+        tracker = FlowTracker(idle_timeout=timeout)
+    return tracker.consume(packets).finish()
 
 # Feature Extraction Functions
-def get_basic_features(packets):
-    timestamps = [p.time for p in packets]
+def get_basic_features(flows):
+    """Basic feature columns for every flow of a CompletedFlows."""
+    packets = flows.column('packets')
+    src, sport = flows.key_column(0), flows.key_column(1)
+    dst, dport = flows.key_column(2), flows.key_column(3)
+    protocols = [PROTOCOL_NAMES[proto] for proto in flows.key_column(4)]
     return {
-        'duration': max(timestamps) - min(timestamps) if len(timestamps) > 1 else 0,
-        'protocol_type': 'tcp' if packets[0][IP].proto == 6 else 'udp',
-        'service': get_service_name(packets[0][TCP].dport),
-        'flag': get_tcp_flags(packets),
-        'src_bytes': sum(len(p) for p in packets if p[IP].src == packets[0][IP].src),
-        'dst_bytes': sum(len(p) for p in packets if p[IP].dst == packets[0][IP].dst),
-        'land': 1 if (packets[0][IP].src == packets[0][IP].dst and 
-                     packets[0][TCP].sport == packets[0][TCP].dport) else 0,
-        'wrong_fragment': sum(1 for p in packets if IP in p and p[IP].frag != 0),
-        'urgent': sum(p[TCP].urgptr for p in packets if TCP in p and hasattr(p[TCP], 'urgptr'))
+        'duration': np.where(packets > 1, flows.column('max_ts') - flows.column('min_ts'), 0.0),
+        'protocol_type': protocols,
+        'service': [get_service_name(sp if protocol == 'icmp' else dp, protocol)
+                    for sp, dp, protocol in zip(sport, dport, protocols)],
+        'flag': flows.nslkdd_flags(),
+        'src_bytes': flows.column('src_bytes'),
+        'dst_bytes': flows.column('dst_bytes'),
+        'land': np.array([s == d and sp == dp for s, sp, d, dp in zip(src, sport, dst, dport)], dtype=np.int64),
+        'wrong_fragment': flows.column('wrong_fragment'),
+        'urgent': flows.column('urgent')
     }
 
-def get_content_features(packets):
-    payloads = [p[TCP].payload.load for p in packets if TCP in p and hasattr(p[TCP].payload, 'load')]
+def get_content_features(flows):
+    """Content feature columns for every flow of a CompletedFlows."""
+    n = len(flows)
+    dport = np.array(flows.key_column(3), dtype=np.int64)
     return {
-        'hot': sum(1 for p in payloads if len(p) > 100),
-        'num_failed_logins': count_failed_logins(payloads),
-        'logged_in': 1 if any(b'login successful' in p.lower() for p in payloads) else 0,
-        'num_compromised': 0,  
-        'root_shell': 1 if any(b'root#' in p.lower() for p in payloads) else 0,
-        'su_attempted': 1 if any(b'su -' in p.lower() for p in payloads) else 0,
-        'num_root': sum(1 for p in payloads if b'root:' in p.lower()),
-        'num_file_creations': sum(1 for p in payloads if b'mkdir' in p.lower() or b'touch' in p.lower()),
-        'num_shells': sum(1 for p in payloads if b'sh -c' in p.lower()),
-        'num_access_files': sum(1 for p in payloads if b'/etc/passwd' in p.lower()),
-        'num_outbound_cmds': 0,  # Typically 0 in modern traffic
-        'is_host_login': 1 if packets[0][TCP].dport == 513 else 0,
-        'is_guest_login': 1 if packets[0][TCP].dport == 514 else 0
+        'hot': flows.column('hot'),
+        'num_failed_logins': flows.column('num_failed_logins'),
+        'logged_in': flows.column('logged_in'),
+        'num_compromised': np.zeros(n, dtype=np.int64),
+        'root_shell': flows.column('root_shell'),
+        'su_attempted': flows.column('su_attempted'),
+        'num_root': flows.column('num_root'),
+        'num_file_creations': flows.column('num_file_creations'),
+        'num_shells': flows.column('num_shells'),
+        'num_access_files': flows.column('num_access_files'),
+        'num_outbound_cmds': np.zeros(n, dtype=np.int64),  # Typically 0 in modern traffic
+        'is_host_login': (dport == 513).astype(np.int64),
+        'is_guest_login': (dport == 514).astype(np.int64)
     }
 
+def _connections_until(all_connections, current_conn):
+    position = next(i for i, c in enumerate(all_connections) if c is current_conn)
+    return all_connections[:position + 1]
+
 def get_time_features(all_connections, current_conn, time_window=2):
-    window_start = current_conn[-1].time - time_window
-    src_ip = current_conn[0][IP].src
+    """Reference per-connection version, O(n) per call; process_pcap uses the incremental TrafficWindows.
+
+    all_connections is ordered by end time (see traffic_features), and only
+    connections up to current_conn are in its window.
+    """
+    window_start = current_conn.end_ts - time_window
+    src_ip = current_conn.src
     
-    related_conns = [c for c in all_connections 
-                    if c[0][IP].src == src_ip and
-                    c[-1].time >= window_start]
+    related_conns = [c for c in _connections_until(all_connections, current_conn)
+                    if c.src == src_ip and
+                    c.end_ts >= window_start]
     
     total = len(related_conns)
     srv_count = sum(1 for c in related_conns 
-                   if c[0][TCP].dport == current_conn[0][TCP].dport)
+                   if c.dport == current_conn.dport)
     
     return {
         'count': total,
         'srv_count': srv_count,
         'serror_rate': calc_error_rate(related_conns, 'RST'),
-        'srv_serror_rate': calc_srv_error_rate(related_conns, current_conn[0][TCP].dport, 'RST'),
+        'srv_serror_rate': calc_srv_error_rate(related_conns, current_conn.dport, 'RST'),
         'rerror_rate': calc_error_rate(related_conns, 'REJ'),
-        'srv_rerror_rate': calc_srv_error_rate(related_conns, current_conn[0][TCP].dport, 'REJ'),
+        'srv_rerror_rate': calc_srv_error_rate(related_conns, current_conn.dport, 'REJ'),
         'same_srv_rate': srv_count/total if total > 0 else 0,
         'diff_srv_rate': (total - srv_count)/total if total > 0 else 0,
-        'srv_diff_host_rate': len({c[0][IP].dst for c in related_conns})/total if total > 0 else 0
+        'srv_diff_host_rate': len({c.dst for c in related_conns})/total if total > 0 else 0
     }
 
-def get_host_features(all_connections, current_conn):
-    dst_ip = current_conn[0][IP].dst
-    dst_port = current_conn[0][TCP].dport
+def get_host_features(all_connections, current_conn, host_window=100):
+    """Reference per-connection version over the last host_window connections to the same host."""
+    dst_ip = current_conn.dst
+    dst_port = current_conn.dport
     
-    dst_host_conns = [c for c in all_connections if c[0][IP].dst == dst_ip]
+    dst_host_conns = [c for c in _connections_until(all_connections, current_conn) if c.dst == dst_ip][-host_window:]
     total = len(dst_host_conns)
-    srv_count = sum(1 for c in dst_host_conns if c[0][TCP].dport == dst_port)
+    srv_count = sum(1 for c in dst_host_conns if c.dport == dst_port)
     
     return {
         'dst_host_count': total,
         'dst_host_srv_count': srv_count,
         'dst_host_same_srv_rate': srv_count/total if total > 0 else 0,
         'dst_host_diff_srv_rate': (total - srv_count)/total if total > 0 else 0,
-        'dst_host_same_src_port_rate': len({c[0][TCP].sport for c in dst_host_conns})/total if total > 0 else 0,
-        'dst_host_srv_diff_host_rate': len({c[0][IP].src for c in dst_host_conns})/total if total > 0 else 0,
+        'dst_host_same_src_port_rate': len({c.sport for c in dst_host_conns})/total if total > 0 else 0,
+        'dst_host_srv_diff_host_rate': len({c.src for c in dst_host_conns})/total if total > 0 else 0,
         'dst_host_serror_rate': calc_error_rate(dst_host_conns, 'RST'),
         'dst_host_srv_serror_rate': calc_srv_error_rate(dst_host_conns, dst_port, 'RST'),
         'dst_host_rerror_rate': calc_error_rate(dst_host_conns, 'REJ'),
@@ -148,56 +178,179 @@ def calc_error_rate(connections, flag_type):
     return errors / total
 
 def calc_srv_error_rate(connections, port, flag_type):
-    srv_conns = [c for c in connections if c[0][TCP].dport == port]
+    srv_conns = [c for c in connections if c.dport == port]
     return calc_error_rate(srv_conns, flag_type)
 
+def read_packets(pcap_file, max_packets=None):
+    """Stream packet records from pcap_file, raising CaptureTooLarge past max_packets packets."""
+    return limit_packets(PcapReader(pcap_file, payload_bytes=config.PCAP_PAYLOAD_BYTES), max_packets)
+
+def limit_packets(reader, max_packets=None):
+    """Records of a PcapReader, raising CaptureTooLarge once it has read more than max_packets packets."""
+    for record in reader:
+        if max_packets and reader.packets > max_packets:
+            raise CaptureTooLarge(f"The capture has more than {max_packets} packets.")
+        yield record
+    if max_packets and reader.packets > max_packets:
+        raise CaptureTooLarge(f"The capture has more than {max_packets} packets.")
+
+def window_order(end_ts, first_seq):
+    """Order connections are fed to the traffic windows in: by end time, then by first packet."""
+    return np.lexsort((first_seq, end_ts)).tolist()
+
+def get_traffic_features(flows, windows=None):
+    """Time and host feature columns for every flow of a CompletedFlows."""
+    return window_features(flows.key_column(0), flows.key_column(1), flows.key_column(2), flows.key_column(3),
+                           flows.column('end_ts').tolist(), flows.nslkdd_flags(),
+                           window_order(flows.column('end_ts'), flows.column('first_seq')), windows)
+
+def split_capture(pcap_file, shards, max_packets=None):
+    """Byte ranges (see pcap_ranges) to locate the shards' packets in, or None for a pcapng capture.
+
+    Raises CaptureTooLarge past max_packets packets before any packet is decoded.
+    """
+    split = pcap_ranges(pcap_file, shards)
+    if split is None:
+        return None
+    ranges, packets = split
+    if max_packets and packets > max_packets:
+        raise CaptureTooLarge(f"The capture has more than {max_packets} packets.")
+    return ranges
+
+def locate_shards(pcap_file, span, shards):
+    """Byte offsets and capture numbers of the packets in one byte range, per flow-hash shard.
+
+    Only the headers that go into the flow hash are decoded.
+    """
+    offsets = [array('q') for _ in range(shards)]
+    numbers = [array('q') for _ in range(shards)]
+    reader = PcapReader(pcap_file, span=span)
+
+    def keep(proto, src, dst, sport, dport):
+        shard = flow_shard(proto, src, dst, sport, dport, shards)
+        offsets[shard].append(reader.offset)
+        numbers[shard].append(reader.packets)
+        return False
+
+    reader.keep = keep
+    for _ in reader:
+        pass
+    return [(np.frombuffer(o, dtype=np.int64), np.frombuffer(n, dtype=np.int64)) for o, n in zip(offsets, numbers)]
+
+def shard_frames(located):
+    """Frames of every shard across the byte ranges located, in capture order, for extract_flow_features."""
+    return [(np.concatenate([part[shard][0] for part in located]), np.concatenate([part[shard][1] for part in located]))
+            for shard in range(len(located[0]))]
+
+def extract_flow_features(pcap_file, max_packets=None, shard=0, shards=1, content=None, frames=None):
+    """Per-flow basic and content features for the flows of one shard of a capture.
+
+    With frames (from shard_frames) only the shard's own records are read
+    and decoded. Without them, as for pcapng, the shard scans the whole
+    capture and decodes only the packets whose symmetric flow hash falls on
+    it. Flows are numbered by their position in the capture, so the shards
+    merge back into capture order. Also returns the per-flow inputs of the
+    cross-flow window features, which merge_flow_features computes once
+    every shard is in, and the first and last packet times for the
+    connection metadata.
+
+    content says whether payloads are scanned for the content features; by
+    default only when the capture's snap length kept them whole. Without it
+    the payload-derived content columns stay 0.
+    """
+    if content is None:
+        content = payloads_complete(capture_snaplen(pcap_file))
+    keep = shard_filter(shard, shards) if shards > 1 and frames is None else None
+    reader = PcapReader(pcap_file, payload_bytes=config.PCAP_PAYLOAD_BYTES if content else 0, keep=keep,
+                        frames=frames)
+    tracker = FlowTracker(positions=lambda: reader.packets)
+    flows = group_packets_into_connections(limit_packets(reader, max_packets), tracker=tracker)
+    columns = {}
+    columns.update(get_basic_features(flows))
+    columns.update(get_content_features(flows))
+    return {
+        'first_seq': flows.column('first_seq'),
+        'columns': columns,
+        'window': {'src': flows.key_column(0), 'sport': flows.key_column(1), 'dst': flows.key_column(2),
+                   'dport': flows.key_column(3), 'end_ts': flows.column('end_ts')},
+        'times': {'first_ts': flows.column('first_ts'), 'last_ts': flows.column('last_ts')},
+    }
+
+def merge_flow_features(parts, windows=None):
+    """FeatureBatch for every flow of the shards in parts, in capture order, with the window features added.
+
+    Connections go through the traffic windows in the order OnlineFeatureExtractor
+    releases them, so the result matches the online engine on the same capture.
+    """
+    if len(parts) == 1:
+        columns, window, times = dict(parts[0]['columns']), parts[0]['window'], parts[0]['times']
+        first_seq = parts[0]['first_seq']
+    else:
+        # Flows from different shards interleave by their first packet, exactly as one tracker would emit them
+        order = np.argsort(np.concatenate([part['first_seq'] for part in parts]), kind='stable')
+
+        def merged(section):
+            return {name: np.concatenate([np.asarray(part[section][name]) for part in parts])[order]
+                    for name in parts[0][section]}
+
+        columns, window, times = merged('columns'), merged('window'), merged('times')
+        first_seq = np.concatenate([part['first_seq'] for part in parts])[order]
+    end_ts = np.asarray(window['end_ts'])
+    columns.update(window_features(window['src'], window['sport'], window['dst'], window['dport'], end_ts.tolist(),
+                                   columns['flag'], window_order(end_ts, first_seq), windows))
+    metadata = {'src_ip': window['src'], 'src_port': window['sport'], 'dst_ip': window['dst'],
+                'dst_port': window['dport'], **times, 'end_ts': end_ts}
+    return FeatureBatch.from_columns(columns, metadata)
+
+def extract_sharded(pcap_file, max_packets=None, workers=1, content=None):
+    """extract_flow_features over workers flow-hash shards in a process pool.
+
+    A classic pcap is read in two parallel passes: each worker hashes the
+    packets of one byte range to find their shards, then each shard decodes
+    and tracks only its own packets.
+    """
+    if workers <= 1:
+        return [extract_flow_features(pcap_file, max_packets, content=content)]
+    ranges = split_capture(pcap_file, workers, max_packets)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        frames = [None] * workers
+        if ranges is not None:
+            frames = shard_frames(list(executor.map(locate_shards, repeat(pcap_file), ranges, repeat(workers))))
+        futures = [executor.submit(extract_flow_features, pcap_file, max_packets, shard, workers, content, frames[shard])
+                   for shard in range(workers)]
+        return [future.result() for future in futures]
+
 # Main Processing
-def process_pcap(pcap_file):
-    packets = rdpcap(pcap_file)
-    all_connections = group_packets_into_connections(packets)
-    
-    nslkdd_features = []
-    for conn in all_connections:
-        features = {}
-        features.update(get_basic_features(conn))
-        features.update(get_content_features(conn))
-        features.update(get_time_features(all_connections, conn))
-        features.update(get_host_features(all_connections, conn))
-        nslkdd_features.append(features)
-    
-    return nslkdd_features
-
-def save_to_arff(features, output_file):
-    FEATURE_ORDER = [
-        'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
-        'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
-        'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
-        'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
-        'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
-        'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
-        'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
-        'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
-        'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
-        'dst_host_rerror_rate', 'dst_host_srv_rerror_rate'
-    ]
-    
-    with open(output_file, 'w') as f:
-        f.write('@RELATION NSL_KDD\n')
-        # Write attribute definitions
-        f.write('@ATTRIBUTE duration numeric\n')
-        f.write('@ATTRIBUTE protocol_type {tcp,udp,icmp}\n')
-        f.write('@ATTRIBUTE service {aol,auth,bgp,courier,csnet_ns,ctf,daytime,discard,domain,domain_u,echo,eco_i,ecr_i,efs,exec,finger,ftp,ftp_data,gopher,harvest,hostnames,http,http_2784,http_443,http_8001,imap4,IRC,iso_tsap,klogin,kshell,ldap,link,login,mtp,name,netbios_dgm,netbios_ns,netbios_ssn,netstat,nnsp,nntp,ntp_u,other,pm_dump,pop_2,pop_3,printer,private,red_i,remote_job,rje,shell,smtp,sql_net,ssh,sunrpc,supdup,systat,telnet,tftp_u,tim_i,time,urh_i,urp_i,uucp,uucp_path,vmnet,whois,X11,Z39_50}\n')
-        f.write('@ATTRIBUTE flag {OTH,REJ,RSTO,RSTOS0,RSTR,S0,S1,S2,S3,SF,SH}\n')
-        # ... continue with all other attributes
-        
-        f.write('@DATA\n')
-        for feat in features:
-            f.write(','.join(str(feat.get(k, '?')) for k in FEATURE_ORDER) + '\n')
-
-# # Usage
-# if __name__ == "__main__":
-#     features = process_pcap(config.PCAP_SAVE_PATH)
-#     save_to_arff(features, "nslkdd_features.arff")
-#     import pandas as pd
-#     df = pd.DataFrame(features)
-#     df.to_csv("the_features.csv", index=False)
+def process_pcap(pcap_file, max_packets=None, workers=1, content=None):
+    """FeatureBatch of NSL-KDD features and connection metadata for every flow in pcap_file.
+
+    Flows are optionally extracted on workers processes. content is passed
+    to extract_flow_features.
+    """
+    return merge_flow_features(extract_sharded(pcap_file, max_packets, workers, content))
+
+def save_to_arff(batch, output_file):
+    """Write a FeatureBatch to output_file as NSL-KDD ARFF (see export.ArffWriter)."""
+    from .export import export_batch
+    export_batch(batch, output_file, 'arff')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Extract NSL-KDD features from a pcap/pcapng capture')
+    parser.add_argument('--pcap_path', type=str, default=config.PCAP_SAVE_PATH)
+    parser.add_argument('--arff_path', type=str, default=config.PCAP_OUTPUT_PATH)
+    parser.add_argument('--csv_path', type=str, default=None)
+    parser.add_argument('--parquet_path', type=str, default=None)
+    parser.add_argument('--include_metadata', action='store_true',
+                        help='Append connection endpoints and times to the exported columns')
+    parser.add_argument('--workers', type=int, default=config.PCAP_EXTRACT_WORKERS,
+                        help='Processes to shard flows across (1 extracts serially)')
+    return parser.parse_args()
+
+# Usage, from the backend directory: python -m src.Capture.processpcap [--workers 8]
+if __name__ == "__main__":
+    args = parse_args()
+    from .export import export_batch
+    batch = process_pcap(args.pcap_path, workers=args.workers)
+    for path, format in ((args.arff_path, 'arff'), (args.csv_path, 'csv'), (args.parquet_path, 'parquet')):
+        if path:
+            export_batch(batch, path, format, include_metadata=args.include_metadata)
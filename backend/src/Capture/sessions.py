@@ -0,0 +1,299 @@
+"""Capture sessions: every running tshark, one-shot, live or continuous, accounted for in one place.
+
+Every capture request gets a CaptureSession with a directory of its own
+under CAPTURE_SESSIONS_DIR, so concurrent captures never share a file.
+Live detection streams and the continuous capture open a session too,
+of kind 'stream' or 'continuous', and attach() the tshark they start
+themselves. At most max_sessions sessions of any kind exist at once,
+counting those whose capture is being extracted or exported, and a
+duration is at most CAPTURE_MAX_DURATION seconds. A session can be cancelled while it runs:
+tshark is sent SIGTERM so it closes the pcap cleanly, and is only killed
+if it has not exited after CAPTURE_STOP_TIMEOUT seconds. close() removes
+the session directory; it is called when the request that owns the
+session is done with its files, whatever the outcome.
+
+status() reports each session's state and the packets and bytes tshark
+has written so far (or, for a stream, read from its pipe). status() and
+cancel() take the owner asking: a session of another owner is reported as
+not found, and owner=None (an admin) sees every session.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import deque
+import config
+from .capture import CAPTURE_INTERFACES, CaptureProfile, find_tshark
+from .pcapreader import PcapProgress
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ENDED_STATES = ('done', 'cancelled', 'failed')
+SESSION_KINDS = ('capture', 'stream', 'continuous')
+
+class CaptureSessionError(RuntimeError):
+    """Raised when a capture session cannot be started, or ended without a usable capture."""
+
+class CaptureLimitError(CaptureSessionError):
+    """Raised when max_sessions sessions are already open."""
+
+class CaptureCancelled(CaptureSessionError):
+    """Raised to the owner of a session that was cancelled."""
+
+class CaptureAccessError(CaptureSessionError):
+    """Raised when a user acts on a capture that another user started."""
+
+class CaptureSession:
+    """One tshark capture of duration seconds into directory/capture.pcap, taken with a CaptureProfile.
+
+    Sessions of another kind than 'capture' write no file here; their owner starts tshark and attach()es it.
+    """
+
+    def __init__(self, manager, session_id, directory, duration, owner=None, profile=None, kind='capture'):
+        self.manager = manager
+        self.profile = profile if profile is not None else CaptureProfile()
+        self.id = session_id
+        self.kind = kind
+        self.directory = directory
+        self.duration = duration
+        self.owner = owner
+        self.pcap_path = os.path.join(directory, 'capture.pcap')
+        self.log_path = os.path.join(directory, 'tshark.log')
+        self.state = 'starting'
+        self.interface = None
+        self.error = None
+        self.created_at = time.time()
+        self.captured_at = None
+        self.ended_at = None
+        self._process = None
+        self._progress = PcapProgress(self.pcap_path) if kind == 'capture' else None
+        self._on_cancel = None
+
+    def path(self, name):
+        """Path for another file of this session, such as an export; removed with the session."""
+        return os.path.join(self.directory, name)
+
+    def tshark_command(self, interface):
+        return [find_tshark(), '-i', interface, '-q', '-F', 'pcap', '-a', f'duration:{self.duration}',
+                *self.profile.tshark_arguments(), '-w', self.pcap_path]
+
+    async def _start(self, interface=None):
+        # Like the other captures, try the known interfaces until tshark stays up on one
+        errors = []
+        for candidate in ([interface] if interface else CAPTURE_INTERFACES):
+            with open(self.log_path, 'w') as log:
+                process = await asyncio.create_subprocess_exec(*self.tshark_command(candidate),
+                                                               stdout=asyncio.subprocess.DEVNULL, stderr=log)
+            try:
+                await asyncio.wait_for(process.wait(), config.CAPTURE_START_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                break
+            if process.returncode == 0:
+                break
+            errors.append(f"{candidate}: {self._log_tail() or f'exit code {process.returncode}'}")
+            logging.warning(f"Capture session {self.id} failed to start on interface {candidate}")
+        else:
+            raise CaptureSessionError(f"tshark could not capture on any interface: {'; '.join(errors)}")
+        self._process = process
+        self.interface = candidate
+        self.state = 'capturing'
+        logging.info(f"Capture session {self.id} capturing on {candidate} for {self.duration} s")
+
+    def attach(self, process, interface, progress=None, on_cancel=None):
+        """Adopt a tshark process the owner started itself.
+
+        progress has packets and bytes counters, such as a PcapStreamDecoder; on_cancel is awaited
+        instead of terminating tshark when the session is cancelled.
+        """
+        self._process = process
+        self.interface = interface
+        self._progress = progress
+        self._on_cancel = on_cancel
+        self.state = 'capturing'
+        logging.info(f"{self.kind.capitalize()} session {self.id} capturing on {interface}")
+
+    def fail(self, error):
+        """End a session whose capture could not be started or broke off."""
+        self.state, self.error = 'failed', str(error)
+        self.close()
+
+    def _update_progress(self):
+        if isinstance(self._progress, PcapProgress):
+            self._progress.update()
+
+    def _log_tail(self):
+        try:
+            with open(self.log_path, 'r', errors='replace') as log:
+                return log.read().strip()[-200:]
+        except FileNotFoundError:
+            return ''
+
+    async def _terminate(self):
+        if self._process is None or self._process.returncode is not None:
+            return
+        self._process.terminate()
+        try:
+            await asyncio.wait_for(self._process.wait(), config.CAPTURE_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning(f"tshark did not exit after terminate in session {self.id}, killing it")
+            self._process.kill()
+            await self._process.wait()
+
+    async def wait(self):
+        """Wait for the capture to finish and return the pcap path; raises CaptureCancelled or CaptureSessionError."""
+        try:
+            await asyncio.wait_for(self._process.wait(), self.duration + config.CAPTURE_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning(f"Capture session {self.id} overran its duration, stopping tshark")
+            await self._terminate()
+        self._update_progress()
+        self.check()
+        if self._process.returncode != 0 or not os.path.exists(self.pcap_path):
+            self.state = 'failed'
+            self.error = self._log_tail() or f"tshark exited with code {self._process.returncode}"
+            raise CaptureSessionError(f"Packet capture failed: {self.error}")
+        self.state = 'processing'
+        self.captured_at = time.time()
+        return self.pcap_path
+
+    def check(self):
+        """Raise CaptureCancelled if the session was cancelled, so its owner stops working on it."""
+        if self.state == 'cancelled':
+            raise CaptureCancelled(f"Capture session {self.id} was cancelled")
+
+    async def cancel(self):
+        if self.state in ENDED_STATES:
+            raise CaptureSessionError(f"Capture session {self.id} has already ended")
+        self.state = 'cancelled'
+        if self._on_cancel is not None:
+            await self._on_cancel()
+        else:
+            await self._terminate()
+        logging.info(f"Capture session {self.id} cancelled")
+
+    def close(self):
+        """End the session and remove its directory; safe to call more than once."""
+        if self.ended_at is not None:
+            return
+        if self.state not in ENDED_STATES:
+            self.state = 'done'
+        if self._process is not None and self._process.returncode is None:
+            # The owner gave up on a capture that is still running
+            self._process.terminate()
+        self._update_progress()
+        self.ended_at = time.time()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.manager._ended(self)
+
+    def status(self):
+        if self.ended_at is None:
+            self._update_progress()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "owner": self.owner,
+            "interface": self.interface,
+            "duration": self.duration,
+            "profile": self.profile.as_dict(),
+            "created_at": self.created_at,
+            "captured_at": self.captured_at,
+            "ended_at": self.ended_at,
+            "packets": self._progress.packets if self._progress is not None else None,
+            "bytes": self._progress.bytes if self._progress is not None else None,
+            "error": self.error,
+        }
+
+class CaptureSessionManager:
+    """Open capture sessions, bounded to max_sessions at a time, plus the recently ended ones."""
+
+    def __init__(self, directory=config.CAPTURE_SESSIONS_DIR, max_sessions=config.CAPTURE_MAX_SESSIONS):
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.history = deque(maxlen=config.CAPTURE_SESSION_HISTORY)
+        # Directories left behind by a previous run that did not shut down cleanly
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def open(self, kind, duration=None, owner=None, profile=None):
+        """Reserve a slot for a session; the caller starts its capture and must close() it when done."""
+        if kind not in SESSION_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(SESSION_KINDS)}")
+        if duration is not None and not 1 <= duration <= config.CAPTURE_MAX_DURATION:
+            raise ValueError(f"duration must be between 1 and {config.CAPTURE_MAX_DURATION} seconds")
+        if len(self.sessions) >= self.max_sessions:
+            raise CaptureLimitError(f"{self.max_sessions} captures are already running, try again later")
+        session_id = uuid.uuid4().hex[:12]
+        session = CaptureSession(self, session_id, os.path.join(self.directory, session_id), duration, owner,
+                                 profile, kind)
+        # Reserved before the caller's first await so concurrent starts respect the limit
+        self.sessions[session_id] = session
+        return session
+
+    async def start(self, duration, interface=None, owner=None, profile=None):
+        """Open a session and start its capture; the caller must close() it when done with its files."""
+        session = self.open('capture', duration, owner, profile)
+        try:
+            os.makedirs(session.directory)
+            await session._start(interface)
+        except BaseException as e:
+            session.fail(e)
+            raise
+        return session
+
+    def _ended(self, session):
+        if self.sessions.pop(session.id, None) is not None:
+            self.history.append(session.status())
+
+    def get(self, session_id, owner=None):
+        """Open session session_id; KeyError if there is none, or it belongs to another owner than owner."""
+        session = self.sessions.get(session_id)
+        if session is None or owner is not None and session.owner != owner:
+            raise KeyError(session_id)
+        return session
+
+    def _ended_status(self, session_id, owner=None):
+        for ended in self.history:
+            if ended["id"] == session_id and (owner is None or ended["owner"] == owner):
+                return ended
+        return None
+
+    async def cancel(self, session_id, owner=None):
+        if session_id not in self.sessions and self._ended_status(session_id, owner) is not None:
+            raise CaptureSessionError(f"Capture session {session_id} has already ended")
+        session = self.get(session_id, owner)
+        await session.cancel()
+        return session.status()
+
+    def status(self, session_id=None, owner=None):
+        """One session's status, or every session's; only owner's sessions unless owner is None."""
+        if session_id is not None:
+            if session_id in self.sessions:
+                return self.get(session_id, owner).status()
+            ended = self._ended_status(session_id, owner)
+            if ended is None:
+                raise KeyError(session_id)
+            return ended
+        return {
+            "max_sessions": self.max_sessions,
+            "active": [session.status() for session in self.sessions.values()
+                       if owner is None or session.owner == owner],
+            "recent": [ended for ended in self.history if owner is None or ended["owner"] == owner],
+        }
+
+    async def shutdown(self):
+        """Cancel every open session and remove its files."""
+        for session in list(self.sessions.values()):
+            if session.state not in ENDED_STATES:
+                await session.cancel()
+            session.close()
+
+_session_manager = None
+
+def get_session_manager():
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = CaptureSessionManager()
+    return _session_manager
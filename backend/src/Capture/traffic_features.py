@@ -0,0 +1,175 @@
+"""Incremental computation of the KDD time-based and host-based traffic features.
+
+Connections are fed in the order they end (end time, then first packet), and
+each one's features only look back at connections fed before it. The same
+code therefore serves a live stream and a whole capture.
+
+- Time window: connections from the same source that ended within the last
+  time_window seconds, including this one.
+- Host window: the last host_window connections to the same destination
+  host, including this one.
+
+Both windows are kept as deques with running counters, so each connection
+costs O(1) amortized. A source's state is dropped once its time window is
+empty. Destination state is dropped after host_ttl seconds without a
+connection, and the least recently used destinations are dropped beyond
+max_hosts, so memory stays bounded on endless streams.
+"""
+from collections import Counter, OrderedDict, deque
+import numpy as np
+import config
+
+TIME_COLUMNS = ('count', 'srv_count', 'serror_rate', 'srv_serror_rate', 'rerror_rate', 'srv_rerror_rate',
+                'same_srv_rate', 'diff_srv_rate', 'srv_diff_host_rate')
+HOST_COLUMNS = ('dst_host_count', 'dst_host_srv_count', 'dst_host_same_srv_rate', 'dst_host_diff_srv_rate',
+                'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate', 'dst_host_serror_rate',
+                'dst_host_srv_serror_rate', 'dst_host_rerror_rate', 'dst_host_srv_rerror_rate')
+WINDOW_COLUMNS = TIME_COLUMNS + HOST_COLUMNS
+COUNT_COLUMNS = frozenset(['count', 'srv_count', 'dst_host_count', 'dst_host_srv_count'])
+
+def _rate(part, total):
+    return part / total if total > 0 else 0
+
+def error_flags(flags):
+    """(serror, rerror) booleans per connection from its NSL-KDD flag, computed once for every rate feature."""
+    return [('RST' in f) for f in flags], [('REJ' in f) for f in flags]
+
+class _Window:
+    """Connections in a window with running totals, overall and per service."""
+    __slots__ = ('entries', 'total', 'serrors', 'rerrors', 'srv_total', 'srv_serrors', 'srv_rerrors', 'peers',
+                 'ports', 'last_seen')
+
+    def __init__(self):
+        self.entries = deque()
+        self.serrors = self.rerrors = 0
+        self.srv_total, self.srv_serrors, self.srv_rerrors = Counter(), Counter(), Counter()
+        # Distinct peer hosts and source ports in the window
+        self.peers, self.ports = Counter(), Counter()
+        self.last_seen = 0.0
+
+    def push(self, entry):
+        _, service, peer, port, serror, rerror = entry
+        self.entries.append(entry)
+        self.srv_total[service] += 1
+        self.peers[peer] += 1
+        self.ports[port] += 1
+        if serror:
+            self.serrors += 1
+            self.srv_serrors[service] += 1
+        if rerror:
+            self.rerrors += 1
+            self.srv_rerrors[service] += 1
+
+    def pop(self):
+        _, service, peer, port, serror, rerror = self.entries.popleft()
+        for counter, key in ((self.srv_total, service), (self.peers, peer), (self.ports, port)):
+            counter[key] -= 1
+            if not counter[key]:
+                del counter[key]
+        if serror:
+            self.serrors -= 1
+            self.srv_serrors[service] -= 1
+        if rerror:
+            self.rerrors -= 1
+            self.srv_rerrors[service] -= 1
+
+class TrafficWindows:
+    """Time and host window state; add() returns one connection's WINDOW_COLUMNS values."""
+
+    def __init__(self, time_window=config.KDD_TIME_WINDOW, host_window=config.KDD_HOST_WINDOW,
+                 host_ttl=config.KDD_HOST_STATE_TTL, max_hosts=config.KDD_MAX_HOST_STATES):
+        self.time_window = time_window
+        self.host_window = host_window
+        self.host_ttl = host_ttl
+        self.max_hosts = max_hosts
+        self._sources = OrderedDict()
+        self._hosts = OrderedDict()
+        self.evicted_hosts = 0
+
+    def __len__(self):
+        return len(self._sources) + len(self._hosts)
+
+    def add(self, src, sport, dst, dport, end_ts, serror, rerror):
+        return self._time_features(src, dst, dport, end_ts, serror, rerror) + \
+            self._host_features(src, sport, dst, dport, end_ts, serror, rerror)
+
+    def _time_features(self, src, dst, dport, end_ts, serror, rerror):
+        window_start = end_ts - self.time_window
+        # Sources are kept in order of their latest connection; ones with nothing left in the window go
+        sources = self._sources
+        while sources:
+            oldest = next(iter(sources.values()))
+            if oldest.last_seen >= window_start:
+                break
+            sources.popitem(last=False)
+        window = sources.get(src)
+        if window is None:
+            window = sources[src] = _Window()
+        else:
+            sources.move_to_end(src)
+            while window.entries and window.entries[0][0] < window_start:
+                window.pop()
+        window.push((end_ts, dport, dst, 0, serror, rerror))
+        window.last_seen = end_ts
+
+        total = len(window.entries)
+        srv_count = window.srv_total[dport]
+        return (
+            total,
+            srv_count,
+            _rate(window.serrors, total),
+            _rate(window.srv_serrors[dport], srv_count),
+            _rate(window.rerrors, total),
+            _rate(window.srv_rerrors[dport], srv_count),
+            _rate(srv_count, total),
+            _rate(total - srv_count, total),
+            _rate(len(window.peers), total),
+        )
+
+    def _host_features(self, src, sport, dst, dport, end_ts, serror, rerror):
+        hosts = self._hosts
+        window = hosts.get(dst)
+        if window is None:
+            window = hosts[dst] = _Window()
+        else:
+            hosts.move_to_end(dst)
+        window.push((end_ts, dport, src, sport, serror, rerror))
+        if len(window.entries) > self.host_window:
+            window.pop()
+        window.last_seen = end_ts
+        while len(hosts) > self.max_hosts or next(iter(hosts.values())).last_seen < end_ts - self.host_ttl:
+            hosts.popitem(last=False)
+            self.evicted_hosts += 1
+
+        total = len(window.entries)
+        srv_count = window.srv_total[dport]
+        return (
+            total,
+            srv_count,
+            _rate(srv_count, total),
+            _rate(total - srv_count, total),
+            _rate(len(window.ports), total),
+            _rate(len(window.peers), total),
+            _rate(window.serrors, total),
+            _rate(window.srv_serrors[dport], srv_count),
+            _rate(window.rerrors, total),
+            _rate(window.srv_rerrors[dport], srv_count),
+        )
+
+    def stats(self):
+        return {"sources": len(self._sources), "hosts": len(self._hosts), "evicted_hosts": self.evicted_hosts}
+
+def window_features(src, sport, dst, dport, end_ts, flags, order, windows=None):
+    """WINDOW_COLUMNS for parallel per-connection sequences, feeding connections to windows in the given order.
+
+    The returned arrays (int64 counts, float64 rates) are aligned with the
+    input sequences, not with order.
+    """
+    windows = windows if windows is not None else TrafficWindows()
+    serror, rerror = error_flags(flags)
+    values = np.zeros((len(src), len(WINDOW_COLUMNS)), dtype=np.float64)
+    add = windows.add
+    for i in order:
+        values[i] = add(src[i], sport[i], dst[i], dport[i], end_ts[i], serror[i], rerror[i])
+    return {name: values[:, j].astype(np.int64) if name in COUNT_COLUMNS else values[:, j]
+            for j, name in enumerate(WINDOW_COLUMNS)}
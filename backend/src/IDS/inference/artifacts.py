@@ -0,0 +1,52 @@
+import copy
+import json
+import pickle
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def load_preprocessor(save_path):
+    try:
+        with open(save_path, 'rb') as f:
+            preprocessor = pickle.load(f)
+        logging.info("Preprocessor loaded successfully.")
+        return preprocessor
+    except FileNotFoundError:
+        logging.error("Preprocessor file not found.")
+        raise
+    except Exception as e:
+        logging.error(f"Error loading preprocessor: {e}")
+        raise
+
+def load_mapping(save_path):
+    try:
+        with open(save_path, 'r') as f:
+            mapping = json.load(f)
+        logging.info("Label mapping loaded successfully.")
+        return {int(v): k for k, v in mapping.items()}  # Reverse mapping for decoding
+    except FileNotFoundError:
+        logging.error("Label mapping file not found.")
+        raise
+    except json.JSONDecodeError:
+        logging.error("Error decoding JSON label mapping.")
+        raise
+    except Exception as e:
+        logging.error(f"Error loading label mapping: {e}")
+        raise
+
+def prepare_features(preprocessor, new_df):
+    """Run new_df through a fitted preprocessor and return the SVD feature matrix.
+
+    The preprocessor is shallow-copied so that a shared instance (see
+    ModelRegistry) is never mutated by a request.
+    """
+    preprocessor = copy.copy(preprocessor)
+    # For prediction, we don't have a class column, so we set test_df directly
+    preprocessor.test_df = new_df.copy()
+    preprocessor.test_df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    preprocessor.test_labels = None  # No labels for prediction
+    logging.info(f"Prediction data loaded successfully with shape: {preprocessor.test_df.shape}")
+
+    preprocessor.transform()
+    return preprocessor.test_df.values
@@ -0,0 +1,167 @@
+import time
+import asyncio
+import logging
+from collections import deque
+import numpy as np
+import pandas as pd
+import config
+from .cache import dedup_codes, get_prediction_cache, row_hashes
+from .registry import get_registry
+from .worker_pool import get_pool, predict_frame, predict_frame_fp32, predict_frame_int8, score_frame
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class MicroBatcher:
+    """Merges concurrent prediction requests into one preprocessing + model batch.
+
+    A batch is flushed once it holds max_batch_rows rows or its oldest request
+    has waited max_delay_ms. A single request larger than max_batch_rows runs
+    as its own batch, and so does a request with missing values: they are
+    imputed from the batch they are scored in, so merging would make its
+    results depend on other callers' rows. Results are split back to each caller in order. Batches
+    run through runner(predict_fn, frame), a thread by default.
+    """
+
+    def __init__(self, predict_fn=None, runner=None, max_batch_rows=config.IDS_MAX_BATCH_ROWS,
+                 max_delay_ms=config.IDS_MAX_BATCH_DELAY_MS, stats_window=1000):
+        self.predict_fn = predict_fn or predict_frame
+        self.runner = runner or asyncio.to_thread
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay_ms / 1000
+        self._queue = None
+        self._task = None
+        self._pending = None
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_rows_seen = 0
+        self._batch_rows = deque(maxlen=stats_window)
+        self._waits_ms = deque(maxlen=stats_window)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def predict(self, new_df):
+        """Queue new_df and wait for its predictions."""
+        if len(new_df) == 0:
+            return []
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        alone = bool(new_df.isna().to_numpy().any())
+        await self._queue.put((new_df, future, time.perf_counter(), alone))
+        return await future
+
+    async def _next_batch(self):
+        # A request that did not fit the previous batch opens the next one
+        first = self._pending or await self._queue.get()
+        self._pending = None
+        batch, rows = [first], len(first[0])
+        deadline = first[2] + self.max_delay
+        while rows < self.max_batch_rows and not first[3]:
+            # Requests that queued while the previous batch ran are taken without waiting
+            remaining = deadline - time.perf_counter()
+            try:
+                if not self._queue.empty() or remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item[3] or rows + len(item[0]) > self.max_batch_rows:
+                self._pending = item
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch, rows
+
+    async def _run(self):
+        while True:
+            batch, rows = await self._next_batch()
+            started = time.perf_counter()
+            frames = [df for df, _, _, _ in batch]
+            try:
+                merged = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+                predictions = await self.runner(self.predict_fn, merged)
+            except Exception as e:
+                logging.error(f"Batched prediction failed for {len(batch)} requests: {e}")
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for df, future, enqueued, _ in batch:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(df)])
+                offset += len(df)
+                self._waits_ms.append((started - enqueued) * 1000)
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += rows
+            self.max_rows_seen = max(self.max_rows_seen, rows)
+            self._batch_rows.append(rows)
+
+    def stats(self):
+        waits = np.array(self._waits_ms) if self._waits_ms else np.zeros(1)
+        return {
+            "max_batch_rows": self.max_batch_rows,
+            "max_delay_ms": self.max_delay * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "mean_batch_rows": float(np.mean(self._batch_rows)) if self._batch_rows else 0.0,
+            "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_rows_seen": self.max_rows_seen,
+            "queue_wait_ms": {
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "max": float(waits.max()),
+            },
+        }
+
+_batchers = {}
+
+def get_batcher(quantized=False):
+    """Process-wide batcher shared by the prediction routes; fp32 and int8 requests batch separately."""
+    quantized = bool(quantized)
+    if quantized not in _batchers:
+        # Each batcher pins its model so IDS_QUANTIZED_DEFAULT can't mix models within a batch
+        predict_fn = predict_frame_int8 if quantized else predict_frame_fp32
+        _batchers[quantized] = MicroBatcher(predict_fn, runner=get_pool().run)
+    return _batchers[quantized]
+
+def all_batchers():
+    return list(_batchers.values())
+
+async def predict_codes(new_df, quantized=False):
+    """Micro-batched class codes for new_df, deduplicated and cached unless IDS_DEDUPLICATE_ROWS is off."""
+    batcher = get_batcher(quantized)
+    if not config.IDS_DEDUPLICATE_ROWS:
+        return await batcher.predict(new_df)
+    namespace = (get_registry().version, bool(quantized))
+    return await dedup_codes(new_df, batcher.predict, get_prediction_cache(), namespace)
+
+async def score_request(new_df, probabilities=False, quantized=False):
+    """Class codes for one request, plus probabilities when asked; code-only requests are micro-batched.
+
+    quantized is the already resolved flag (see ModelRegistry.use_quantized).
+    """
+    if not probabilities:
+        return await predict_codes(new_df, quantized), None
+    if not config.IDS_DEDUPLICATE_ROWS or new_df.isna().to_numpy().any():
+        return await get_pool().run(score_frame, new_df, True, quantized)
+    # Probability rows are not cached, but duplicates within the request are still scored once
+    _, first, inverse = np.unique(row_hashes(new_df), return_index=True, return_inverse=True)
+    codes, proba = await get_pool().run(score_frame, new_df.iloc[first], True, quantized)
+    return codes[inverse], proba[inverse]
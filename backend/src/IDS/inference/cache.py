@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import config
+
+def row_hashes(new_df):
+    """64-bit hash per row over the values only, so identical feature rows collide on purpose."""
+    return pd.util.hash_pandas_object(new_df, index=False).to_numpy()
+
+class PredictionCache:
+    """Bounded LRU of class codes keyed by (model namespace, row hash).
+
+    The namespace is the registry version plus the fp32/int8 choice, so
+    entries from a previous model are never served and simply age out.
+    """
+
+    def __init__(self, max_entries=config.IDS_PREDICTION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rows = 0
+        self.unique_rows = 0
+
+    def lookup(self, namespace, hashes):
+        """Cached codes for hashes, -1 where missing."""
+        codes = np.full(len(hashes), -1, dtype=np.int64)
+        if self.max_entries <= 0:
+            self.misses += len(hashes)
+            return codes
+        with self._lock:
+            entries = self._entries
+            for i, h in enumerate(hashes.tolist()):
+                key = (namespace, h)
+                code = entries.get(key)
+                if code is not None:
+                    entries.move_to_end(key)
+                    codes[i] = code
+        hits = int((codes >= 0).sum())
+        self.hits += hits
+        self.misses += len(hashes) - hits
+        return codes
+
+    def store(self, namespace, hashes, codes):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            entries = self._entries
+            # Only the most recent max_entries of a large batch could survive anyway
+            for h, code in zip(hashes[-self.max_entries:].tolist(), codes[-self.max_entries:].tolist()):
+                entries[(namespace, h)] = code
+                entries.move_to_end((namespace, h))
+            overflow = len(entries) - self.max_entries
+            for _ in range(max(overflow, 0)):
+                entries.popitem(last=False)
+            self.evictions += max(overflow, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "max_entries": self.max_entries,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "rows": self.rows,
+            "unique_rows": self.unique_rows,
+            "duplicate_rate": 1 - self.unique_rows / self.rows if self.rows else 0.0,
+        }
+
+async def dedup_codes(new_df, predict, cache=None, namespace=None):
+    """Score only the distinct rows of new_df, and only those the cache misses, then scatter codes back.
+
+    predict is an async callable returning class codes for a frame. Frames with
+    missing values bypass deduplication, since their imputation depends on the
+    rest of the batch.
+    """
+    if len(new_df) == 0 or new_df.isna().to_numpy().any():
+        return await predict(new_df)
+    unique, first, inverse = np.unique(row_hashes(new_df), return_index=True, return_inverse=True)
+    if cache is None:
+        codes = np.asarray(await predict(new_df.iloc[first]))
+        return codes[inverse]
+
+    cache.rows += len(new_df)
+    cache.unique_rows += len(unique)
+    codes = cache.lookup(namespace, unique)
+    missing = np.flatnonzero(codes < 0)
+    if len(missing):
+        scored = np.asarray(await predict(new_df.iloc[first[missing]]))
+        codes[missing] = scored
+        cache.store(namespace, unique[missing], scored)
+    return codes[inverse]
+
+_cache = None
+
+def get_prediction_cache():
+    global _cache
+    if _cache is None:
+        _cache = PredictionCache()
+    return _cache
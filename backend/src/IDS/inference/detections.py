@@ -0,0 +1,159 @@
+"""Fan-out of live verdicts to streaming clients, with per-client backpressure.
+
+A DetectionFeed receives (batch, codes) from a live capture as connections
+are scored and keeps running per-class totals. Every client subscribes and
+reads from its own buffer of verdict events, bounded to client_buffer
+connections. A client that reads slower than connections are scored is
+never allowed to grow that buffer: once it is full, further verdicts are
+only counted per class, and the client gets one 'coalesced' event with
+those counts after it has read what was already queued. Verdicts then
+flow again. A slow client costs bounded memory and never holds up the
+capture or the other clients.
+
+sse_stream turns a subscription into server-sent events:
+    verdicts   {"connections": [...], "totals": {...}}
+    coalesced  {"connections": n, "summary": {...}, "totals": {...}}
+    totals     {...}, sent when nothing else was for heartbeat seconds
+    end        {"totals": {...}, "stats": {...}} or {"totals": {...}, "error": "..."}
+"""
+import json
+import asyncio
+import logging
+from collections import deque
+import numpy as np
+import config
+from .response import summarize_counts
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def verdict_rows(batch, codes, class_names):
+    """One dict per connection of a FeatureBatch: endpoints, protocol, service and prediction."""
+    metadata, features = batch.metadata, batch.features
+    return [
+        {"src_ip": src_ip, "src_port": src_port, "dst_ip": dst_ip, "dst_port": dst_port,
+         "protocol": protocol, "service": service, "prediction": prediction}
+        for src_ip, src_port, dst_ip, dst_port, protocol, service, prediction in zip(
+            metadata['src_ip'].tolist(), metadata['src_port'].tolist(), metadata['dst_ip'].tolist(),
+            metadata['dst_port'].tolist(), features['protocol_type'].tolist(), features['service'].tolist(),
+            np.asarray(class_names)[codes].tolist())
+    ]
+
+class Subscription:
+    """One client's bounded view of a DetectionFeed."""
+
+    def __init__(self, feed, limit):
+        self.feed = feed
+        self.limit = limit
+        self._events = deque()
+        self._queued = 0
+        self._coalesced = None
+        self._wakeup = asyncio.Event()
+        self.delivered = 0
+        self.coalesced = 0
+
+    def offer(self, rows, counts):
+        if self._coalesced is None and self._queued + len(rows) <= self.limit:
+            self._events.append(rows)
+            self._queued += len(rows)
+        else:
+            # Coalesce until the client has caught up, so it sees verdicts in order
+            if self._coalesced is None:
+                self._coalesced = np.zeros_like(counts)
+            self._coalesced += counts
+            self.coalesced += len(rows)
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def events(self, heartbeat=config.LIVE_STREAM_HEARTBEAT_SECONDS):
+        """Yield (event, data) pairs until the feed has ended and everything for this client was read."""
+        feed = self.feed
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield 'totals', feed.totals()
+                continue
+            self._wakeup.clear()
+            while self._events:
+                rows = self._events.popleft()
+                self._queued -= len(rows)
+                self.delivered += len(rows)
+                yield 'verdicts', {"connections": rows, "totals": feed.totals()}
+            if self._coalesced is not None:
+                counts, self._coalesced = self._coalesced, None
+                yield 'coalesced', {"connections": int(counts.sum()),
+                                    "summary": summarize_counts(counts, feed.class_names),
+                                    "totals": feed.totals()}
+            if feed.finished and not self._events and self._coalesced is None:
+                yield 'end', feed.result()
+                return
+
+class DetectionFeed:
+    """Running totals of one live capture, published to every subscribed client."""
+
+    def __init__(self, class_names, client_buffer=config.LIVE_STREAM_CLIENT_BUFFER):
+        self.class_names = np.asarray(class_names)
+        self.client_buffer = client_buffer
+        self.counts = np.zeros(len(self.class_names), dtype=np.int64)
+        self.subscribers = []
+        self.finished = False
+        self.stats = None
+        self.error = None
+
+    def subscribe(self):
+        subscription = Subscription(self, self.client_buffer)
+        self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+    def totals(self):
+        return {"connections": int(self.counts.sum()), **summarize_counts(self.counts, self.class_names)}
+
+    def result(self):
+        result = {"totals": self.totals()}
+        if self.error is not None:
+            result["error"] = self.error
+        else:
+            result["stats"] = self.stats
+        return result
+
+    async def publish(self, batch, codes):
+        """on_verdicts callback for a LivePipeline: count the verdicts and queue them for every client."""
+        codes = np.asarray(codes, dtype=np.int64)
+        counts = np.bincount(codes, minlength=len(self.class_names))
+        self.counts += counts
+        # Built once and shared by every client's buffer
+        rows = verdict_rows(batch, codes, self.class_names)
+        for subscription in self.subscribers:
+            subscription.offer(rows, counts)
+
+    async def run(self, capture):
+        """Await a capture coroutine that publishes to this feed, then end every client's stream."""
+        try:
+            self.stats = await capture
+        except asyncio.CancelledError:
+            self.error = "cancelled"
+            raise
+        except Exception as e:
+            logging.error(f"Live detection feed failed: {e}")
+            self.error = str(e)
+        finally:
+            self.finished = True
+            for subscription in self.subscribers:
+                subscription.wake()
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+async def sse_stream(subscription, heartbeat=config.LIVE_STREAM_HEARTBEAT_SECONDS):
+    """Server-sent event bytes for one subscription; unsubscribes when the stream ends or the client leaves."""
+    try:
+        async for event, data in subscription.events(heartbeat):
+            yield sse_event(event, data)
+    finally:
+        subscription.feed.unsubscribe(subscription)
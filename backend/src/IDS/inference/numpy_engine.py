@@ -0,0 +1,118 @@
+import os
+import logging
+import argparse
+import numpy as np
+import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ENGINE_ARRAYS = ['w1', 'b1', 'w2', 'b2', 'w3', 'b3', 'w_gate', 'b_gate', 'w_out', 'b_out']
+
+def _sigmoid(x, out=None):
+    # In-place logistic to avoid temporaries: 1 / (1 + exp(-x))
+    out = np.negative(x, out=out)
+    np.exp(out, out=out)
+    out += 1
+    return np.reciprocal(out, out=out)
+
+def fold_state_dict(state_dict):
+    """Fold an SCAE_GC state_dict into the contiguous float32 arrays used by NumpySCAEGC.
+
+    The gated convolution sees a length-1 sequence with kernel_size=3 and
+    padding=1, so only the centre tap touches real data and each Conv1d is a
+    plain matrix multiply. Both gate branches are stacked into one GEMM.
+    """
+    def array(name):
+        value = state_dict[name]
+        if hasattr(value, 'detach'):
+            value = value.detach().cpu().numpy()
+        return np.asarray(value, dtype=np.float32)
+
+    conv1, conv2 = array('gated_conv.conv1.weight'), array('gated_conv.conv2.weight')
+    if conv1.shape[2] != 3:
+        raise ValueError(f"Expected kernel_size=3 gated convolution, got {conv1.shape[2]}")
+    centre = conv1.shape[2] // 2
+    folded = {
+        'w1': array('cae1.encoder.weight').T, 'b1': array('cae1.encoder.bias'),
+        'w2': array('cae2.encoder.weight').T, 'b2': array('cae2.encoder.bias'),
+        'w3': array('cae3.encoder.weight').T, 'b3': array('cae3.encoder.bias'),
+        'w_gate': np.concatenate([conv1[:, :, centre], conv2[:, :, centre]]).T,
+        'b_gate': np.concatenate([array('gated_conv.conv1.bias'), array('gated_conv.conv2.bias')]),
+        'w_out': array('classifier.weight').T, 'b_out': array('classifier.bias'),
+    }
+    return {name: np.ascontiguousarray(value) for name, value in folded.items()}
+
+class NumpySCAEGC:
+    """Torch-free SCAE_GC forward pass: five GEMMs plus elementwise sigmoid and gating."""
+
+    def __init__(self, arrays):
+        for name in ENGINE_ARRAYS:
+            value = np.ascontiguousarray(arrays[name], dtype=np.float32)
+            value.setflags(write=False)
+            setattr(self, name, value)
+        self.input_dim = self.w1.shape[0]
+        self.num_classes = self.w_out.shape[1]
+
+    @classmethod
+    def load(cls, npz_path):
+        with np.load(npz_path) as data:
+            engine = cls({name: data[name] for name in ENGINE_ARRAYS})
+        logging.info(f"NumPy SCAE-GC engine loaded from {npz_path}.")
+        return engine
+
+    def save(self, npz_path):
+        np.savez(npz_path, **{name: getattr(self, name) for name in ENGINE_ARRAYS})
+
+    @property
+    def nbytes(self):
+        return int(sum(getattr(self, name).nbytes for name in ENGINE_ARRAYS))
+
+    def logits(self, x):
+        h = np.asarray(x, dtype=np.float32) @ self.w1
+        h += self.b1
+        h = _sigmoid(h, out=h) @ self.w2
+        h += self.b2
+        h = _sigmoid(h, out=h) @ self.w3
+        h += self.b3
+        gate = _sigmoid(h, out=h) @ self.w_gate
+        gate += self.b_gate
+        width = gate.shape[1] // 2
+        h = gate[:, :width] * _sigmoid(gate[:, width:], out=gate[:, width:])
+        out = h @ self.w_out
+        out += self.b_out
+        return out
+
+    def predict_codes(self, x):
+        """Class indices; softmax is monotonic, so argmax over logits is enough."""
+        return np.argmax(self.logits(x), axis=1)
+
+    def predict_proba(self, x):
+        logits = self.logits(x)
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+def export_engine(model_save_path=config.MODEL_SAVE_PATH, npz_path=config.NUMPY_ENGINE_PATH):
+    """Fold SCAE_GC.pth into an .npz the NumPy engine can load without torch."""
+    import torch
+    state_dict = torch.load(os.path.join(model_save_path, "SCAE_GC.pth"), map_location='cpu')
+    engine = NumpySCAEGC(fold_state_dict(state_dict))
+    engine.save(npz_path)
+    logging.info(f"NumPy SCAE-GC engine exported to {npz_path}.")
+    return engine
+
+def load_engine(model_save_path=config.MODEL_SAVE_PATH, npz_path=config.NUMPY_ENGINE_PATH):
+    """Load the exported engine, re-exporting first if it is missing or older than SCAE_GC.pth."""
+    weights_path = os.path.join(model_save_path, "SCAE_GC.pth")
+    if not os.path.exists(npz_path) or (
+            os.path.exists(weights_path) and os.path.getmtime(weights_path) > os.path.getmtime(npz_path)):
+        return export_engine(model_save_path, npz_path)
+    return NumpySCAEGC.load(npz_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export SCAE_GC weights for the torch-free NumPy engine')
+    parser.add_argument('--model_path', type=str, default=config.MODEL_SAVE_PATH)
+    parser.add_argument('--output', type=str, default=config.NUMPY_ENGINE_PATH)
+    args = parser.parse_args()
+    export_engine(args.model_path, args.output)
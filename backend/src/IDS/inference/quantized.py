@@ -0,0 +1,48 @@
+import io
+import copy
+import logging
+import torch
+import torch.nn as nn
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class CentreTapGate(nn.Module):
+    """GatedConvolution over a length-1 sequence, written as two nn.Linear layers.
+
+    With kernel_size=3 and padding=1 only the centre tap of each Conv1d sees
+    real data, so the convolution is exactly a Linear on that tap. Dynamic
+    quantization only handles nn.Linear, so this is what lets the gate go int8.
+    """
+
+    def __init__(self, gated_conv):
+        super(CentreTapGate, self).__init__()
+        centre = gated_conv.conv1.kernel_size[0] // 2
+        self.linear = nn.Linear(gated_conv.conv1.in_channels, gated_conv.conv1.out_channels)
+        self.gate = nn.Linear(gated_conv.conv2.in_channels, gated_conv.conv2.out_channels)
+        with torch.no_grad():
+            self.linear.weight.copy_(gated_conv.conv1.weight[:, :, centre])
+            self.linear.bias.copy_(gated_conv.conv1.bias)
+            self.gate.weight.copy_(gated_conv.conv2.weight[:, :, centre])
+            self.gate.bias.copy_(gated_conv.conv2.bias)
+
+    def forward(self, x):
+        # Same (batch, channels, 1) layout in and out as GatedConvolution
+        x = x.squeeze(2)
+        return (self.linear(x) * torch.sigmoid(self.gate(x))).unsqueeze(2)
+
+def quantize_scae_gc(model):
+    """Int8 dynamically quantized copy of an eval-mode SCAE_GC; the fp32 model is left untouched."""
+    if model.gated_conv.conv1.kernel_size[0] != 3 or model.gated_conv.conv1.padding[0] != 1:
+        raise ValueError("Quantized serving expects the kernel_size=3, padding=1 gated convolution")
+    linearized = copy.deepcopy(model).cpu().eval()
+    linearized.gated_conv = CentreTapGate(model.gated_conv).eval()
+    quantized = torch.ao.quantization.quantize_dynamic(linearized, {nn.Linear}, dtype=torch.qint8)
+    for param in quantized.parameters():
+        param.requires_grad_(False)
+    return quantized
+
+def serialized_bytes(model):
+    """Size of the model's state_dict as saved; packed int8 weights are not visible through parameters()."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
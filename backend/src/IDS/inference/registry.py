@@ -0,0 +1,191 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+import config
+from ..preprocessing.compiled import CompiledTransform
+from .artifacts import load_preprocessor, load_mapping, prepare_features
+from .numpy_engine import load_engine
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def _rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def _artifact_version(*paths):
+    """Short digest of the artifacts' sizes and mtimes; changes whenever training rewrites them."""
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+def _preprocessor_bytes(preprocessor):
+    """Bytes held by the fitted scaler and SVD arrays."""
+    arrays = [getattr(preprocessor.scaler, name, None) for name in ('mean_', 'scale_', 'var_')]
+    if preprocessor.svd is not None:
+        arrays.append(preprocessor.svd.components_)
+    return int(sum(a.nbytes for a in arrays if isinstance(a, np.ndarray)))
+
+class ModelRegistry:
+    """Preprocessor, label mapping and eval-mode SCAE-GC loaded once and shared by all routes.
+
+    Every attribute is treated as read-only after load; predict() never mutates
+    the preprocessor, so one instance can serve concurrent requests. Unless
+    config.IDS_COMPILED_TRANSFORM is off, features go through the compiled
+    NumPy transform instead of the pandas pipeline. With the 'numpy' backend
+    the model is the folded NumpySCAEGC and torch is never imported. With the
+    torch backend an int8 dynamically quantized copy can be held next to the
+    fp32 model and selected per call.
+    """
+
+    def __init__(self, preprocessor, label_mapping, model, device, load_time_s, memory, transform=None, backend='torch',
+                 quantized_model=None, version=None):
+        self.preprocessor = preprocessor
+        self.transform = transform
+        self.label_mapping = label_mapping
+        self.model = model
+        self.quantized_model = quantized_model
+        self.version = version
+        self.device = device
+        self.backend = backend
+        self.load_time_s = load_time_s
+        self.memory = memory
+        num_outputs = model.num_classes if backend == 'numpy' else model.classifier.out_features
+        # Class-name table indexed by model output; codes decode with a single fancy index
+        self.class_names = np.array([label_mapping.get(i, "Unknown") for i in range(num_outputs)], dtype=object)
+
+    @classmethod
+    def load(cls, model_save_path=config.MODEL_SAVE_PATH, preprocessor_save_path=config.PREPROCESSOR_SAVE_PATH,
+             mapping_save_path=config.MAPPING_SAVE_PATH, device=config.DEVICE, backend=None, quantized=None):
+        backend = backend or config.IDS_INFERENCE_BACKEND
+        quantized = config.IDS_QUANTIZED_MODEL if quantized is None else quantized
+        if backend not in ('torch', 'numpy'):
+            raise ValueError(f"Unknown IDS inference backend '{backend}'")
+        start = time.perf_counter()
+        rss_before = _rss_bytes()
+
+        preprocessor = load_preprocessor(preprocessor_save_path)
+        label_mapping = load_mapping(mapping_save_path)
+        if backend == 'numpy':
+            model = load_engine(model_save_path)
+            parameter_bytes = model.nbytes
+        else:
+            from ..training.predict import load_scae_gc
+            model = load_scae_gc(model_save_path, device)
+            for param in model.parameters():
+                param.requires_grad_(False)
+            parameter_bytes = int(sum(p.numel() * p.element_size() for p in model.parameters()))
+        quantized_model = None
+        if quantized and backend == 'torch' and device == 'cpu':
+            from .quantized import quantize_scae_gc, serialized_bytes
+            quantized_model = quantize_scae_gc(model)
+        elif quantized:
+            logging.warning(f"Int8 quantized model is only available with the torch backend on cpu, not {backend}/{device}")
+        transform = CompiledTransform.from_preprocessor(preprocessor) if config.IDS_COMPILED_TRANSFORM else None
+
+        rss_after = _rss_bytes()
+        memory = {
+            "parameter_bytes": parameter_bytes,
+            "preprocessor_bytes": _preprocessor_bytes(preprocessor),
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        }
+        if quantized_model is not None:
+            memory["fp32_serialized_bytes"] = serialized_bytes(model)
+            memory["int8_serialized_bytes"] = serialized_bytes(quantized_model)
+        version = _artifact_version(preprocessor_save_path, mapping_save_path,
+                                    *(os.path.join(model_save_path, f"{name}.pth") for name in ('CAE1', 'CAE2', 'CAE3', 'SCAE_GC')))
+        load_time_s = time.perf_counter() - start
+        logging.info(f"Model registry ({backend}) loaded in {load_time_s:.3f}s "
+                     f"({memory['parameter_bytes']} parameter bytes, {memory['preprocessor_bytes']} preprocessor bytes)")
+        return cls(preprocessor, label_mapping, model, device, load_time_s, memory, transform, backend, quantized_model, version)
+
+    def features(self, new_df):
+        """Float32 SVD features for a raw KDD frame."""
+        if self.transform is not None:
+            return self.transform.transform(new_df)
+        return prepare_features(self.preprocessor, new_df).astype(np.float32)
+
+    def use_quantized(self, quantized=None):
+        """Resolve a per-request quantized flag; None falls back to config.IDS_QUANTIZED_DEFAULT."""
+        if quantized is None:
+            return self.quantized_model is not None and config.IDS_QUANTIZED_DEFAULT
+        if quantized and self.quantized_model is None:
+            raise ValueError("The int8 quantized model is not loaded; enable IDS_QUANTIZED_MODEL with the torch backend")
+        return quantized
+
+    def _torch_outputs(self, features, quantized=False):
+        import torch
+        model = self.quantized_model if quantized else self.model
+        device = 'cpu' if quantized else self.device
+        with torch.no_grad():
+            return model(torch.from_numpy(np.ascontiguousarray(features, dtype=np.float32)).to(device))
+
+    def predict_codes(self, features, quantized=False):
+        """Class indices for a preprocessed feature matrix."""
+        if self.backend == 'numpy':
+            return self.model.predict_codes(features)
+        return self._torch_outputs(features, quantized).argmax(dim=1).cpu().numpy()
+
+    def predict_proba(self, features, quantized=False):
+        """Per-class probabilities for a preprocessed feature matrix."""
+        if self.backend == 'numpy':
+            return self.model.predict_proba(features)
+        return self._torch_outputs(features, quantized).cpu().numpy()
+
+    def score(self, new_df, probabilities=False, quantized=None):
+        """Class codes for new_df, plus the probability matrix when requested."""
+        quantized = self.use_quantized(quantized)
+        features = self.features(new_df)
+        if not probabilities:
+            return self.predict_codes(features, quantized), None
+        proba = self.predict_proba(features, quantized)
+        return proba.argmax(axis=1), proba
+
+    def predict(self, new_df):
+        """Return decoded labels for new_df, one per row."""
+        return self.class_names[self.predict_codes(self.features(new_df))].tolist()
+
+    def info(self):
+        return {
+            "backend": self.backend,
+            "version": self.version,
+            "device": self.device,
+            "compiled_transform": self.transform is not None,
+            "quantized_available": self.quantized_model is not None,
+            "quantized_default": self.use_quantized(None),
+            "load_time_s": round(self.load_time_s, 4),
+            "memory": self.memory,
+            "num_classes": len(self.label_mapping),
+        }
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def load_registry(**kwargs):
+    """(Re)load the process-wide registry, e.g. at startup or after retraining."""
+    global _registry
+    registry = ModelRegistry.load(**kwargs)
+    with _registry_lock:
+        _registry = registry
+    return registry
+
+def get_registry():
+    """Return the process-wide registry, loading it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry.load()
+    return _registry
@@ -0,0 +1,50 @@
+from decimal import Decimal
+import numpy as np
+
+RESPONSE_FORMATS = ('rows', 'columnar')
+
+def normal_mask(class_names):
+    """Boolean mask over the class table marking the 'normal' classes."""
+    return np.array(['normal' in str(name).lower() for name in class_names], dtype=bool)
+
+def summarize(codes, class_names):
+    """Normal/attack and per-class counts from class codes with one bincount."""
+    return summarize_counts(np.bincount(np.asarray(codes, dtype=np.int64), minlength=len(class_names)), class_names)
+
+def summarize_counts(counts, class_names):
+    """summarize for per-class counts that were already accumulated."""
+    normal = int(counts[normal_mask(class_names)].sum())
+    return {
+        "normal": normal,
+        "attacks": int(counts.sum()) - normal,
+        "per_class": {str(name): int(n) for name, n in zip(class_names, counts) if n},
+    }
+
+def _column_values(series):
+    values = series.tolist()
+    if series.dtype == object:
+        # pcap-derived columns can hold scapy EDecimal timestamps, which json cannot encode
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    return values
+
+def columnar_payload(codes, class_names, id_field="row_ids", probabilities=None, features=None, **extra):
+    """Parallel-array payload: ids, class codes, the class-name table and optional probabilities/features."""
+    codes = np.asarray(codes)
+    payload = dict(extra)
+    payload.update({
+        "format": "columnar",
+        "total_rows": int(len(codes)),
+        "classes": [str(name) for name in class_names],
+        id_field: np.arange(1, len(codes) + 1).tolist(),
+        "predictions": codes.astype(np.int64).tolist(),
+        "summary": summarize(codes, class_names),
+    })
+    if probabilities is not None:
+        payload["probabilities"] = np.round(np.asarray(probabilities, dtype=np.float64), 6).tolist()
+    if features is not None:
+        payload["features"] = {str(col): _column_values(features[col]) for col in features.columns}
+    return payload
+
+def metadata_payload(metadata):
+    """Connection metadata (endpoints, first/last packet times) of a FeatureBatch as parallel arrays."""
+    return {str(col): metadata[col].tolist() for col in metadata.columns}
@@ -0,0 +1,88 @@
+import json
+import time
+import codecs
+import asyncio
+import logging
+import numpy as np
+import pandas as pd
+import config
+from .response import normal_mask
+from .worker_pool import CSV_ENCODINGS, InvalidUpload
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def detect_csv_encoding(file_obj, encodings=CSV_ENCODINGS, chunk_bytes=1024 * 1024):
+    """First of encodings the whole binary file decodes with, read in chunks; the file is rewound after.
+
+    Raises InvalidUpload when none of them does.
+    """
+    try:
+        for encoding in encodings:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            file_obj.seek(0)
+            try:
+                while True:
+                    chunk = file_obj.read(chunk_bytes)
+                    decoder.decode(chunk, final=not chunk)
+                    if not chunk:
+                        return encoding
+            except UnicodeDecodeError:
+                continue
+        raise InvalidUpload("Unable to decode file. Please ensure it's a valid CSV file with proper encoding.")
+    finally:
+        file_obj.seek(0)
+
+def open_csv_chunks(file_obj, chunk_rows=config.IDS_STREAM_CHUNK_ROWS, encoding=None):
+    """Chunked CSV reader over a binary file object.
+
+    Without an encoding the file is decoded with the first of CSV_ENCODINGS that
+    reads all of it, as /predict/ does; that takes one pass over the file.
+    """
+    if encoding is None:
+        encoding = detect_csv_encoding(file_obj)
+    return pd.read_csv(file_obj, chunksize=chunk_rows, encoding=encoding)
+
+async def next_chunk(reader):
+    """Parse the next chunk off the event loop, or return None at end of file."""
+    return await asyncio.to_thread(next, reader, None)
+
+async def stream_predictions(reader, first_chunk, predict, class_names, prepare=None, started=None):
+    """Yield NDJSON prediction lines chunk by chunk, ending with a summary line.
+
+    Only one chunk is held at a time, so memory stays flat however large the
+    file is. prepare validates/reorders each chunk; predict is awaited with the
+    prepared frame and returns one class code per row.
+    """
+    started = started or time.perf_counter()
+    first_result_ms = None
+    rows = 0
+    counts = np.zeros(len(class_names), dtype=np.int64)
+    encoded = [json.dumps(str(name)) for name in class_names]
+    chunk = first_chunk
+    try:
+        while chunk is not None:
+            if prepare is not None:
+                chunk = prepare(chunk)
+            codes = np.asarray(await predict(chunk), dtype=np.int64)
+            counts += np.bincount(codes, minlength=len(class_names))
+            lines = ''.join(f'{{"row_id":{row_id},"prediction":{encoded[code]}}}\n'
+                            for row_id, code in enumerate(codes.tolist(), start=rows + 1))
+            rows += len(codes)
+            if first_result_ms is None:
+                first_result_ms = (time.perf_counter() - started) * 1000
+                logging.info(f"First streamed prediction after {first_result_ms:.1f} ms")
+            yield lines.encode()
+            chunk = await next_chunk(reader)
+    except Exception as e:
+        logging.error(f"Streaming prediction failed after {rows} rows: {e}")
+        detail = getattr(e, 'detail', str(e))
+        yield (json.dumps({"error": detail, "rows_completed": rows}) + '\n').encode()
+        return
+
+    normal = int(counts[normal_mask(class_names)].sum())
+    yield (json.dumps({
+        "summary": {"normal": normal, "attacks": rows - normal},
+        "total_rows": rows,
+        "time_to_first_result_ms": round(first_result_ms, 2) if first_result_ms is not None else None,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }) + '\n').encode()
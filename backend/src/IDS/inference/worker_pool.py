@@ -0,0 +1,316 @@
+import io
+import math
+import time
+import asyncio
+import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import pandas as pd
+import config
+from .registry import get_registry, load_registry
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class Overloaded(Exception):
+    """Raised when the pool queue or the caller's concurrency limit is full."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RequestTooLarge(ValueError):
+    """Raised when a request exceeds the configured row or packet ceiling."""
+
+class InvalidUpload(ValueError):
+    """Raised when an uploaded file cannot be parsed."""
+
+# Task functions run inside the worker processes, where the registry is preloaded
+
+def _init_worker():
+    logging.getLogger().setLevel(logging.WARNING)
+    load_registry()
+
+def _warm_up():
+    return True
+
+def predict_frame(new_df, quantized=None):
+    """Class codes for new_df; callers decode them with the registry's class_names."""
+    return get_registry().score(new_df, quantized=quantized)[0]
+
+def predict_frame_fp32(new_df):
+    return predict_frame(new_df, quantized=False)
+
+def predict_frame_int8(new_df):
+    return predict_frame(new_df, quantized=True)
+
+def score_frame(new_df, probabilities=False, quantized=None):
+    return get_registry().score(new_df, probabilities, quantized)
+
+# Encodings tried in turn for CSV uploads; utf-8-sig also reads plain UTF-8, dropping a byte-order mark
+CSV_ENCODINGS = ['utf-8-sig', 'latin-1', 'cp1252']
+
+def parse_csv(contents, max_rows=config.IDS_MAX_ROWS_PER_REQUEST):
+    """Decode and parse an uploaded CSV, trying the encodings the upload route accepts."""
+    text_content = None
+    for encoding in CSV_ENCODINGS:
+        try:
+            text_content = contents.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    if text_content is None:
+        raise InvalidUpload("Unable to decode file. Please ensure it's a valid CSV file with proper encoding.")
+    try:
+        new_df = pd.read_csv(io.StringIO(text_content), nrows=max_rows + 1)
+    except pd.errors.EmptyDataError:
+        raise InvalidUpload("The uploaded CSV file is empty.")
+    except pd.errors.ParserError as e:
+        raise InvalidUpload(f"Error parsing CSV file: {str(e)}")
+    if len(new_df) > max_rows:
+        raise RequestTooLarge(f"The uploaded CSV file has more than {max_rows} rows.")
+    return new_df
+
+COLUMNAR_EXTENSIONS = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+
+def _read_arrow_table(contents, kind):
+    import pyarrow as pa
+    if kind == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(pa.BufferReader(contents))
+    import pyarrow.ipc as ipc
+    try:
+        return ipc.open_file(pa.BufferReader(contents)).read_all()
+    except pa.ArrowInvalid:
+        # Not the random-access file format, try the streaming format
+        return ipc.open_stream(pa.BufferReader(contents)).read_all()
+
+def parse_columnar(contents, kind, max_rows=config.IDS_MAX_ROWS_PER_REQUEST):
+    """Parse a Parquet or Arrow IPC upload, validating the schema before any rows are converted.
+
+    Only the KDD feature columns are materialized; dictionary-encoded string
+    columns arrive as pandas Categoricals so the compiled transform can reuse
+    their codes instead of factorizing every row.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise InvalidUpload("Parquet and Arrow uploads require pyarrow to be installed on the server.")
+    try:
+        table = _read_arrow_table(contents, kind)
+    except (pa.ArrowException, OSError) as e:
+        raise InvalidUpload(f"Error reading {kind} file: {str(e)}")
+    if table.num_rows == 0:
+        raise InvalidUpload(f"The uploaded {kind} file is empty.")
+    if table.num_rows > max_rows:
+        raise RequestTooLarge(f"The uploaded {kind} file has more than {max_rows} rows.")
+
+    schema = table.schema
+    missing = [col for col in config.KDD_FEATURE_COLUMNS if col != 'other' and col not in schema.names]
+    if missing:
+        raise InvalidUpload(f"Missing required columns: {', '.join(missing)}")
+    bad_types = []
+    for col in config.KDD_FEATURE_COLUMNS:
+        if col not in schema.names:
+            continue
+        dtype = schema.field(col).type
+        if col in config.KDD_CATEGORICAL_COLUMNS:
+            value_type = dtype.value_type if pa.types.is_dictionary(dtype) else dtype
+            ok = pa.types.is_string(value_type) or pa.types.is_large_string(value_type)
+        else:
+            ok = (pa.types.is_integer(dtype) or pa.types.is_floating(dtype)
+                  or pa.types.is_boolean(dtype) or pa.types.is_decimal(dtype))
+        if not ok:
+            bad_types.append(f"{col} ({dtype})")
+    if bad_types:
+        raise InvalidUpload(f"Columns with unsupported types: {', '.join(bad_types)}")
+
+    table = table.select([col for col in config.KDD_FEATURE_COLUMNS if col in schema.names])
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def extract_pcap_features(pcap_file, max_packets=config.IDS_MAX_PACKETS_PER_REQUEST, content=None):
+    from src.Capture.processpcap import process_pcap, CaptureTooLarge
+    from src.Capture.pcapreader import PcapFormatError
+    try:
+        return process_pcap(pcap_file, max_packets=max_packets, content=content)
+    except CaptureTooLarge as e:
+        raise RequestTooLarge(str(e))
+    except PcapFormatError as e:
+        raise InvalidUpload(str(e))
+
+def export_pcap_features(pcap_file, path, format, include_metadata=False,
+                         max_packets=config.IDS_MAX_PACKETS_PER_REQUEST, content=None):
+    """Write pcap_file's features to path in format as they are extracted; returns the rows written."""
+    from src.Capture.export import export_pcap
+    from src.Capture.processpcap import CaptureTooLarge
+    from src.Capture.pcapreader import PcapFormatError
+    try:
+        return export_pcap(pcap_file, path, format, max_packets, content, include_metadata=include_metadata)
+    except CaptureTooLarge as e:
+        raise RequestTooLarge(str(e))
+    except PcapFormatError as e:
+        raise InvalidUpload(str(e))
+
+def split_pcap_shards(pcap_file, shards, max_packets=config.IDS_MAX_PACKETS_PER_REQUEST):
+    from src.Capture.processpcap import split_capture, CaptureTooLarge
+    from src.Capture.pcapreader import PcapFormatError
+    try:
+        return split_capture(pcap_file, shards, max_packets)
+    except CaptureTooLarge as e:
+        raise RequestTooLarge(str(e))
+    except PcapFormatError as e:
+        raise InvalidUpload(str(e))
+
+def locate_pcap_shards(pcap_file, span, shards):
+    from src.Capture.processpcap import locate_shards
+    from src.Capture.pcapreader import PcapFormatError
+    try:
+        return locate_shards(pcap_file, span, shards)
+    except PcapFormatError as e:
+        raise InvalidUpload(str(e))
+
+def extract_pcap_shard(pcap_file, shard, shards, max_packets=config.IDS_MAX_PACKETS_PER_REQUEST, content=None,
+                       frames=None):
+    from src.Capture.processpcap import extract_flow_features, CaptureTooLarge
+    from src.Capture.pcapreader import PcapFormatError
+    try:
+        return extract_flow_features(pcap_file, max_packets, shard, shards, content, frames)
+    except CaptureTooLarge as e:
+        raise RequestTooLarge(str(e))
+    except PcapFormatError as e:
+        raise InvalidUpload(str(e))
+
+def merge_pcap_shards(parts):
+    from src.Capture.processpcap import merge_flow_features
+    return merge_flow_features(parts)
+
+class InferencePool:
+    """Preloaded worker processes for parsing, pcap extraction and inference, with admission control.
+
+    Requests are admitted per user; once the pool holds workers + max_queue
+    requests, or a user already has per_user_limit in flight, admit() raises
+    Overloaded with a Retry-After estimate. With workers=0 tasks run in threads
+    of the API process instead.
+    """
+
+    def __init__(self, workers=config.IDS_POOL_WORKERS, max_queue=config.IDS_POOL_MAX_QUEUE,
+                 per_user_limit=config.IDS_POOL_PER_USER_LIMIT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.per_user_limit = per_user_limit
+        self._executor = None
+        self._in_flight = 0
+        self._per_user = defaultdict(int)
+        self._task_seconds = 0.5
+        self.rejected = 0
+        self.completed = 0
+
+    @property
+    def capacity(self):
+        return max(self.workers, 1) + self.max_queue
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker)
+
+    async def start(self):
+        if self.workers > 0 and self._executor is None:
+            executor = self._executor = self._new_executor()
+            loop = asyncio.get_running_loop()
+            try:
+                # Spawn every worker now so models are loaded before the first request
+                await asyncio.gather(*(loop.run_in_executor(executor, _warm_up) for _ in range(self.workers)))
+            except Exception:
+                # Leave the pool unstarted so the next request retries with fresh workers
+                executor.shutdown(wait=False, cancel_futures=True)
+                if self._executor is executor:
+                    self._executor = None
+                raise
+            logging.info(f"Inference pool started with {self.workers} workers.")
+
+    async def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def reload(self):
+        """Replace the workers so they pick up retrained models."""
+        old, self._executor = self._executor, None
+        await self.start()
+        if old is not None:
+            await asyncio.to_thread(old.shutdown, True)
+
+    def _retry_after(self):
+        waves = self._in_flight / max(self.workers, 1)
+        return max(1, math.ceil(self._task_seconds * waves))
+
+    @asynccontextmanager
+    async def admit(self, user):
+        if self._per_user[user] >= self.per_user_limit:
+            self.rejected += 1
+            raise Overloaded(f"Too many concurrent requests for user '{user}'", self._retry_after())
+        if self._in_flight >= self.capacity:
+            self.rejected += 1
+            raise Overloaded("Inference queue is full", self._retry_after())
+        self._in_flight += 1
+        self._per_user[user] += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._per_user[user] -= 1
+            if not self._per_user[user]:
+                del self._per_user[user]
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on a worker (or a thread when the pool has no workers)."""
+        start = time.perf_counter()
+        try:
+            if self.workers > 0:
+                await self.start()
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            # Exponentially weighted task time drives the Retry-After estimate
+            self._task_seconds = 0.8 * self._task_seconds + 0.2 * (time.perf_counter() - start)
+            self.completed += 1
+
+    async def extract_pcap(self, pcap_file, shards=1):
+        """process_pcap FeatureBatch for pcap_file, with its flows sharded across shards worker tasks.
+
+        As in extract_sharded, the tasks of a first pass find each shard's packets in one byte range of the
+        capture, so every shard then reads only its own.
+        """
+        from src.Capture.processpcap import shard_frames
+        if shards <= 1:
+            return await self.run(extract_pcap_features, pcap_file)
+        ranges = await self.run(split_pcap_shards, pcap_file, shards)
+        frames = [None] * shards
+        if ranges is not None:
+            frames = shard_frames(await asyncio.gather(*(self.run(locate_pcap_shards, pcap_file, span, shards)
+                                                         for span in ranges)))
+        parts = await asyncio.gather(*(self.run(extract_pcap_shard, pcap_file, shard, shards,
+                                                config.IDS_MAX_PACKETS_PER_REQUEST, None, frames[shard])
+                                       for shard in range(shards)))
+        return await self.run(merge_pcap_shards, parts)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "per_user_in_flight": dict(self._per_user),
+            "completed_tasks": self.completed,
+            "rejected_requests": self.rejected,
+            "mean_task_seconds": round(self._task_seconds, 4),
+        }
+
+_pool = None
+
+def get_pool():
+    """Process-wide inference pool shared by the API routes."""
+    global _pool
+    if _pool is None:
+        _pool = InferencePool()
+    return _pool
@@ -0,0 +1,132 @@
+import logging
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CATEGORICAL_COLUMNS = config.KDD_CATEGORICAL_COLUMNS
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array = np.ascontiguousarray(array)
+    array.setflags(write=False)
+    return array
+
+def _numeric_column(values) -> np.ndarray:
+    """Coerce a raw column to float64 (object columns of EDecimal/Decimal go through float()), infinities to NaN."""
+    values = np.asarray(values).astype(np.float64, copy=False)
+    if not np.isfinite(values).all():
+        values = np.where(np.isinf(values), np.nan, values)
+    return values
+
+class CompiledTransform:
+    """Frozen, pandas-free equivalent of Preprocessor.transform for a fitted Preprocessor.
+
+    StandardScaler followed by TruncatedSVD is the affine map
+    x -> (x - mean) / scale @ components.T, so it is folded into one float32
+    projection matrix and bias. A one-hot column contributes a single column of
+    that matrix, so each categorical value is turned into a row lookup instead
+    of a dummy column. Missing values are still filled with the batch median
+    (numeric) or mode (categorical), as in handle_missing_values.
+    """
+
+    def __init__(self, numeric_columns: List[str], numeric_weight: np.ndarray,
+                 category_index: Dict[str, Dict[str, int]], category_weight: Dict[str, np.ndarray],
+                 bias: np.ndarray):
+        self.numeric_columns = list(numeric_columns)
+        self.numeric_weight = _frozen(numeric_weight)
+        self.category_index = category_index
+        self.category_weight = {col: _frozen(w) for col, w in category_weight.items()}
+        self.bias = _frozen(bias)
+        self.n_components = bias.shape[0]
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor) -> "CompiledTransform":
+        if preprocessor.dummy_columns is None or preprocessor.svd is None:
+            raise ValueError("Preprocessor must be fitted before it can be compiled.")
+        columns = list(preprocessor.dummy_columns)
+        mean = np.asarray(preprocessor.scaler.mean_, dtype=np.float64)
+        scale = np.asarray(preprocessor.scaler.scale_, dtype=np.float64)
+        components = np.asarray(preprocessor.svd.components_, dtype=np.float64)
+        if components.shape[1] != len(columns):
+            raise ValueError(f"SVD expects {components.shape[1]} inputs but {len(columns)} columns were fitted.")
+
+        # Column j of the fused map, in (n_columns, n_components) layout for x @ W
+        weight = (components / scale).T
+        bias = -(mean / scale) @ components.T
+
+        numeric_idx, numeric_columns = [], []
+        category_index = {col: {} for col in CATEGORICAL_COLUMNS}
+        category_rows = {col: [] for col in CATEGORICAL_COLUMNS}
+        for j, name in enumerate(columns):
+            for col in CATEGORICAL_COLUMNS:
+                if name.startswith(col + '_'):
+                    category_index[col][name[len(col) + 1:]] = len(category_rows[col])
+                    category_rows[col].append(weight[j])
+                    break
+            else:
+                numeric_idx.append(j)
+                numeric_columns.append(name)
+
+        # The last row of every table is zeros: the dropped first category and unseen values
+        category_weight = {
+            col: np.vstack(rows + [np.zeros(weight.shape[1])]).astype(np.float32)
+            for col, rows in category_rows.items()
+        }
+        logging.info(f"Compiled transform: {len(numeric_columns)} numeric inputs, "
+                     f"{sum(len(v) for v in category_index.values())} category entries -> {weight.shape[1]} components")
+        return cls(numeric_columns, weight[numeric_idx].astype(np.float32), category_index,
+                   category_weight, bias.astype(np.float32))
+
+    def category_codes(self, col: str, values) -> np.ndarray:
+        """Map raw category values to rows of the category table, filling missing values with the batch mode."""
+        table = self.category_index[col]
+        unknown = len(table)
+        if isinstance(values, pd.Categorical):
+            # Dictionary-encoded input (Arrow, typed pcap batches): reuse its codes, only the categories are looked up
+            codes, uniques = values.codes.astype(np.intp), np.asarray(values.categories, dtype=object)
+            order = np.argsort(uniques.astype(str), kind='stable')
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            codes = np.where(codes >= 0, rank[codes], -1)
+            uniques = uniques[order]
+        else:
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object), sort=True)
+        if (codes < 0).any() and len(uniques):
+            # handle_missing_values fills with mode()[0]: the most frequent, smallest value on ties
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            codes = np.where(codes < 0, int(np.argmax(counts)), codes)
+        lookup = np.array([table.get(str(u), unknown) for u in uniques] + [unknown], dtype=np.intp)
+        return lookup[codes]
+
+    def numeric_matrix(self, columns: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+        """Stack the numeric inputs in fitted order; absent columns are zero, NaNs get the batch median."""
+        matrix = np.zeros((n_rows, len(self.numeric_columns)), dtype=np.float64)
+        for j, name in enumerate(self.numeric_columns):
+            if name in columns:
+                matrix[:, j] = _numeric_column(columns[name])
+        missing = np.isnan(matrix)
+        if missing.any():
+            cols = np.flatnonzero(missing.any(axis=0))
+            medians = np.nanmedian(matrix[:, cols], axis=0)
+            matrix[:, cols] = np.where(missing[:, cols], medians, matrix[:, cols])
+        return matrix
+
+    def transform_arrays(self, numeric: np.ndarray, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        """Project a numeric matrix and category codes straight to the SVD features."""
+        out = np.asarray(numeric, dtype=np.float32) @ self.numeric_weight
+        out += self.bias
+        for col, weight in self.category_weight.items():
+            if col in codes:
+                out += weight[codes[col]]
+        return out
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Float32 (n_rows, n_components) features for a raw KDD frame, matching Preprocessor.transform."""
+        n_rows = len(df)
+        numeric = self.numeric_matrix({name: df[name].to_numpy() for name in self.numeric_columns if name in df.columns}, n_rows)
+        codes = {col: self.category_codes(col, df[col].array if isinstance(df[col].dtype, pd.CategoricalDtype)
+                                          else df[col].to_numpy())
+                 for col in CATEGORICAL_COLUMNS if col in df.columns}
+        return self.transform_arrays(numeric, codes)
@@ -130,7 +130,9 @@ class Preprocessor:
                 if self.dummy_columns is None:
                     raise ValueError("Training data must be processed first to determine the correct columns.")
                 
-                encoded_df = pd.get_dummies(df_converted, drop_first=True, dtype=int)
+                # No drop_first here: the batch's first category is not necessarily the one
+                # dropped at fit time, and reindex below discards the training-dropped column
+                encoded_df = pd.get_dummies(df_converted, dtype=int)
                 missing_cols = set(self.dummy_columns) - set(encoded_df.columns)
                 for col in missing_cols:
                     encoded_df[col] = 0  # Add missing columns with zeros
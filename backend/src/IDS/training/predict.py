@@ -1,12 +1,11 @@
 import os
-import json
-import pickle
 import logging
 import torch
 import numpy as np
 import pandas as pd
 from ..architectures.auto_encoder import ContractiveAutoEncoder
 from ..architectures.SGAE_GC import SCAE_GC
+from ..inference.artifacts import load_preprocessor, load_mapping, prepare_features
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,35 +21,6 @@ PREPROCESSOR_SAVE_PATH = config.PREPROCESSOR_SAVE_PATH
 MAPPING_SAVE_PATH = config.MAPPING_SAVE_PATH
 DEVICE = config.DEVICE
 
-def load_preprocessor(save_path):
-    try:
-        with open(save_path, 'rb') as f:
-            preprocessor = pickle.load(f)
-        logging.info("Preprocessor loaded successfully.")
-        return preprocessor
-    except FileNotFoundError:
-        logging.error("Preprocessor file not found.")
-        raise
-    except Exception as e:
-        logging.error(f"Error loading preprocessor: {e}")
-        raise
-
-def load_mapping(save_path):
-    try:
-        with open(save_path, 'r') as f:
-            mapping = json.load(f)
-        logging.info("Label mapping loaded successfully.")
-        return {int(v): k for k, v in mapping.items()}  # Reverse mapping for decoding
-    except FileNotFoundError:
-        logging.error("Label mapping file not found.")
-        raise
-    except json.JSONDecodeError:
-        logging.error("Error decoding JSON label mapping.")
-        raise
-    except Exception as e:
-        logging.error(f"Error loading label mapping: {e}")
-        raise
-
 def load_model(model_class, model_path, device, *args):
     try:
         model = model_class(*args).to(device)
@@ -65,7 +35,33 @@ def load_model(model_class, model_path, device, *args):
         logging.error(f"Error loading model {model_class.__name__}: {e}")
         raise
 
+def load_scae_gc(model_save_path, device='cpu'):
+    """Build the CAE stack and the SCAE-GC model from saved weights, in eval mode."""
+    cae1 = load_model(ContractiveAutoEncoder, os.path.join(model_save_path, "CAE1.pth"), device, 37, 80)
+    cae2 = load_model(ContractiveAutoEncoder, os.path.join(model_save_path, "CAE2.pth"), device, 80, 40)
+    cae3 = load_model(ContractiveAutoEncoder, os.path.join(model_save_path, "CAE3.pth"), device, 40, 20)
+    return load_model(SCAE_GC, os.path.join(model_save_path, "SCAE_GC.pth"), device, 37, cae1, cae2, cae3, 20, 20)
+
+def predict_features(features, label_mapping, scae_gc, device='cpu'):
+    """Predict labels for an already preprocessed (n_rows, 37) feature matrix."""
+    features = torch.as_tensor(features, dtype=torch.float32).to(device)
+
+    # Get predictions
+    with torch.no_grad():
+        outputs = scae_gc(features)
+
+    # Convert predictions to labels
+    predicted_labels = np.argmax(outputs.cpu().numpy(), axis=1)
+    return [label_mapping.get(label, "Unknown") for label in predicted_labels]
+
+def predict_with_model(new_df, preprocessor, label_mapping, scae_gc, device='cpu'):
+    """Predict labels for new_df with an already loaded preprocessor, mapping and model."""
+    features = prepare_features(preprocessor, new_df)
+    logging.info("New data loaded and preprocessed successfully.")
+    return predict_features(features, label_mapping, scae_gc, device)
+
 def predict_new_data(new_df, model_save_path, preprocessor_save_path, mapping_save_path, device='cpu'):
+    """Load every artifact from disk and predict. The API uses ModelRegistry instead."""
     try:
         # Load Preprocessor
         preprocessor = load_preprocessor(preprocessor_save_path)
@@ -73,31 +69,10 @@ def predict_new_data(new_df, model_save_path, preprocessor_save_path, mapping_sa
         # Load Label Mapping
         label_mapping = load_mapping(mapping_save_path)
 
-        # For prediction, we don't have a class column, so we set test_df directly
-        preprocessor.test_df = new_df.copy()
-        preprocessor.test_df.replace([np.inf, -np.inf], np.nan, inplace=True)
-        preprocessor.test_labels = None  # No labels for prediction
-        logging.info(f"Prediction data loaded successfully with shape: {preprocessor.test_df.shape}")
-        
-        preprocessor.transform()
-        features = torch.tensor(preprocessor.test_df.values, dtype=torch.float32).to(device)
-        logging.info("New data loaded and preprocessed successfully.")
-
-        # Load trained autoencoders
-        cae1 = load_model(ContractiveAutoEncoder, os.path.join(model_save_path, "CAE1.pth"), device, 37, 80)
-        cae2 = load_model(ContractiveAutoEncoder, os.path.join(model_save_path, "CAE2.pth"), device, 80, 40)
-        cae3 = load_model(ContractiveAutoEncoder, os.path.join(model_save_path, "CAE3.pth"), device, 40, 20)
-
-        # Load SCAE-GC model
-        scae_gc = load_model(SCAE_GC, os.path.join(model_save_path, "SCAE_GC.pth"), device, 37, cae1, cae2, cae3, 20, 20)
-
-        # Get predictions
-        with torch.no_grad():
-            outputs = scae_gc(features)
+        # Load trained autoencoders and SCAE-GC model
+        scae_gc = load_scae_gc(model_save_path, device)
 
-        # Convert predictions to labels
-        predicted_labels = np.argmax(outputs.cpu().numpy(), axis=1)
-        decoded_labels = [label_mapping.get(label, "Unknown") for label in predicted_labels]
+        decoded_labels = predict_with_model(new_df, preprocessor, label_mapping, scae_gc, device)
 
         logging.info("Predictions generated successfully.")
         return decoded_labels
@@ -0,0 +1,34 @@
+import asyncio
+import numpy as np
+import pandas as pd
+from src.IDS.inference.batcher import MicroBatcher
+
+def impute_with_batch_median(df):
+    # Like the preprocessing, missing values take the median of the whole frame being scored
+    return df['src_bytes'].fillna(df['src_bytes'].median()).to_numpy()
+
+async def score_concurrently(batcher, frames):
+    try:
+        return await asyncio.gather(*(batcher.predict(frame) for frame in frames))
+    finally:
+        await batcher.stop()
+
+def test_request_with_missing_values_scores_the_same_alone_and_co_batched():
+    request = pd.DataFrame({'src_bytes': [1.0, np.nan, 3.0]})
+    others = pd.DataFrame({'src_bytes': np.arange(100, 300, dtype=np.float64)})
+
+    alone, = asyncio.run(score_concurrently(MicroBatcher(impute_with_batch_median), [request]))
+    batcher = MicroBatcher(impute_with_batch_median, max_delay_ms=50)
+    co_batched, _ = asyncio.run(score_concurrently(batcher, [request, others]))
+
+    np.testing.assert_array_equal(alone, co_batched)
+    assert batcher.batches == 2
+
+def test_complete_requests_are_merged_and_split_back_in_order():
+    frames = [pd.DataFrame({'src_bytes': np.arange(n, dtype=np.float64) + 10 * n}) for n in (1, 2, 3)]
+    batcher = MicroBatcher(impute_with_batch_median, max_delay_ms=50)
+    results = asyncio.run(score_concurrently(batcher, frames))
+
+    for frame, result in zip(frames, results):
+        np.testing.assert_array_equal(result, frame['src_bytes'].to_numpy())
+    assert batcher.batches == 1
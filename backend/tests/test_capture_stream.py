@@ -0,0 +1,70 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+import pytest
+from api.auth import User
+from api.Capture import routes
+from src.Capture.sessions import CaptureSessionManager
+
+async def open_idle_source(interface=None, duration=None, profile=None):
+    # Stands in for tshark: a process that writes nothing until it is terminated
+    process = await asyncio.create_subprocess_exec(sys.executable, '-c', 'import time; time.sleep(60)',
+                                                   stdout=asyncio.subprocess.PIPE)
+    return process, 'lo'
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    manager = CaptureSessionManager(str(tmp_path / 'sessions'))
+    monkeypatch.setattr(routes, 'get_session_manager', lambda: manager)
+    monkeypatch.setattr(routes, 'open_tshark', open_idle_source)
+    monkeypatch.setattr(routes, 'get_registry', lambda: SimpleNamespace(class_names=['normal', 'dos']))
+    monkeypatch.setattr(routes, 'resolve_quantized', lambda quantized: False)
+    return manager
+
+async def disconnect_before_body(manager):
+    response = await routes.stream_detections(30, profile=routes.CaptureProfileInput(),
+                                              current_user=User(username='alice', password=''))
+    session = next(iter(manager.sessions.values()))
+    process = session._process
+    assert process.returncode is None
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    with pytest.raises(Exception):
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    await asyncio.wait_for(process.wait(), 5)
+    return session
+
+def test_stream_is_stopped_when_the_client_leaves_before_the_body(manager):
+    session = asyncio.run(disconnect_before_body(manager))
+
+    assert not manager.sessions and session.ended_at is not None
+
+async def open_empty_source(interface=None, duration=None, profile=None):
+    process = await asyncio.create_subprocess_exec(sys.executable, '-c', 'pass', stdout=asyncio.subprocess.PIPE)
+    return process, 'lo'
+
+async def read_whole_stream():
+    response = await routes.stream_detections(30, profile=routes.CaptureProfileInput(),
+                                              current_user=User(username='alice', password=''))
+    body = []
+
+    async def receive():
+        await asyncio.sleep(60)
+
+    async def send(message):
+        body.append(message.get("body", b""))
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    return b"".join(body).decode()
+
+def test_stream_ends_and_frees_its_session_when_the_capture_ends(manager, monkeypatch):
+    monkeypatch.setattr(routes, 'open_tshark', open_empty_source)
+    body = asyncio.run(read_whole_stream())
+
+    assert body.startswith("event: start\n") and "event: end\n" in body
+    assert not manager.sessions
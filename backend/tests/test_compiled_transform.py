@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.IDS.preprocessing.compiled import CompiledTransform
+from src.IDS.preprocessing.preprocess import Preprocessor
+
+NUMERIC = ['duration', 'src_bytes', 'dst_bytes', 'count']
+CATEGORIES = {'protocol_type': ['icmp', 'tcp', 'udp'], 'service': ['ftp', 'http', 'private', 'smtp', 'telnet'],
+              'flag': ['REJ', 'S0', 'SF']}
+
+def kdd_frame(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({name: rng.gamma(2.0, 50.0, n_rows) for name in NUMERIC})
+    for name, values in CATEGORIES.items():
+        frame[name] = rng.choice(values, n_rows)
+    return frame
+
+@pytest.fixture(scope='module')
+def fitted(tmp_path_factory):
+    preprocessor = Preprocessor(output_dir=str(tmp_path_factory.mktemp('preprocessing')))
+    preprocessor.numeric_columns = NUMERIC
+    train = kdd_frame(2000, 0)
+    train['label'] = 0
+    preprocessor.load_train_data(train, 'label')
+    preprocessor.process(n_components=6)
+    return preprocessor, CompiledTransform.from_preprocessor(preprocessor)
+
+def pandas_transform(preprocessor, frame):
+    preprocessor.load_test_data(frame.assign(label=0), 'label')
+    preprocessor.transform(n_components=6)
+    return preprocessor.test_df.to_numpy()
+
+def assert_parity(fitted, frame, compiled_input=None):
+    preprocessor, compiled = fitted
+    expected = pandas_transform(preprocessor, frame)
+    result = compiled.transform(compiled_input if compiled_input is not None else frame)
+
+    assert result.dtype == np.float32 and result.shape == expected.shape
+    np.testing.assert_allclose(result, expected, rtol=1e-4, atol=1e-4)
+
+def test_matches_the_pandas_transform(fitted):
+    assert_parity(fitted, kdd_frame(500, 1))
+
+def test_missing_values_take_the_batch_median_and_mode(fitted):
+    frame = kdd_frame(300, 2)
+    frame.loc[::7, 'src_bytes'] = np.nan
+    frame.loc[::11, 'duration'] = np.inf
+    frame.loc[::5, 'service'] = np.nan
+    assert_parity(fitted, frame)
+
+def test_unseen_categories_encode_like_the_dropped_category(fitted):
+    frame = kdd_frame(200, 3)
+    frame.loc[::3, 'service'] = 'gopher'
+    frame.loc[::4, 'flag'] = 'RSTO'
+    assert_parity(fitted, frame)
+
+def test_categorical_columns_match_object_columns(fitted):
+    frame = kdd_frame(200, 4)
+    typed = frame.astype({name: pd.CategoricalDtype(sorted(set(values) | {'unused'}))
+                          for name, values in CATEGORIES.items()})
+    assert_parity(fitted, frame, typed)
+
+def test_encoding_does_not_depend_on_the_batch(fitted):
+    preprocessor, _ = fitted
+    frame = kdd_frame(50, 5)
+    # A batch whose only category is not the one dropped at fit time is encoded as in a mixed batch
+    alone = frame[frame['protocol_type'] == 'udp'].head(1)
+    mixed = pandas_transform(preprocessor, frame)
+
+    np.testing.assert_allclose(pandas_transform(preprocessor, alone)[0], mixed[alone.index[0]], atol=1e-9)
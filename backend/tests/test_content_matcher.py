@@ -0,0 +1,54 @@
+import json
+import random
+import pytest
+import config
+from src.Capture.content_matcher import ContentMatcher
+
+pytest.importorskip('ahocorasick')
+
+PATTERNS = {
+    'num_failed_logins': ['login failed', 'Incorrect Password'],
+    'logged_in': ['login successful'],
+    'root_shell': ['root#', 'aa'],
+    'num_root': ['root:', 'aba'],
+    'num_file_creations': ['mkdir', 'touch', 'login failed'],
+    'num_shells': ['sh -c'],
+}
+
+def both_paths(patterns):
+    automaton = ContentMatcher(patterns, automaton_min_patterns=0)
+    loop = ContentMatcher(patterns, automaton_min_patterns=10 ** 6)
+    assert automaton._automaton is not None and loop._automaton is None
+    return automaton, loop
+
+def payloads(count, seed=0):
+    rng = random.Random(seed)
+    planted = ['LOGIN FAILED', 'login successful', 'root#', 'aaaa', 'ababa', 'sh -c', '/etc/passwd', 'MkDir']
+    out = []
+    for _ in range(count):
+        words = [rng.choice(planted) if rng.random() < 0.3 else ''.join(rng.choices('abhilmnorst #:-', k=6))
+                 for _ in range(rng.randrange(1, 12))]
+        out.append(' '.join(words).encode('latin-1') + bytes(rng.randrange(128, 256) for _ in range(3)))
+    return out
+
+def test_automaton_and_per_pattern_search_count_the_same():
+    automaton, loop = both_paths(PATTERNS)
+    for payload in payloads(500):
+        assert automaton.pattern_counts(payload) == loop.pattern_counts(payload)
+        assert automaton.hits(len(payload), payload) == loop.hits(len(payload), payload)
+
+    assert automaton.feature_hits(payloads(500)) == loop.feature_hits(payloads(500))
+
+def test_overlapping_occurrences_are_all_counted():
+    automaton, loop = both_paths(PATTERNS)
+
+    for matcher in (automaton, loop):
+        counts = matcher.pattern_counts(b'AAAA ababa')
+        assert counts[b'aa'] == 3 and counts[b'aba'] == 2
+
+def test_shipped_patterns_count_the_same_on_both_paths():
+    with open(config.CONTENT_PATTERNS_PATH) as f:
+        automaton, loop = both_paths(json.load(f))
+    sample = payloads(300, seed=1) + [b'cat /ETC/PASSWD; su - root; touch x; mkdir y; Login Failed']
+    assert automaton.feature_hits(sample) == loop.feature_hits(sample)
+    assert loop.feature_hits(sample[-1:])['num_access_files'] == 1
@@ -0,0 +1,67 @@
+import io
+import pandas as pd
+import pytest
+from benchmarks.synthetic_pcap import write_capture
+from src.Capture.export import EXPORT_COLUMNS, export_pcap, open_writer
+from src.Capture.feature_batch import METADATA_COLUMNS
+from src.Capture.processpcap import process_pcap
+
+CONNECTION_KEY = ['first_ts', 'src_ip', 'src_port', 'dst_ip', 'dst_port']
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('pcap') / 'synthetic.pcap')
+    write_capture(path, n_flows=300)
+    return path, process_pcap(path)
+
+def read_arff(path):
+    with open(path) as f:
+        text = f.read()
+    names = [line.split()[1] for line in text.splitlines() if line.startswith('@ATTRIBUTE')]
+    data = text.split('@DATA\n', 1)[1]
+    return pd.read_csv(io.StringIO(data), names=names, header=None, na_values='?', quotechar="'")
+
+READERS = {'csv': pd.read_csv, 'arff': read_arff, 'parquet': pd.read_parquet}
+
+def expected_frame(batch):
+    return batch.features[EXPORT_COLUMNS].join(batch.metadata)
+
+def assert_same_rows(written, expected):
+    assert list(written.columns) == EXPORT_COLUMNS + list(METADATA_COLUMNS)
+    for name in written.columns:
+        left, right = written[name], expected[name]
+        if left.dtype.kind == 'f' or right.dtype.kind == 'f':
+            assert left.astype(float).round(6).tolist() == right.astype(float).round(6).tolist(), name
+        else:
+            assert left.astype(str).tolist() == right.astype(str).tolist(), name
+
+@pytest.mark.parametrize('format', ['csv', 'arff', 'parquet'])
+def test_writer_round_trips_a_batch_written_in_slices(capture, tmp_path, format):
+    _, batch = capture
+    path = str(tmp_path / f'features.{format}')
+    with open_writer(path, format, include_metadata=True, chunk_rows=64) as writer:
+        for part in batch.slices(100):
+            writer.write(part)
+
+    assert writer.rows == len(batch)
+    assert_same_rows(READERS[format](path), expected_frame(batch).reset_index(drop=True))
+
+@pytest.mark.parametrize('format', ['csv', 'arff', 'parquet'])
+def test_empty_export_keeps_its_header(tmp_path, format):
+    path = str(tmp_path / f'features.{format}')
+    with open_writer(path, format) as writer:
+        pass
+
+    written = READERS[format](path)
+    assert writer.rows == 0 and len(written) == 0 and list(written.columns) == EXPORT_COLUMNS
+
+@pytest.mark.parametrize('format', ['csv', 'arff', 'parquet'])
+def test_incremental_export_writes_the_batch_rows(capture, tmp_path, format):
+    pcap, batch = capture
+    path = str(tmp_path / f'features.{format}')
+    rows = export_pcap(pcap, path, format, include_metadata=True, chunk_packets=256, chunk_rows=50)
+
+    written = READERS[format](path).sort_values(CONNECTION_KEY, kind='stable').reset_index(drop=True)
+    expected = expected_frame(batch).sort_values(CONNECTION_KEY, kind='stable').reset_index(drop=True)
+    assert rows == len(batch)
+    assert_same_rows(written, expected)
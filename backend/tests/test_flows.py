@@ -0,0 +1,89 @@
+from src.Capture.flows import FlowTracker
+from src.Capture.pcapreader import PacketRecord, PROTO_TCP, PROTO_UDP, TCP_ACK, TCP_FIN, TCP_RST, TCP_SYN
+
+CLIENT, SERVER = bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2])
+
+def packet(ts, flags=TCP_ACK, reply=False, proto=PROTO_TCP, sport=40000, dport=80, length=60):
+    src, dst = (SERVER, CLIENT) if reply else (CLIENT, SERVER)
+    if reply:
+        sport, dport = dport, sport
+    return PacketRecord(ts, src, dst, proto, sport, dport, flags, length, length, False, 0, 0, None)
+
+def track(records, **kwargs):
+    kwargs.setdefault('chunk_packets', 2)
+    tracker = FlowTracker(**kwargs)
+    flows = tracker.consume(records).finish()
+    return tracker, flows
+
+def test_both_directions_share_one_flow():
+    tracker, flows = track([packet(0.0, TCP_SYN), packet(0.1, TCP_SYN | TCP_ACK, reply=True),
+                            packet(0.2), packet(0.3, reply=True, length=100)])
+
+    assert len(flows) == 1 and flows.keys[0] == (CLIENT, 40000, SERVER, 80, PROTO_TCP)
+    assert flows.column('packets').tolist() == [4]
+    assert flows.column('src_bytes').tolist() == [120] and flows.column('dst_bytes').tolist() == [160]
+    assert tracker.ended['end_of_capture'] == 1
+
+def test_syn_ack_sender_is_the_responder():
+    _, flows = track([packet(0.0, TCP_SYN | TCP_ACK, reply=True), packet(0.1)])
+
+    assert flows.keys == [(CLIENT, 40000, SERVER, 80, PROTO_TCP)]
+
+def test_idle_timeout_splits_a_flow():
+    tracker, flows = track([packet(0.0, proto=PROTO_UDP), packet(1.0, proto=PROTO_UDP),
+                            packet(12.0, proto=PROTO_UDP)], idle_timeout=10)
+
+    assert flows.column('packets').tolist() == [2, 1]
+    assert flows.column('end_ts').tolist()[0] == 11.0
+    assert tracker.ended['idle'] == 1 and tracker.flows_created == 2
+
+def test_active_timeout_splits_a_busy_flow():
+    tracker, flows = track([packet(float(ts), proto=PROTO_UDP) for ts in range(8)],
+                           idle_timeout=10, active_timeout=5)
+
+    assert flows.column('packets').tolist() == [6, 2]
+    assert tracker.ended['active'] == 1
+
+def test_fin_from_both_sides_closes_the_flow():
+    tracker, flows = track([packet(0.0, TCP_SYN), packet(0.1, TCP_FIN | TCP_ACK),
+                            packet(0.2, TCP_FIN | TCP_ACK, reply=True), packet(5.0, TCP_SYN)],
+                           close_linger=1)
+
+    assert flows.column('packets').tolist() == [3, 1]
+    assert flows.column('end_ts').tolist()[0] == 0.2
+    assert tracker.ended['fin'] == 1
+
+def test_fin_from_one_side_keeps_the_flow_open():
+    tracker, flows = track([packet(0.0, TCP_SYN), packet(0.1, TCP_FIN | TCP_ACK), packet(5.0)],
+                           close_linger=1)
+
+    assert flows.column('packets').tolist() == [3]
+    assert tracker.ended['fin'] == 0
+
+def test_rst_closes_the_flow():
+    tracker, flows = track([packet(0.0, TCP_SYN), packet(0.1, TCP_RST, reply=True), packet(5.0)],
+                           close_linger=1)
+
+    assert flows.column('packets').tolist() == [2, 1]
+    assert tracker.ended['rst'] == 1
+
+def test_stragglers_within_the_linger_join_the_closed_flow():
+    tracker, flows = track([packet(0.0, TCP_SYN), packet(0.1, TCP_FIN | TCP_ACK),
+                            packet(0.2, TCP_FIN | TCP_ACK, reply=True), packet(0.5)], close_linger=1)
+
+    assert flows.column('packets').tolist() == [4]
+    assert tracker.flows_created == 1 and tracker.ended['fin'] == 1
+
+def test_new_handshake_within_the_linger_starts_a_new_flow():
+    _, flows = track([packet(0.0, TCP_SYN), packet(0.1, TCP_RST, reply=True), packet(0.2, TCP_SYN)],
+                     close_linger=1)
+
+    assert flows.column('packets').tolist() == [2, 1]
+
+def test_max_flows_evicts_the_least_recently_active():
+    records = [packet(float(i), proto=PROTO_UDP, sport=40000 + i) for i in range(6)]
+    tracker, flows = track(records, idle_timeout=100, max_flows=2)
+
+    assert len(flows) == 6 and tracker.ended['capacity'] > 0
+    assert tracker.peak_live_flows <= 2 + 2
+    assert flows.key_column(1) == [40000 + i for i in range(6)]
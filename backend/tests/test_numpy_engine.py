@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import pytest
+import torch
+from src.IDS.architectures.SGAE_GC import SCAE_GC
+from src.IDS.architectures.auto_encoder import ContractiveAutoEncoder
+from src.IDS.inference.numpy_engine import NumpySCAEGC, fold_state_dict, load_engine
+
+def random_scae_gc(seed):
+    torch.manual_seed(seed)
+    cae1, cae2, cae3 = ContractiveAutoEncoder(37, 80), ContractiveAutoEncoder(80, 40), ContractiveAutoEncoder(40, 20)
+    return SCAE_GC(37, cae1, cae2, cae3, 20, 20).eval()
+
+def torch_proba(model, x):
+    with torch.no_grad():
+        return model(torch.from_numpy(x)).numpy()
+
+@pytest.fixture
+def features():
+    return np.random.default_rng(0).normal(0.0, 2.0, (512, 37)).astype(np.float32)
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_matches_the_torch_forward_pass(features, seed):
+    model = random_scae_gc(seed)
+    engine = NumpySCAEGC(fold_state_dict(model.state_dict()))
+    expected = torch_proba(model, features)
+
+    np.testing.assert_allclose(engine.predict_proba(features), expected, atol=1e-5)
+    np.testing.assert_array_equal(engine.predict_codes(features), expected.argmax(axis=1))
+
+def save_weights(model, directory, mtime):
+    path = os.path.join(directory, 'SCAE_GC.pth')
+    torch.save(model.state_dict(), path)
+    os.utime(path, (mtime, mtime))
+
+def test_load_engine_re_exports_when_the_weights_are_newer(tmp_path, features):
+    npz_path = str(tmp_path / 'SCAE_GC.npz')
+    first, retrained = random_scae_gc(0), random_scae_gc(1)
+    save_weights(first, str(tmp_path), 1_000_000)
+    load_engine(str(tmp_path), npz_path)
+    os.utime(npz_path, (2_000_000, 2_000_000))
+
+    # Older weights than the export: the export is loaded as is
+    save_weights(retrained, str(tmp_path), 1_500_000)
+    np.testing.assert_allclose(load_engine(str(tmp_path), npz_path).predict_proba(features),
+                               torch_proba(first, features), atol=1e-5)
+
+    save_weights(retrained, str(tmp_path), 3_000_000)
+    np.testing.assert_allclose(load_engine(str(tmp_path), npz_path).predict_proba(features),
+                               torch_proba(retrained, features), atol=1e-5)
+    assert os.path.getmtime(npz_path) > 3_000_000
@@ -0,0 +1,74 @@
+import itertools
+import pytest
+from benchmarks.synthetic_pcap import write_capture
+from src.Capture.feature_batch import FeatureBatch
+from src.Capture.flows import FlowTracker
+from src.Capture.online import OnlineFeatureExtractor
+from src.Capture.processpcap import process_pcap, read_packets
+from src.Capture.traffic_features import TrafficWindows
+
+CONNECTION_KEY = ['first_ts', 'src_ip', 'src_port', 'dst_ip', 'dst_port']
+
+def capture(tmp_path_factory, name, **kwargs):
+    path = str(tmp_path_factory.mktemp('pcap') / name)
+    write_capture(path, **kwargs)
+    return path
+
+@pytest.fixture(scope='module')
+def dense_capture(tmp_path_factory):
+    # About 0.3 s of traffic, so every connection shares its time window with many others
+    return capture(tmp_path_factory, 'dense.pcap', n_flows=600)
+
+@pytest.fixture(scope='module')
+def long_capture(tmp_path_factory):
+    # About 60 s of traffic, thirty times the time window
+    return capture(tmp_path_factory, 'long.pcap', n_flows=3000, flows_per_second=50, clients=500, servers=50)
+
+def sorted_by_connection(batch):
+    frame = batch.features.join(batch.metadata)
+    return frame.sort_values(CONNECTION_KEY, kind='stable').reset_index(drop=True)
+
+def run_online(path, extractor, chunk_packets=256, observe=None):
+    rows = []
+    records = read_packets(path)
+    while True:
+        chunk = list(itertools.islice(records, chunk_packets))
+        if not chunk:
+            break
+        rows += extractor.consume(chunk)
+        if observe is not None:
+            observe(extractor)
+    return rows + extractor.finish()
+
+@pytest.mark.parametrize('chunk_packets', [64, 1024])
+def test_released_rows_match_the_batch_extraction(dense_capture, chunk_packets):
+    extractor = OnlineFeatureExtractor(chunk_packets=chunk_packets, with_metadata=True)
+    online = FeatureBatch.from_rows(run_online(dense_capture, extractor, chunk_packets))
+    batch = process_pcap(dense_capture)
+
+    assert len(online) == len(batch) and extractor.late_rows == 0
+    assert sorted_by_connection(online).equals(sorted_by_connection(batch))
+
+def test_long_capture_matches_the_batch_extraction(long_capture):
+    online = FeatureBatch.from_rows(run_online(long_capture, OnlineFeatureExtractor(with_metadata=True)))
+
+    assert sorted_by_connection(online).equals(sorted_by_connection(process_pcap(long_capture)))
+
+def test_state_stays_bounded_over_a_long_capture(long_capture):
+    windows = TrafficWindows(host_ttl=5, max_hosts=20)
+    extractor = OnlineFeatureExtractor(FlowTracker(max_flows=200, chunk_packets=256), windows)
+    peaks = dict.fromkeys(['sources', 'hosts', 'pending_rows', 'live_flows'], 0)
+
+    def observe(extractor):
+        for name, value in extractor.stats().items():
+            if name in peaks:
+                peaks[name] = max(peaks[name], value)
+
+    rows = run_online(long_capture, extractor, observe=observe)
+
+    assert len(rows) == extractor.tracker.flows_emitted and extractor.tracker.ended['capacity'] > 0
+    # 50 connections a second: a 2 s time window holds about 100 sources; hosts are capped at max_hosts
+    assert peaks['sources'] < 300
+    assert peaks['hosts'] <= 20 and windows.evicted_hosts > 0
+    # Live flows are capped at max_flows after every chunk of 256 packets
+    assert peaks['live_flows'] <= 200 + 256 and peaks['pending_rows'] < 300
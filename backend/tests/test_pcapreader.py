@@ -0,0 +1,86 @@
+import struct
+import pytest
+from src.Capture.pcapreader import (PcapFormatError, PcapReader, PcapStreamDecoder, capture_snaplen,
+                                    PROTO_TCP, TCP_SYN)
+
+def ethernet_tcp_frame(sport=40000, dport=80, flags=TCP_SYN, payload=b''):
+    tcp = struct.pack('>HHIIBBHHH', sport, dport, 1, 0, 0x50, flags, 65535, 0, 0) + payload
+    ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0x4000, 64, PROTO_TCP, 0,
+                     bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]))
+    return b'\x00' * 12 + b'\x08\x00' + ip + tcp
+
+def pcap_bytes(frames, snaplen=65535):
+    data = struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, snaplen, 1)
+    for i, frame in enumerate(frames):
+        data += struct.pack('<IIII', 1700000000 + i, 500000, len(frame), len(frame)) + frame
+    return data
+
+def pcapng_block(block_type, body):
+    body += b'\x00' * (-len(body) % 4)
+    length = 12 + len(body)
+    return struct.pack('<II', block_type, length) + body + struct.pack('<I', length)
+
+def pcapng_bytes(frames, interface=0, with_idb=True):
+    data = pcapng_block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+    if with_idb:
+        data += pcapng_block(1, struct.pack('<HHI', 1, 0, 262144))
+    for frame in frames:
+        data += pcapng_block(6, struct.pack('<IIIII', interface, 0, 1000000, len(frame), len(frame)) + frame)
+    return data
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.mark.parametrize('use_mmap', [True, False])
+def test_pcap_records(tmp_path, use_mmap):
+    frame = ethernet_tcp_frame(payload=b'hello')
+    path = write(tmp_path, 'a.pcap', pcap_bytes([frame, frame]))
+    reader = PcapReader(path, payload_bytes=3, use_mmap=use_mmap)
+    records = list(reader)
+
+    assert reader.packets == 2 and len(records) == 2
+    record = records[0]
+    assert (record.src, record.dst, record.proto, record.sport, record.dport) == ('10.0.0.1', '10.0.0.2', PROTO_TCP, 40000, 80)
+    assert record.flags == TCP_SYN
+    assert record.ts == pytest.approx(1700000000.5)
+    assert record.length == record.wire_length == len(frame)
+    assert record.payload_length == 5 and record.payload == b'hel'
+
+def test_pcapng_records(tmp_path):
+    path = write(tmp_path, 'a.pcapng', pcapng_bytes([ethernet_tcp_frame()]))
+    records = list(PcapReader(path))
+
+    assert len(records) == 1
+    assert records[0].ts == pytest.approx(1000000 * 1e-6)
+    assert capture_snaplen(path) == 262144
+
+@pytest.mark.parametrize('data', [
+    pcapng_bytes([ethernet_tcp_frame()], interface=1),
+    pcapng_bytes([ethernet_tcp_frame()], with_idb=False),
+    b'not a capture file at all',
+], ids=['undeclared-interface', 'no-interface-block', 'not-a-capture'])
+def test_malformed_captures_raise_format_error(tmp_path, data):
+    path = write(tmp_path, 'bad.pcapng', data)
+    with pytest.raises(PcapFormatError):
+        list(PcapReader(path))
+
+def test_stream_decoder_matches_file_reader_whatever_the_chunking(tmp_path):
+    data = pcap_bytes([ethernet_tcp_frame(sport=40000 + i, payload=b'x' * i) for i in range(5)])
+    expected = list(PcapReader(write(tmp_path, 'a.pcap', data), payload_bytes=64))
+
+    decoder = PcapStreamDecoder(payload_bytes=64)
+    records = []
+    for i in range(0, len(data), 7):
+        records += decoder.feed(data[i:i + 7])
+
+    assert records == expected
+    assert decoder.pending_bytes == 0
+
+def test_stream_decoder_drops_payloads_of_truncating_snaplen():
+    decoder = PcapStreamDecoder(payload_bytes=64)
+    records = decoder.feed(pcap_bytes([ethernet_tcp_frame(payload=b'secret')], snaplen=128))
+
+    assert decoder.snaplen == 128
+    assert records[0].payload is None and records[0].payload_length == 6
@@ -0,0 +1,67 @@
+import asyncio
+import numpy as np
+import pandas as pd
+from src.IDS.inference.cache import PredictionCache, dedup_codes, row_hashes
+
+class RecordingModel:
+    """Async predict that codes each row by its src_bytes and records the frames it was given."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def __call__(self, df):
+        self.frames.append(df)
+        return df['src_bytes'].to_numpy().astype(np.int64) % 7
+
+def flood(values):
+    return pd.DataFrame({'src_bytes': values, 'service': ['http'] * len(values)})
+
+def test_row_hashes_key_on_values_only():
+    a = flood([1, 2, 1])
+    b = flood([1, 2, 1]).set_index(pd.Index([10, 20, 30]))
+    hashes = row_hashes(a)
+
+    np.testing.assert_array_equal(hashes, row_hashes(b))
+    assert hashes[0] == hashes[2] != hashes[1]
+    assert row_hashes(a.assign(service='ftp'))[0] != hashes[0]
+
+def test_duplicates_are_scored_once_and_scattered_back_in_order():
+    model = RecordingModel()
+    frame = flood([5, 9, 5, 5, 9, 12])
+
+    codes = asyncio.run(dedup_codes(frame, model))
+
+    np.testing.assert_array_equal(codes, frame['src_bytes'].to_numpy() % 7)
+    assert [len(df) for df in model.frames] == [3]
+
+def test_cache_serves_repeats_within_a_namespace_only():
+    model, cache = RecordingModel(), PredictionCache(max_entries=100)
+    frame = flood([5, 9, 5])
+
+    asyncio.run(dedup_codes(frame, model, cache, ('v1', False)))
+    codes = asyncio.run(dedup_codes(frame, model, cache, ('v1', False)))
+    asyncio.run(dedup_codes(frame, model, cache, ('v1', True)))
+
+    np.testing.assert_array_equal(codes, [5, 2, 5])
+    # The repeat was served from the cache; another model namespace is scored again
+    assert [len(df) for df in model.frames] == [2, 2]
+    assert cache.hits == 2 and cache.rows == 9 and cache.unique_rows == 6
+
+def test_frames_with_missing_values_bypass_deduplication_and_cache():
+    model, cache = RecordingModel(), PredictionCache(max_entries=100)
+    frame = flood([5.0, np.nan, 5.0]).fillna({'src_bytes': 0})
+    frame.loc[1, 'service'] = None
+
+    asyncio.run(dedup_codes(frame, model, cache, ('v1', False)))
+
+    assert [len(df) for df in model.frames] == [3]
+    assert cache.rows == 0 and cache.stats()['entries'] == 0
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.store('v1', np.array([1, 2]), np.array([0, 1]))
+    cache.lookup('v1', np.array([1]))
+    cache.store('v1', np.array([3]), np.array([2]))
+
+    np.testing.assert_array_equal(cache.lookup('v1', np.array([1, 2, 3])), [0, -1, 2])
+    assert cache.evictions == 1
@@ -0,0 +1,62 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+import torch.nn as nn
+import config
+from src.IDS.inference import batcher as batcher_module
+from src.IDS.inference import worker_pool
+from src.IDS.inference.quantized import quantize_scae_gc
+from src.IDS.inference.registry import ModelRegistry
+from src.IDS.training.predict import load_scae_gc
+
+# Tolerances of the int8 model against fp32 on the shipped weights
+MIN_ARGMAX_AGREEMENT = 0.99
+MAX_PROBABILITY_ERROR = 0.01
+
+def test_int8_model_agrees_with_fp32_on_a_fixed_sample():
+    model = load_scae_gc(config.MODEL_SAVE_PATH)
+    quantized = quantize_scae_gc(model)
+    features = torch.from_numpy(np.random.default_rng(0).normal(0.0, 1.0, (2000, 37)).astype(np.float32))
+    with torch.no_grad():
+        fp32, int8 = model(features), quantized(features)
+
+    assert (fp32.argmax(dim=1) == int8.argmax(dim=1)).float().mean().item() >= MIN_ARGMAX_AGREEMENT
+    assert (fp32 - int8).abs().max().item() <= MAX_PROBABILITY_ERROR
+    assert not any(isinstance(module, nn.Conv1d) for module in quantized.modules())
+
+class ConstantModel(nn.Module):
+    """Scores every row as one class, so the outputs show which model ran."""
+
+    def __init__(self, code, num_classes=12):
+        super().__init__()
+        self.classifier = nn.Linear(1, num_classes)
+        self.code = code
+
+    def forward(self, x):
+        return nn.functional.one_hot(torch.full((len(x),), self.code), self.classifier.out_features).float()
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ModelRegistry(None, {}, ConstantModel(0), 'cpu', 0.0, {},
+                             SimpleNamespace(transform=lambda df: df.to_numpy(np.float32)),
+                             quantized_model=ConstantModel(1))
+    monkeypatch.setattr(worker_pool, 'get_registry', lambda: registry)
+    monkeypatch.setattr(batcher_module, '_batchers', {})
+    monkeypatch.setattr(batcher_module, 'get_pool', lambda: worker_pool.InferencePool(workers=0))
+    return registry
+
+async def predict_both(frame):
+    fp32, int8 = batcher_module.get_batcher(False), batcher_module.get_batcher(quantized=True)
+    try:
+        return await fp32.predict(frame), await int8.predict(frame)
+    finally:
+        await fp32.stop()
+        await int8.stop()
+
+def test_quantized_batcher_runs_the_int8_model(registry):
+    fp32, int8 = asyncio.run(predict_both(pd.DataFrame({'x': [0.0, 1.0, 2.0]})))
+
+    assert list(fp32) == [0, 0, 0] and list(int8) == [1, 1, 1]
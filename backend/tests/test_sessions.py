@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from src.Capture.continuous import ContinuousCapture
+from src.Capture.sessions import CaptureAccessError, CaptureSessionError, CaptureSessionManager
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = CaptureSessionManager(str(tmp_path / 'sessions'), max_sessions=4)
+    return manager, manager.open('stream', 10, 'alice'), manager.open('stream', 10, 'bob')
+
+def test_status_lists_only_the_owners_sessions(manager):
+    manager, alice, bob = manager
+    bob.close()
+
+    assert [s["id"] for s in manager.status(owner='alice')["active"]] == [alice.id]
+    assert manager.status(owner='alice')["recent"] == []
+    assert [s["id"] for s in manager.status(owner='bob')["recent"]] == [bob.id]
+    assert len(manager.status()["active"]) == 1 and len(manager.status()["recent"]) == 1
+
+def test_other_owners_sessions_are_not_found(manager):
+    manager, alice, bob = manager
+
+    with pytest.raises(KeyError):
+        manager.status(bob.id, 'alice')
+    with pytest.raises(KeyError):
+        asyncio.run(manager.cancel(bob.id, 'alice'))
+    assert bob.state == 'starting'
+
+    bob.close()
+    with pytest.raises(KeyError):
+        manager.status(bob.id, 'alice')
+    with pytest.raises(KeyError):
+        asyncio.run(manager.cancel(bob.id, 'alice'))
+
+def test_owner_and_admin_can_cancel(manager):
+    manager, alice, bob = manager
+
+    assert asyncio.run(manager.cancel(alice.id, 'alice'))["state"] == 'cancelled'
+    assert asyncio.run(manager.cancel(bob.id))["state"] == 'cancelled'
+    alice.close()
+    with pytest.raises(CaptureSessionError):
+        asyncio.run(manager.cancel(alice.id, 'alice'))
+
+def test_continuous_capture_is_stopped_only_by_its_owner(tmp_path):
+    capture = ContinuousCapture(directory=str(tmp_path))
+    capture.state, capture.owner = 'running', 'alice'
+
+    with pytest.raises(CaptureAccessError):
+        asyncio.run(capture.stop('bob'))
+    assert capture.state == 'running'
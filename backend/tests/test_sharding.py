@@ -0,0 +1,39 @@
+import pytest
+from benchmarks.synthetic_pcap import write_capture
+from src.Capture.pcapreader import PcapReader, pcap_ranges
+from src.Capture.processpcap import (CaptureTooLarge, extract_flow_features, locate_shards, merge_flow_features,
+                                     process_pcap, shard_frames, split_capture)
+
+@pytest.fixture(scope='module')
+def capture(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('pcap') / 'synthetic.pcap')
+    _, packets = write_capture(path, n_flows=300)
+    return path, packets
+
+def test_ranges_cover_every_record_once(capture):
+    path, packets = capture
+    ranges, counted = pcap_ranges(path, 4)
+
+    assert counted == packets and len(ranges) == 4
+    assert ranges[0][0] == 24 and all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    whole = [(r.ts, r.src, r.sport) for r in PcapReader(path)]
+    parts = [(r.ts, r.src, r.sport) for span in ranges for r in PcapReader(path, span=span)]
+    assert parts == whole
+
+@pytest.mark.parametrize('shards', [2, 3, 5])
+def test_sharded_extraction_matches_serial(capture, shards):
+    path, _ = capture
+    reference = process_pcap(path)
+
+    frames = shard_frames([locate_shards(path, span, shards) for span in split_capture(path, shards)])
+    batch = merge_flow_features([extract_flow_features(path, None, shard, shards, None, frames[shard])
+                                 for shard in range(shards)])
+
+    assert sum(len(offsets) for offsets, _ in frames) > 0
+    assert batch.features.equals(reference.features)
+    assert batch.metadata.equals(reference.metadata)
+
+def test_split_rejects_captures_over_the_packet_limit(capture):
+    path, packets = capture
+    with pytest.raises(CaptureTooLarge):
+        split_capture(path, 2, max_packets=packets - 1)
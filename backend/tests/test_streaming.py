@@ -0,0 +1,65 @@
+import asyncio
+import io
+import json
+import numpy as np
+import pytest
+from src.IDS.inference.streaming import detect_csv_encoding, open_csv_chunks, stream_predictions
+from src.IDS.inference.worker_pool import InvalidUpload, parse_csv
+
+CLASS_NAMES = np.array(['normal', 'neptune', 'smurf'], dtype=object)
+
+def csv_bytes(encoding, bom=b''):
+    rows = ''.join(f"{i},{['café', 'http', 'naïve'][i % 3]}\n" for i in range(10))
+    return bom + f"src_bytes,service\n{rows}".encode(encoding)
+
+@pytest.mark.parametrize('data, encoding', [
+    (csv_bytes('utf-8'), 'utf-8-sig'),
+    (csv_bytes('utf-8', bom=b'\xef\xbb\xbf'), 'utf-8-sig'),
+    (csv_bytes('latin-1'), 'latin-1'),
+])
+def test_chunks_are_decoded_like_the_whole_file_upload(data, encoding):
+    file_obj = io.BytesIO(data)
+    assert detect_csv_encoding(file_obj, chunk_bytes=16) == encoding and file_obj.tell() == 0
+
+    chunks = list(open_csv_chunks(file_obj, chunk_rows=4))
+    streamed = [value for chunk in chunks for value in chunk['service']]
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert list(chunks[0].columns) == ['src_bytes', 'service']
+    assert streamed == list(parse_csv(data)['service'])
+    assert '�' not in ''.join(streamed) and 'café' in streamed
+
+def test_undecodable_file_is_rejected():
+    with pytest.raises(InvalidUpload):
+        detect_csv_encoding(io.BytesIO(b'a,b\n\xff,1\n'), encodings=['utf-8', 'ascii'])
+
+async def collect(reader, predict):
+    first = next(reader)
+    return [json.loads(line) for chunk in [part async for part in stream_predictions(reader, first, predict, CLASS_NAMES)]
+            for line in chunk.decode().splitlines()]
+
+async def predict_from_column(frame):
+    return frame['src_bytes'].to_numpy() % 3
+
+def test_ndjson_lines_number_rows_across_chunks_and_end_with_a_summary():
+    reader = open_csv_chunks(io.BytesIO(csv_bytes('utf-8')), chunk_rows=4)
+    lines = asyncio.run(collect(reader, predict_from_column))
+
+    rows, summary = lines[:-1], lines[-1]
+    assert rows == [{"row_id": i + 1, "prediction": CLASS_NAMES[i % 3]} for i in range(10)]
+    assert summary["summary"] == {"normal": 4, "attacks": 6} and summary["total_rows"] == 10
+    assert summary["time_to_first_result_ms"] is not None and summary["elapsed_ms"] >= 0
+
+def test_failure_mid_stream_ends_with_an_error_line():
+    calls = 0
+
+    async def fail_on_second_chunk(frame):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise ValueError("model unavailable")
+        return await predict_from_column(frame)
+
+    reader = open_csv_chunks(io.BytesIO(csv_bytes('utf-8')), chunk_rows=4)
+    lines = asyncio.run(collect(reader, fail_on_second_chunk))
+
+    assert len(lines) == 5 and lines[-1] == {"error": "model unavailable", "rows_completed": 4}
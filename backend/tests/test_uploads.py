@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import os
+import pytest
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.testclient import TestClient
+from api.uploads import UploadLimitMiddleware, spool_upload
+
+LIMIT = 4096
+
+@pytest.fixture
+def app(tmp_path):
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=LIMIT)
+    app.state.read = []
+    spool_dir = tmp_path / 'spool'
+    spool_dir.mkdir()
+    app.state.spool_dir = str(spool_dir)
+
+    @app.post("/body")
+    async def body(request: Request):
+        async for chunk in request.stream():
+            app.state.read.append(len(chunk))
+        return {"bytes": sum(app.state.read)}
+
+    @app.post("/spool")
+    async def spool(file: UploadFile = File(...), max_bytes: int = 0):
+        spooled = await spool_upload(file, suffix='.pcap', sha256=True, max_bytes=max_bytes, chunk_bytes=1000,
+                                     directory=app.state.spool_dir)
+        with open(spooled.path, 'rb') as f:
+            contents = f.read()
+        os.unlink(spooled.path)
+        return {"size": spooled.size, "sha256": spooled.sha256, "copied": contents == payload(spooled.size)}
+
+    return app
+
+def payload(size):
+    return bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+
+def test_declared_oversized_body_is_refused_before_it_is_read(app):
+    response = TestClient(app).post("/body", content=payload(LIMIT + 1))
+
+    assert response.status_code == 413
+    assert app.state.read == []
+
+def test_body_within_the_limit_passes(app):
+    response = TestClient(app).post("/body", content=payload(LIMIT))
+
+    assert response.status_code == 200 and response.json() == {"bytes": LIMIT}
+
+async def send_in_chunks(app, chunks, chunk_bytes):
+    """Drive the ASGI app with a body of chunks and no Content-Length; returns (chunks pulled, status)."""
+    pulled, statuses = 0, []
+
+    async def receive():
+        nonlocal pulled
+        if pulled == chunks:
+            return {"type": "http.disconnect"}
+        pulled += 1
+        return {"type": "http.request", "body": b"x" * chunk_bytes, "more_body": pulled < chunks}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": "/body", "raw_path": b"/body", "root_path": "", "query_string": b"", "headers": [],
+             "client": ("test", 1), "server": ("test", 80)}
+    await app(scope, receive, send)
+    return pulled, statuses
+
+def test_streamed_oversized_body_is_cut_off_once_past_the_limit(app):
+    pulled, statuses = asyncio.run(send_in_chunks(app, chunks=1000, chunk_bytes=512))
+
+    assert statuses == [413]
+    assert pulled == LIMIT // 512 + 1
+    assert sum(app.state.read) <= LIMIT
+
+def test_spooled_upload_keeps_the_bytes_and_their_sha256(app):
+    data = payload(3000)
+    response = TestClient(app).post("/spool", files={"file": ("capture.pcap", data)})
+
+    assert response.status_code == 200
+    assert response.json() == {"size": len(data), "sha256": hashlib.sha256(data).hexdigest(), "copied": True}
+    assert os.listdir(app.state.spool_dir) == []
+
+def test_spool_over_its_limit_is_refused_and_removed(app):
+    response = TestClient(app).post("/spool", params={"max_bytes": 2500}, files={"file": ("capture.pcap", payload(3000))})
+
+    assert response.status_code == 413
+    assert os.listdir(app.state.spool_dir) == []